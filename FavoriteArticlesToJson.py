@@ -1,22 +1,36 @@
 import requests
 from bs4 import BeautifulSoup
 import json
-import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+from jsonl_store import JsonlArticleStore
+from rate_limiter import HostRateLimiter, looks_blocked
 
 class WechatArticleCrawler:
-    def __init__(self):
+    def __init__(self, storage='jsonl', rate_limiter=None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        # 按域名限速，为 None 时不限速
+        self.rate_limiter = rate_limiter
+        # storage 为 jsonl（追加写入）或 json（旧的整文件重写方式）
+        self.storage = storage
+        self.stores = {}
     
     def get_article_content(self, url):
         try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
             response = requests.get(url, headers=self.headers)
             
             # 打印响应状态码和内容长度，用于调试
             print(f"响应状态码: {response.status_code}")
             print(f"响应内容长度: {len(response.text)}")
             
+            # 反馈给限速器：429、5xx 或验证页面会让该域名暂停并降速
+            if self.rate_limiter:
+                self.rate_limiter.report(url, response.status_code, blocked=looks_blocked(response.text))
+            
             # 检查响应状态
             if response.status_code != 200:
                 print(f"请求失败，状态码: {response.status_code}")
@@ -50,7 +64,32 @@ class WechatArticleCrawler:
             print(f"抓取文章失败: {str(e)}")
             return None
     
+    def get_store(self, filename):
+        # favorite_articles.json 对应 favorite_articles.jsonl，首次使用时自动迁移旧文件，上次迁移中断时继续
+        path = os.path.splitext(filename)[0] + '.jsonl'
+        if path not in self.stores:
+            store = JsonlArticleStore(path)
+            pending = len(store) == 0 or store.migration_pending()
+            if pending and os.path.exists(filename) and filename != path:
+                count = store.migrate_from_json(filename)
+                print(f"已将 {count} 篇文章从 {filename} 迁移到 {path}")
+            self.stores[path] = store
+        return self.stores[path]
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
+        self.stores = {}
+
     def save_article(self, article_data, filename='favorite_articles.json'):
+        if self.storage == 'jsonl':
+            try:
+                self.get_store(filename).append(article_data)
+                print(f"文章《{article_data['title']}》已保存")
+            except Exception as e:
+                print(f"保存文章失败: {str(e)}")
+            return
+
         try:
             # 读取现有数据
             try:
@@ -72,17 +111,24 @@ class WechatArticleCrawler:
 
 
 if __name__ == "__main__":
-    # 使用示例
-    crawler = WechatArticleCrawler()
+    # 使用示例，请求速率和并发数在 config.ini 的 [RateLimit] 中配置
+    rate_limiter = HostRateLimiter.from_config()
+    crawler = WechatArticleCrawler(rate_limiter=rate_limiter)
     
     # 可以添加多个文章URL
     article_urls = [
         "https://mp.weixin.qq.com/s/7PRALCWfdV-iXjOOofOEkQ"
     ]
     
-    for url in article_urls:
+    def fetch(url):
         print(f"正在抓取文章: {url}")
-        article = crawler.get_article_content(url)
-        if article:
-            crawler.save_article(article)
-        time.sleep(3)  # 添加延时，避免频繁请求
+        return crawler.get_article_content(url)
+    
+    try:
+        # 并发抓取，由限速器控制每个域名的请求频率；保存在主线程中依次进行
+        with ThreadPoolExecutor(max_workers=rate_limiter.workers) as executor:
+            for article in executor.map(fetch, article_urls):
+                if article:
+                    crawler.save_article(article)
+    finally:
+        crawler.close()
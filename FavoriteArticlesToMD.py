@@ -3,14 +3,19 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 import os
 import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import HostRateLimiter, looks_blocked
 import html2text
 from bs4 import BeautifulSoup
 
 class WechatArticleCrawler:
+    def __init__(self, rate_limiter=None):
+        # 按域名限速，为 None 时不限速
+        self.rate_limiter = rate_limiter
+
     def get_article_content_selenium(self, url):
         try:
             chrome_options = Options()
@@ -22,6 +27,8 @@ class WechatArticleCrawler:
             driver = webdriver.Chrome(options=chrome_options)
             driver.set_page_load_timeout(20)
             
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
             driver.get(url)
             
             # 等待文章标题加载
@@ -43,6 +50,8 @@ class WechatArticleCrawler:
             image_urls = [img.get_attribute('data-src') for img in images if img.get_attribute('data-src')]
             
             driver.quit()
+            if self.rate_limiter:
+                self.rate_limiter.report(url)
             
             return {
                 'title': title,
@@ -53,6 +62,13 @@ class WechatArticleCrawler:
         except Exception as e:
             print(f"抓取文章失败: {str(e)}")
             if 'driver' in locals():
+                # 等待超时可能是遇到了验证页面，反馈给限速器
+                if self.rate_limiter:
+                    try:
+                        blocked = looks_blocked(driver.page_source)
+                    except Exception:
+                        blocked = False
+                    self.rate_limiter.report(url, blocked=blocked)
                 driver.quit()
             return None
 
@@ -77,7 +93,12 @@ class WechatArticleCrawler:
             image_map = {}
             for i, img_url in enumerate(article['image_urls']):
                 try:
+                    # 图片 CDN 同样按域名限速
+                    if self.rate_limiter:
+                        self.rate_limiter.acquire(img_url)
                     response = requests.get(img_url, stream=True)
+                    if self.rate_limiter:
+                        self.rate_limiter.report_response(img_url, response)
                     if response.status_code == 200:
                         img_filename = f"image_{i+1}.jpg"
                         img_path = f"{images_dir}/{img_filename}"
@@ -133,15 +154,19 @@ class WechatArticleCrawler:
             print(f"保存文章失败: {str(e)}")
 
 if __name__ == "__main__":
-    crawler = WechatArticleCrawler()
+    # 请求速率和并发数在 config.ini 的 [RateLimit] 中配置，每个并发任务会启动一个 Chrome
+    rate_limiter = HostRateLimiter.from_config()
+    crawler = WechatArticleCrawler(rate_limiter)
     article_urls = [
         "https://mp.weixin.qq.com/s/7PRALCWfdV-iXjOOofOEkQ"
     ]
     
-    for url in article_urls:
+    def fetch(url):
         print(f"正在抓取文章: {url}")
         # 使用 Selenium 方法
-        article = crawler.get_article_content_selenium(url)
-        if article:
-            crawler.save_article(article)
-        time.sleep(3)
\ No newline at end of file
+        return crawler.get_article_content_selenium(url)
+    
+    with ThreadPoolExecutor(max_workers=rate_limiter.workers) as executor:
+        for article in executor.map(fetch, article_urls):
+            if article:
+                crawler.save_article(article)
\ No newline at end of file
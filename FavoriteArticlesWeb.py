@@ -1,19 +1,25 @@
-from flask import Flask, request, jsonify, make_response
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from flask import Flask, Response, request, jsonify, make_response
 import os
-import re
-import requests
-import html2text
-from bs4 import BeautifulSoup
-from datetime import datetime
 import configparser
-from logger_config import setup_logger
+import hmac
+import threading
+import time
+import uuid
+from logger_config import setup_logger, request_log, annotate
+from driver_pool import DriverPool, TabPool, count_round_trips
+from article_fetcher import HttpArticleFetcher, parse_article_html, parse_publish_date
+from image_downloader import ImageDownloader
+from image_store import ImageStore
+from image_optimizer import OUTPUT_FORMATS, optimize_image, pillow_available, variant_paths
+from article_index import ArticleIndex, article_location, content_hash, normalize_url
+from job_queue import JobStore, JobManager, DONE, FAILED
+from markdown_converter import render_article
+from article_snapshot import write_snapshot
+from search_index import SearchIndex
+from simhash_index import SimHashIndex, article_fingerprint, max_distance_for
+from rate_limiter import HostRateLimiter, looks_blocked
+from profiler import RequestProfiler
+from metrics import REGISTRY, CONTENT_TYPE, Counter, Gauge, Histogram
 from multiprocessing import Pool
 from functools import partial
 
@@ -22,9 +28,40 @@ logger = setup_logger()
 
 app = Flask(__name__)
 
+# 监控指标，通过 /metrics 以 Prometheus 文本格式暴露
+DRIVER_CHECKOUT_WAIT = Histogram('wechat_driver_checkout_wait_seconds', '等待空闲浏览器的时间（秒）')
+STAGE_SECONDS = Histogram('wechat_stage_seconds', '文章处理各阶段耗时（秒）', labels=('stage',))
+ARTICLE_IMAGES = Histogram('wechat_article_images', '每篇文章的图片数量',
+                           buckets=(0, 1, 5, 10, 20, 50, 100, 200))
+ARTICLE_IMAGE_BYTES = Histogram('wechat_article_image_bytes', '每篇文章下载的图片字节数',
+                                buckets=(0, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+                                         16 * 1024 ** 2, 64 * 1024 ** 2))
+IMAGE_FAILURES = Counter('wechat_image_failures_total', '下载失败的图片数量')
+IMAGES_OPTIMIZED = Counter('wechat_images_optimized_total', '图片压缩结果', labels=('result',))
+IMAGE_BYTES_SAVED = Counter('wechat_image_bytes_saved_total', '重新压缩图片节省的字节数')
+ARTICLES_TOTAL = Counter('wechat_articles_total', '文章处理结果', labels=('result',))
+ARTICLE_ERRORS = Counter('wechat_article_errors_total', '文章处理失败次数（按异常类型）', labels=('error',))
+FETCH_ERRORS = Counter('wechat_fetch_errors_total', '抓取异常次数（按抓取方式和异常类型）',
+                       labels=('tier', 'error'))
+HTTP_FALLBACKS = Counter('wechat_http_fallbacks_total', 'HTTP 抓取缺少字段、改用浏览器渲染的次数')
+CHROME_INSTANCES = Gauge('wechat_chrome_instances', '当前存活的浏览器数量')
+DRIVER_WAITERS = Gauge('wechat_driver_waiters', '正在等待空闲浏览器的请求数')
+INFLIGHT_REQUESTS = Gauge('wechat_inflight_requests', '正在处理的 HTTP 请求数')
+RENDERS_IN_FLIGHT = Gauge('wechat_renders_in_flight', '正在浏览器中渲染的文章数（一个浏览器或一个标签页一篇）')
+CHROME_RSS = Gauge('wechat_chrome_rss_megabytes', '所有浏览器进程的常驻内存（MB，需要 psutil）')
+JOBS_RUNNING = Gauge('wechat_jobs_running', '正在执行的保存任务数')
+COALESCED_REQUESTS = Counter('wechat_coalesced_requests_total', '合并到进行中或刚完成任务的请求数',
+                             labels=('kind',))
+PAGE_RENDER_SECONDS = Histogram('wechat_page_render_seconds', '浏览器渲染页面耗时（秒）', labels=('profile',))
+PAGE_TRANSFER_BYTES = Histogram('wechat_page_transfer_bytes', '浏览器渲染页面时传输的字节数', labels=('profile',),
+                                buckets=(64 * 1024, 256 * 1024, 512 * 1024, 1024 ** 2, 2 * 1024 ** 2,
+                                         5 * 1024 ** 2, 10 * 1024 ** 2, 20 * 1024 ** 2))
+
 # 设置 webdriver_manager 的缓存路径
 os.environ['WDM_LOCAL'] = '1'  # 启用本地缓存
 os.environ['WDM_PATH'] = os.path.join(os.getcwd(), "drivers")  # 设置缓存路径
+# 解析出的 chromedriver 路径缓存在同一目录下，之后启动浏览器不再查找或下载驱动
+DRIVER_PATH_CACHE = os.path.join(os.environ['WDM_PATH'], 'chromedriver_path.txt')
 
 class Config:
     def __init__(self):
@@ -44,214 +81,1022 @@ class Config:
     def get_save_path(self):
         return self.config.get('Path', 'save_path', fallback='articles')
 
-class WebDriverSingleton:
-    _instance = None
-    _driver = None
+    def get_driver_pool_settings(self):
+        return {
+            'size': self.config.getint('Driver', 'pool_size', fallback=2),
+            'max_waiters': self.config.getint('Driver', 'max_waiters', fallback=16),
+            'wait_timeout': self.config.getfloat('Driver', 'wait_timeout', fallback=60),
+            'max_pages': self.config.getint('Driver', 'max_pages', fallback=50),
+            'max_rss_mb': self.config.getint('Driver', 'max_rss_mb', fallback=0),
+        }
+
+    def get_driver_profile(self):
+        blocked = self.config.get('Driver', 'blocked_urls', fallback='')
+        return {
+            'profile': self.config.get('Driver', 'profile', fallback='lean'),
+            'blocked_urls': [pattern.strip() for pattern in blocked.split(',') if pattern.strip()],
+        }
+
+    def get_render_mode(self):
+        return {
+            'mode': self.config.get('Driver', 'mode', fallback='browser'),
+            'tabs_per_browser': self.config.getint('Driver', 'tabs_per_browser', fallback=4),
+        }
+
+    def get_prewarm(self):
+        return self.config.getboolean('Driver', 'prewarm', fallback=True)
+
+    def get_extract_mode(self):
+        return self.config.get('Driver', 'extract_mode', fallback='script')
+
+    def get_http_first(self):
+        return self.config.getboolean('Fetch', 'http_first', fallback=True)
+
+    def get_http_fetch_settings(self):
+        return {
+            'timeout': self.config.getfloat('Fetch', 'http_timeout', fallback=10),
+            'pool_size': self.config.getint('Fetch', 'http_pool_size', fallback=10),
+        }
+
+    def get_markdown_converter(self):
+        return self.config.get('Markdown', 'converter', fallback='fast')
+
+    def get_convert_pool_settings(self):
+        return {
+            'processes': self.config.getint('Markdown', 'convert_workers', fallback=2),
+            'maxtasksperchild': self.config.getint('Markdown', 'convert_maxtasksperchild', fallback=100),
+            'timeout': self.config.getfloat('Markdown', 'convert_timeout', fallback=60),
+        }
+
+    def get_snapshots_enabled(self):
+        return self.config.getboolean('Markdown', 'snapshots', fallback=True)
+
+    def get_job_settings(self):
+        return {
+            'db_path': self.config.get('Jobs', 'db_path', fallback='jobs.db'),
+            'workers': self.config.getint('Jobs', 'workers', fallback=2),
+            'sync_timeout': self.config.getfloat('Jobs', 'sync_timeout', fallback=300),
+            'result_ttl': self.config.getfloat('Jobs', 'result_ttl', fallback=30),
+        }
+
+    def get_import_settings(self):
+        return {
+            'workers': self.config.getint('Import', 'workers', fallback=4),
+            'retries': self.config.getint('Import', 'retries', fallback=3),
+            'backoff': self.config.getfloat('Import', 'retry_backoff', fallback=10),
+            'max_backoff': self.config.getfloat('Import', 'max_retry_backoff', fallback=300),
+        }
+
+    def get_profiling_settings(self):
+        return {
+            'always': self.config.getboolean('Profiling', 'always', fallback=False),
+            'slow_threshold': self.config.getfloat('Profiling', 'slow_threshold', fallback=30),
+            'sample_interval': self.config.getfloat('Profiling', 'sample_interval_ms', fallback=10) / 1000,
+            'max_profiles': self.config.getint('Profiling', 'max_profiles', fallback=100),
+            'profile_dir': self.config.get('Profiling', 'profile_dir', fallback=os.path.join('logs', 'profiles')),
+            'admin_token': self.config.get('Profiling', 'admin_token', fallback=''),
+        }
+
+    def get_dedup_settings(self):
+        return {
+            'enabled': self.config.getboolean('Dedup', 'enabled', fallback=True),
+            'similarity': self.config.getfloat('Dedup', 'similarity', fallback=0.95),
+            'min_chars': self.config.getint('Dedup', 'min_chars', fallback=200),
+        }
+
+    def get_image_download_settings(self):
+        return {
+            'max_workers': self.config.getint('Images', 'download_workers', fallback=8),
+            'timeout': self.config.getfloat('Images', 'download_timeout', fallback=15),
+            'max_bytes': int(self.config.getfloat('Images', 'max_image_mb', fallback=20) * 1024 * 1024),
+        }
+
+    def get_image_optimize_settings(self):
+        return {
+            'enabled': self.config.getboolean('Images', 'optimize', fallback=False),
+            'format': self.config.get('Images', 'optimize_format', fallback='webp').lower(),
+            'quality': self.config.getint('Images', 'optimize_quality', fallback=80),
+            'max_dimension': self.config.getint('Images', 'max_dimension', fallback=2048),
+            'thumbnail_size': self.config.getint('Images', 'thumbnail_size', fallback=320),
+            'keep_originals': self.config.getboolean('Images', 'keep_originals', fallback=False),
+            'processes': self.config.getint('Images', 'optimize_workers', fallback=2),
+            'maxtasksperchild': self.config.getint('Images', 'optimize_maxtasksperchild', fallback=200),
+            'timeout': self.config.getfloat('Images', 'optimize_timeout', fallback=60),
+        }
+
+# 文章内容容器已出现且 DOM 解析完成（readyState 为 interactive 或 complete）
+PAGE_READY_SCRIPT = "return document.readyState !== 'loading' && !!document.querySelector('.rich_media_content');"
+
+# 在页面中一次性提取文章字段
+EXTRACT_SCRIPT = """
+var text = function (selector) {
+    var element = document.querySelector(selector);
+    return element ? element.innerText.trim() : '';
+};
+var content = document.querySelector('.rich_media_content');
+// 页面及已加载资源的传输字节数（跨域资源未开放 Timing-Allow-Origin 时记为 0）
+var transferred = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+    .reduce(function (total, entry) { return total + (entry.transferSize || 0); }, 0);
+var images = content ? Array.prototype.map.call(content.querySelectorAll('img'), function (img) {
+    return img.getAttribute('data-src');
+}).filter(Boolean) : [];
+return {
+    title: text('.rich_media_title'),
+    author: text('.rich_media_meta_nickname'),
+    publish_time: text('#publish_time'),
+    content_html: content ? content.innerHTML : '',
+    image_urls: images,
+    transfer_bytes: transferred
+};
+"""
+
+# lean 配置下屏蔽的请求：图片（正文图片由 save_article 单独下载）、字体、音视频和统计上报
+LEAN_BLOCKED_URLS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*://mmbiz.qpic.cn/*', '*://mmbiz.qlogo.cn/*', '*://wx.qlogo.cn/*',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.m3u8', '*.mp3', '*.m4a', '*.flv',
+    '*://mpvideo.qpic.cn/*', '*://res.wx.qq.com/voice/*',
+    '*://badjs.weixinbridge.com/*', '*://mp.weixin.qq.com/mp/jsmonitor*',
+    '*://mp.weixin.qq.com/mp/appmsgreport*', '*://mp.weixin.qq.com/mp/webcommreport*',
+    '*://mp.weixin.qq.com/mp/report*', '*://open.weixin.qq.com/*report*',
+    '*://*.google-analytics.com/*', '*://*.googletagmanager.com/*', '*://hm.baidu.com/*',
+]
+
+class WebDriverPool:
+    _pool = None
+    _lock = threading.Lock()
+    _render_totals = {}
+    _render_totals_lock = threading.Lock()
+    _driver_path = None
+    _driver_path_lock = threading.Lock()
+    _warmup = {'state': 'idle', 'browsers': 0, 'seconds': None, 'error': None}
+    _warmup_lock = threading.Lock()
 
     @classmethod
-    def get_driver(cls):
-        if cls._driver is None:
-            chrome_options = Options()
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            
+    def get_driver_path(cls):
+        with cls._driver_path_lock:
+            if cls._driver_path is None and os.path.exists(DRIVER_PATH_CACHE):
+                with open(DRIVER_PATH_CACHE, 'r', encoding='utf-8') as f:
+                    cls._driver_path = f.read().strip() or None
+            if cls._driver_path and not os.path.exists(cls._driver_path):
+                cls._driver_path = None
+            return cls._driver_path
+
+    @classmethod
+    def cache_driver_path(cls, path):
+        with cls._driver_path_lock:
+            if not path or path == cls._driver_path:
+                return
+            cls._driver_path = path
+            os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+            with open(DRIVER_PATH_CACHE, 'w', encoding='utf-8') as f:
+                f.write(path)
+        logger.info(f"已缓存 chromedriver 路径: {path}")
+
+    @classmethod
+    def clear_driver_path(cls):
+        with cls._driver_path_lock:
+            cls._driver_path = None
+            if os.path.exists(DRIVER_PATH_CACHE):
+                os.remove(DRIVER_PATH_CACHE)
+
+    @classmethod
+    def create_driver(cls, profile='lean', blocked_urls=(), tabs=False):
+        # Selenium 导入较慢，只在真正需要启动浏览器时导入
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        chrome_options = Options()
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        if tabs:
+            # 多标签页模式下 get 立即返回，各标签页的页面同时加载；由 process_url 等待 DOM 解析完成
+            chrome_options.page_load_strategy = 'none'
+        if profile == 'lean':
+            # DOM 解析完成即返回，不等待图片等子资源；正文容器由 process_url 单独等待
+            if not tabs:
+                chrome_options.page_load_strategy = 'eager'
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+            chrome_options.add_argument('--mute-audio')
+            chrome_options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2,
+                'profile.managed_default_content_settings.media_stream': 2,
+                'profile.managed_default_content_settings.notifications': 2,
+            })
+
+        driver = None
+        driver_path = cls.get_driver_path()
+        if driver_path:
+            try:
+                driver = webdriver.Chrome(
+                    service=Service(driver_path),
+                    options=chrome_options
+                )
+            except Exception as e:
+                # 缓存的驱动可能已与 Chrome 版本不匹配，重新查找
+                logger.warning(f"使用缓存的 chromedriver 启动失败，重新查找驱动: {str(e)}")
+                cls.clear_driver_path()
+
+        if driver is None:
             try:
                 # 首先尝试直接使用系统安装的 Chrome
-                cls._driver = webdriver.Chrome(
+                driver = webdriver.Chrome(
                     options=chrome_options
                 )
             except Exception as e:
                 logger.info("未找到系统Chrome驱动，正在下载...")
                 # 如果失败，则使用 webdriver_manager 下载
+                from webdriver_manager.chrome import ChromeDriverManager
                 chrome_driver_path = ChromeDriverManager().install()
-                cls._driver = webdriver.Chrome(
+                driver = webdriver.Chrome(
                     service=Service(chrome_driver_path),
                     options=chrome_options
                 )
-                
-        return cls._driver
+            cls.cache_driver_path(driver.service.path)
+
+        driver.profile = profile
+        if profile == 'lean':
+            cls.block_urls(driver, blocked_urls)
+        return driver
+
+    @staticmethod
+    def block_urls(driver, blocked_urls=()):
+        # 通过 CDP 在网络层拦截字体、音视频和统计脚本；拦截只对当前标签页生效
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS + list(blocked_urls)})
+        except Exception as e:
+            logger.warning(f"设置请求拦截失败，仅使用浏览器偏好设置: {str(e)}")
+
+    @classmethod
+    def record_render(cls, profile, seconds, transfer_bytes):
+        # 按配置累计渲染耗时和传输量，返回 (平均耗时, 平均传输字节数)，便于对比 lean 与 full
+        PAGE_RENDER_SECONDS.labels(profile=profile).observe(seconds)
+        if transfer_bytes is not None:
+            PAGE_TRANSFER_BYTES.labels(profile=profile).observe(transfer_bytes)
+        with cls._render_totals_lock:
+            totals = cls._render_totals.setdefault(profile, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += transfer_bytes or 0
+            return totals[1] / totals[0], totals[2] / totals[0]
+
+    @classmethod
+    def get_pool(cls):
+        from selenium.common.exceptions import TimeoutException
+
+        with cls._lock:
+            if cls._pool is None:
+                config = Config()
+                settings = config.get_driver_pool_settings()
+                profile = config.get_driver_profile()
+                render = config.get_render_mode()
+                logger.info(f"初始化浏览器池: {settings}，浏览器配置: {profile['profile']}，渲染模式: {render}")
+                # 页面等待超时不代表浏览器已损坏，其余 WebDriver 异常则丢弃该浏览器
+                discard_on_error = lambda e: not isinstance(e, TimeoutException)
+                if render['mode'] == 'tabs':
+                    # 每个浏览器同时处理 tabs_per_browser 篇文章，每篇文章一个标签页
+                    on_new_tab = None
+                    if profile['profile'] == 'lean':
+                        on_new_tab = lambda driver: cls.block_urls(driver, profile['blocked_urls'])
+                    cls._pool = TabPool(
+                        lambda: count_round_trips(cls.create_driver(tabs=True, **profile)),
+                        tabs_per_browser=render['tabs_per_browser'],
+                        discard_on_error=discard_on_error,
+                        on_new_tab=on_new_tab,
+                        **settings
+                    )
+                else:
+                    cls._pool = DriverPool(
+                        lambda: count_round_trips(cls.create_driver(**profile)),
+                        discard_on_error=discard_on_error,
+                        **settings
+                    )
+            return cls._pool
+
+    @classmethod
+    def lease(cls):
+        return cls.get_pool().lease()
+
+    @classmethod
+    def start_warmup(cls):
+        # 在后台解析驱动路径并预先启动配置数量的浏览器，完成前 /ready 返回 503
+        with cls._warmup_lock:
+            if cls._warmup['state'] != 'idle':
+                return
+            if not Config().get_prewarm():
+                cls._warmup['state'] = 'ready'
+                return
+            cls._warmup['state'] = 'warming'
+        threading.Thread(target=cls._run_warmup, name='driver-warmup', daemon=True).start()
+
+    @classmethod
+    def _run_warmup(cls):
+        start = time.perf_counter()
+        error = None
+        browsers = 0
+        try:
+            browsers = cls.get_pool().prewarm()
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"预启动浏览器失败: {error}")
+        with cls._warmup_lock:
+            cls._warmup.update(state='ready', browsers=browsers,
+                               seconds=time.perf_counter() - start, error=error)
+        logger.info(f"浏览器预热完成，已启动 {browsers} 个，耗时 {time.perf_counter() - start:.2f} 秒")
+
+    @classmethod
+    def warmup_status(cls):
+        with cls._warmup_lock:
+            return dict(cls._warmup)
+
+    @classmethod
+    def stats(cls):
+        # 浏览器池尚未创建时返回 None，不会因为采集指标而启动浏览器
+        pool = cls._pool
+        return pool.stats() if pool is not None else None
+
+    @classmethod
+    def memory(cls):
+        # 返回 (浏览器总内存 MB, 正在渲染的文章数)，用于比较多标签页与每请求一个浏览器的内存占用
+        pool = cls._pool
+        return pool.memory() if pool is not None else (None, 0)
 
     @classmethod
     def quit_driver(cls):
-        if cls._driver is not None:
-            cls._driver.quit()
-            cls._driver = None
+        with cls._lock:
+            pool, cls._pool = cls._pool, None
+        if pool is not None:
+            pool.drain()
+
+class ConversionPool:
+    # HTML 转 Markdown 是纯 CPU 计算，放到子进程中执行，避免长文章占用 GIL 拖慢其他请求
+    _pool = None
+    _settings = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_pool(cls):
+        # 进程数为 0 时返回 None，在当前线程中转换
+        with cls._lock:
+            if cls._settings is None:
+                cls._settings = Config().get_convert_pool_settings()
+                if cls._settings['processes'] > 0:
+                    logger.info(f"启动 Markdown 转换进程池: {cls._settings}")
+                    cls._pool = Pool(
+                        processes=cls._settings['processes'],
+                        # 定期重启工作进程，避免解析大量页面后内存只增不减
+                        maxtasksperchild=cls._settings['maxtasksperchild'] or None
+                    )
+            return cls._pool
+
+    @classmethod
+    def convert(cls, article, image_map, converter):
+        # 只传递转换需要的字段和本文用到的图片映射，结果为 Markdown 字符串
+        payload = {field: article[field] for field in ('title', 'url', 'content_html')}
+        render = partial(render_article, converter=converter)
+        pool = cls.get_pool()
+        if pool is None:
+            return render(payload, image_map)
+        try:
+            return pool.apply_async(render, (payload, image_map)).get(cls._settings['timeout'])
+        except Exception as e:
+            logger.warning(f"转换进程池执行失败，改为在当前线程中转换: {type(e).__name__}: {str(e)}")
+            return render(payload, image_map)
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            pool, cls._pool = cls._pool, None
+            cls._settings = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+class ImagePool:
+    # 图片重新压缩和生成缩略图同样是 CPU 密集的操作，使用独立的固定大小进程池，
+    # 请求线程只等待结果；超时或失败的图片使用原图
+    _pool = None
+    _settings = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_pool(cls):
+        # 未开启压缩或进程数为 0 时返回 None
+        with cls._lock:
+            if cls._settings is None:
+                settings = Config().get_image_optimize_settings()
+                if settings['enabled'] and not pillow_available():
+                    logger.warning("未安装 Pillow，不压缩图片")
+                    settings['enabled'] = False
+                if settings['enabled'] and settings['format'] not in OUTPUT_FORMATS:
+                    logger.warning(f"不支持的图片格式 {settings['format']}，不压缩图片")
+                    settings['enabled'] = False
+                if settings['enabled'] and settings['processes'] > 0:
+                    logger.info(f"启动图片压缩进程池: {settings}")
+                    cls._pool = Pool(
+                        processes=settings['processes'],
+                        maxtasksperchild=settings['maxtasksperchild'] or None
+                    )
+                cls._settings = settings
+            return cls._pool
+
+    @classmethod
+    def enabled(cls):
+        cls.get_pool()
+        return cls._settings['enabled']
+
+    @classmethod
+    def optimize(cls, store, stored_images, images_dir):
+        # stored_images 为 {图片 URL: 图片库路径}，压缩后链接到 images 目录，缩略图链接到 images/thumbs；
+        # 返回 {图片 URL: 文件名} 和统计信息
+        pool = cls.get_pool()
+        settings = cls._settings
+        options = {field: settings[field] for field in ('quality', 'max_dimension', 'thumbnail_size')}
+        task = partial(optimize_image, fmt=settings['format'], **options)
+        sources = list(dict.fromkeys(stored_images.values()))
+        results = {}
+        if pool is None:
+            for source in sources:
+                results[source] = task(source)
+        else:
+            # 整篇文章共用一个超时时间
+            deadline = time.monotonic() + settings['timeout']
+            pending = {source: pool.apply_async(task, (source,)) for source in sources}
+            for source, async_result in pending.items():
+                try:
+                    results[source] = async_result.get(max(0, deadline - time.monotonic()))
+                except Exception as e:
+                    results[source] = ('failed', None, None, 0, 0, f"{type(e).__name__}: {str(e)}")
+
+        stats = {'optimized': 0, 'bytes_before': 0, 'bytes_after': 0}
+        filenames = {}
+        for source in sources:
+            status, image_path, thumb_path, before, after, error = results[source]
+            IMAGES_OPTIMIZED.labels(result=status).inc()
+            if error:
+                logger.warning(f"压缩图片失败，使用原图 {source}: {error}")
+            if image_path is None and not os.path.exists(source):
+                # 同一图片的其他任务已经压缩并删除了原图
+                image_path, _ = variant_paths(source, settings['format'], **options)
+                if not os.path.exists(image_path):
+                    continue
+            if image_path is not None:
+                store.use_variant(source, image_path, settings['keep_originals'])
+                if status == 'optimized':
+                    stats['optimized'] += 1
+                    stats['bytes_before'] += before
+                    stats['bytes_after'] += after
+                    IMAGE_BYTES_SAVED.inc(max(0, before - after))
+            if thumb_path is not None:
+                thumbs_dir = os.path.join(images_dir, 'thumbs')
+                os.makedirs(thumbs_dir, exist_ok=True)
+                store.link_into(thumb_path, thumbs_dir)
+            filenames[source] = store.link_into(image_path or source, images_dir)
+        return {url: filenames[source] for url, source in stored_images.items() if source in filenames}, stats
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            pool, cls._pool = cls._pool, None
+            cls._settings = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+def pool_stat(key):
+    # 浏览器池的实时状态，采集指标时读取
+    stats = WebDriverPool.stats()
+    if stats is None:
+        return 0
+    return stats['idle'] + stats['busy'] if key == 'live' else stats[key]
+
+CHROME_INSTANCES.set_function(lambda: pool_stat('live'))
+DRIVER_WAITERS.set_function(lambda: pool_stat('waiters'))
+RENDERS_IN_FLIGHT.set_function(lambda: pool_stat('in_flight'))
+CHROME_RSS.set_function(lambda: WebDriverPool.memory()[0] or 0)
 
 class WechatArticleCrawler:
+    _http_fetcher = None
+    _http_fetcher_lock = threading.Lock()
+    _image_downloader = None
+    _image_downloader_lock = threading.Lock()
+    _image_stores = {}
+    _image_stores_lock = threading.Lock()
+    _article_indexes = {}
+    _article_indexes_lock = threading.Lock()
+    _search_indexes = {}
+    _search_indexes_lock = threading.Lock()
+    _simhash_indexes = {}
+    _simhash_indexes_lock = threading.Lock()
+    _rate_limiter = None
+    _rate_limiter_lock = threading.Lock()
+
     def __init__(self):
         self.config = Config()
 
-    def process_url(self, url):
-        try:
-            driver = WebDriverSingleton.get_driver()
-            driver.get(url)
-            
-            # 等待文章标题加载
-            title_element = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "rich_media_title"))
-            )
-            title = title_element.text.strip()
-            
-            # 等待并获取作者名称
-            author_element = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "rich_media_meta_nickname"))
-            )
-            author = author_element.text.strip()
+    @classmethod
+    def get_rate_limiter(cls):
+        # 文章页面、浏览器渲染和图片下载共用同一个按域名限速器
+        with cls._rate_limiter_lock:
+            if cls._rate_limiter is None:
+                cls._rate_limiter = HostRateLimiter.from_config(Config().config)
+            return cls._rate_limiter
 
-            # 等待文章发布时间加载
-            publish_time_element = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "publish_time"))
+    @classmethod
+    def get_http_fetcher(cls, settings):
+        # 所有请求共享同一个 HTTP 连接池
+        rate_limiter = cls.get_rate_limiter()
+        with cls._http_fetcher_lock:
+            if cls._http_fetcher is None:
+                cls._http_fetcher = HttpArticleFetcher(rate_limiter=rate_limiter, **settings)
+            return cls._http_fetcher
+
+    @classmethod
+    def get_image_downloader(cls, settings):
+        rate_limiter = cls.get_rate_limiter()
+        with cls._image_downloader_lock:
+            if cls._image_downloader is None:
+                cls._image_downloader = ImageDownloader(rate_limiter=rate_limiter, **settings)
+            return cls._image_downloader
+
+    @classmethod
+    def get_image_store(cls, base_dir):
+        # 每个保存根目录下有一个共享的图片库
+        root = os.path.join(base_dir, '.images')
+        with cls._image_stores_lock:
+            if root not in cls._image_stores:
+                cls._image_stores[root] = ImageStore(root)
+            return cls._image_stores[root]
+
+    @classmethod
+    def get_article_index(cls, base_dir):
+        # 每个保存根目录下有一个已保存文章的索引
+        with cls._article_indexes_lock:
+            if base_dir not in cls._article_indexes:
+                cls._article_indexes[base_dir] = ArticleIndex.for_save_path(base_dir)
+            return cls._article_indexes[base_dir]
+
+    @classmethod
+    def get_search_index(cls, base_dir):
+        # 每个保存根目录下有一个全文索引
+        with cls._search_indexes_lock:
+            if base_dir not in cls._search_indexes:
+                cls._search_indexes[base_dir] = SearchIndex.for_save_path(base_dir)
+            return cls._search_indexes[base_dir]
+
+    @classmethod
+    def get_simhash_index(cls, base_dir, similarity=0.95):
+        # 每个保存根目录下有一个正文指纹索引，用于识别转载的重复文章
+        with cls._simhash_indexes_lock:
+            if base_dir not in cls._simhash_indexes:
+                cls._simhash_indexes[base_dir] = SimHashIndex.for_save_path(
+                    base_dir, max_distance_for(similarity)
+                )
+            return cls._simhash_indexes[base_dir]
+
+    def get_base_dir(self, custom_path=None):
+        # 获取基础保存路径，如果提供了自定义路径则使用自定义路径
+        base_dir = custom_path or self.config.get_save_path()
+        
+        # 规范化路径
+        base_dir = os.path.normpath(base_dir)
+        
+        # 确保目录存在
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+        return base_dir
+
+    def find_saved_article(self, url, custom_path=None):
+        # 查询该链接是否已经保存过，命中时返回索引记录
+        return self.get_article_index(self.get_base_dir(custom_path)).lookup(url)
+
+    def find_duplicate(self, article, custom_path=None, timings=None):
+        # 按正文指纹查找内容几乎相同的已保存文章，命中时返回 {'filepath', 'url', 'distance', 'similarity'}
+        # 指纹保存在 article['simhash'] 中，保存文章时直接写入索引
+        settings = self.config.get_dedup_settings()
+        if not settings['enabled']:
+            return None
+        stage_start = time.perf_counter()
+        fingerprint = article_fingerprint(article, settings['min_chars'])
+        article['simhash'] = fingerprint
+        duplicate = None
+        if fingerprint:
+            base_dir = self.get_base_dir(custom_path)
+            # 重新保存同一篇文章时不与它自己的旧文件比较
+            _, filepath, _, _ = article_location(base_dir, article)
+            duplicate = self.get_simhash_index(base_dir, settings['similarity']).find(
+                fingerprint[0], exclude=os.path.abspath(filepath)
             )
-            publish_time = publish_time_element.text.strip()
-            
-            # 提取发布日期
-            publish_date = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', publish_time)
-            if publish_date:
-                year = publish_date.group(1)
-                month = publish_date.group(2).zfill(2)
-                day = publish_date.group(3).zfill(2)
-                publish_date = f"{year}{month}{day}"
-            else:
-                publish_date = None
+        if timings is not None:
+            timings['dedup'] = time.perf_counter() - stage_start
+        return duplicate
+
+    def get_article_content(self, url, timings=None):
+        # 优先使用 HTTP 请求解析，缺少必要字段时再回退到浏览器渲染
+        # timings 不为 None 时记录页面获取（render）和字段提取（extract）耗时
+        if self.config.get_http_first():
+            fetcher = self.get_http_fetcher(self.config.get_http_fetch_settings())
+            article, missing = fetcher.fetch(url, timings)
+            if article and not missing:
+                article['tier'] = 'http'
+                return article
+            logger.info(f"HTTP 抓取缺少字段 {missing}，改用浏览器渲染")
+            HTTP_FALLBACKS.inc()
+
+        article = self.get_article_content_selenium(url, timings)
+        if article:
+            article['tier'] = 'selenium'
+        return article
+
+    def process_url(self, url, timings=None):
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        timings = {} if timings is None else timings
+        # 先等待限流再借出浏览器，域名暂停期间不占用浏览器，其他域名的请求不受影响
+        timings['throttle'] = timings.get('throttle', 0) + self.get_rate_limiter().acquire(url)
+        stage_start = time.perf_counter()
+        with WebDriverPool.lease() as driver:
+            timings['checkout'] = time.perf_counter() - stage_start
+            DRIVER_CHECKOUT_WAIT.observe(timings['checkout'])
+            round_trips = driver.round_trips
+            stage_start = time.perf_counter()
+            driver.get(url)
             
-            # 等待文章内容加载
-            content_element = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "rich_media_content"))
-            )
+            # 等待文章内容容器出现且 DOM 解析完成：多标签页模式下 get 不等待页面加载，
+            # 只等容器出现时正文可能仍在传输，读取到的内容不完整
+            try:
+                WebDriverWait(driver, 10).until(lambda d: d.execute_script(PAGE_READY_SCRIPT))
+            except Exception:
+                # 超时时检查是否为验证页面，是则让该域名暂停并降速
+                try:
+                    blocked = looks_blocked(driver.page_source)
+                except Exception:
+                    blocked = False
+                self.get_rate_limiter().report(url, blocked=blocked)
+                raise
+            self.get_rate_limiter().report(url)
+            timings['render'] = time.perf_counter() - stage_start
             
-            # 获取HTML内容而不是纯文本
-            content_html = content_element.get_attribute('innerHTML')
+            stage_start = time.perf_counter()
+            transfer_bytes = None
+            if self.config.get_extract_mode() == 'page_source':
+                # 取回渲染后的页面源码，在本地解析
+                article = parse_article_html(driver.page_source, url)
+            else:
+                # 一次 execute_script 取回所有字段、正文 HTML 和图片地址
+                fields = driver.execute_script(EXTRACT_SCRIPT)
+                article = {
+                    'title': fields['title'],
+                    'author': fields['author'],
+                    'publish_date': parse_publish_date(fields['publish_time']),
+                    'content_html': fields['content_html'],
+                    'image_urls': fields['image_urls'],
+                    'url': url
+                }
+                transfer_bytes = fields.get('transfer_bytes')
+            timings['extract'] = time.perf_counter() - stage_start
             
-            # 获取所有图片的URL
-            images = content_element.find_elements(By.TAG_NAME, "img")
-            image_urls = [img.get_attribute('data-src') for img in images if img.get_attribute('data-src')]
+            profile = getattr(driver, 'profile', 'full')
+            avg_render, avg_bytes = WebDriverPool.record_render(profile, timings['render'], transfer_bytes)
+            transferred = f"{transfer_bytes / 1024:.1f} KB" if transfer_bytes is not None else "未知"
+            logger.debug(f"页面渲染 {timings['render']:.2f} 秒，传输 {transferred}（{profile}，"
+                        f"平均 {avg_render:.2f} 秒 / {avg_bytes / 1024:.1f} KB）")
             
-            return {
-                'title': title,
-                'author': author,
-                'publish_date': publish_date,
-                'content_html': content_html,
-                'image_urls': image_urls,
-                'url': url
-            }
-        except Exception as e:
-            raise e
+            article['webdriver_round_trips'] = driver.round_trips - round_trips
+            annotate(webdriver_round_trips=article['webdriver_round_trips'], transfer_bytes=transfer_bytes)
+            logger.debug(f"WebDriver 往返次数: {article['webdriver_round_trips']}，图片 {len(article['image_urls'])} 张")
+            return article
 
-    def get_article_content_selenium(self, url):
+    def get_article_content_selenium(self, url, timings=None):
         try:
-            return self.process_url(url)
+            return self.process_url(url, timings)
         except Exception as e:
-            print(f"抓取文章失败: {str(e)}")
+            # 页面结构变化导致 WebDriverWait 超时时，这里会出现 TimeoutException
+            FETCH_ERRORS.labels(tier='selenium', error=type(e).__name__).inc()
+            annotate(fetch_error=f"{type(e).__name__}: {str(e)}")
+            logger.warning(f"抓取文章失败: {str(e)}")
             return None
 
-    def save_article(self, article, custom_path=None):
+    def save_article(self, article, custom_path=None, timings=None):
+        # timings 不为 None 时记录各阶段耗时（秒）
+        timings = {} if timings is None else timings
         try:
-            # 获取基础保存路径
-            base_dir = self.config.get_save_path()
-            
-            if custom_path:
-                # 如果提供了自定义路径,使用自定义路径
-                base_dir = custom_path
-            
-            # 规范化路径
-            base_dir = os.path.normpath(base_dir)
+            base_dir = self.get_base_dir(custom_path)
             
-            # 确保目录存在
-            if not os.path.exists(base_dir):
-                os.makedirs(base_dir)
-            
-            # 清理作者名称和文章标题中的非法字符
-            author_name = re.sub(r'[\\/*?:"<>|]', "", article['author'])
-            article_title = re.sub(r'[\\/*?:"<>|]', "", article['title'])
-            
-            if article['publish_date']:
-                date_prefix = article['publish_date']
-                # 从发布日期中提取年月日
-                year = date_prefix[:4]
-                month = date_prefix[4:6]
-                day = date_prefix[6:8]
-            else:
-                # 如果没有发布日期,则使用当前日期
-                now = datetime.now()
-                date_prefix = now.strftime('%Y%m%d')
-                year = now.strftime('%Y')
-                month = now.strftime('%m')
-                day = now.strftime('%d')
-            
-            # 创建层级目录结构：作者/年/月/日
-            article_dir = os.path.join(base_dir, author_name, year, month, day)
+            # 层级目录结构：作者/年/月/日，没有发布日期时使用当前日期
+            article_dir, filepath, author_name, date_prefix = article_location(base_dir, article)
             if not os.path.exists(article_dir):
                 os.makedirs(article_dir)
-            logger.info(f"创建路径: {article_dir}")
+            logger.debug(f"创建路径: {article_dir}")
             
             # 创建 images 目录在日期目录下
             images_dir = os.path.join(article_dir, 'images')
             if not os.path.exists(images_dir):
                 os.makedirs(images_dir)
             
-            # 下载图片时使用正确的路径
-            image_map = {}
-            logger.info(f"开始下载图片")
-            for i, img_url in enumerate(article['image_urls']):
-                try:
-                    response = requests.get(img_url, stream=True)
-                    if response.status_code == 200:
-                        # 使用时间戳命名图片
-                        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-                        img_filename = f"image_{timestamp}.jpg"
-                        img_path = os.path.join(images_dir, img_filename)
-                        with open(img_path, 'wb') as f:
-                            f.write(response.content)
-                        # 在 Markdown 中使用相对路径
-                        image_map[img_url] = f"./images/{img_filename}"
-                except Exception as e:
-                    print(f"下载图片失败 {img_url}: {str(e)}")
+            # 并发下载图片，按内容哈希存入图片库并链接到 images 目录；需要压缩时先不链接
+            logger.debug("开始下载图片")
+            stage_start = time.perf_counter()
+            downloader = self.get_image_downloader(self.config.get_image_download_settings())
+            store = self.get_image_store(base_dir)
+            optimize = ImagePool.enabled()
+            result = downloader.download_all(
+                article['image_urls'],
+                None if optimize else images_dir,
+                store
+            )
+            logger.debug(f"图片下载完成: {result.summary()}")
+            annotate(images=len(article['image_urls']), images_saved=len(result.files),
+                     image_failures=len(result.failures), image_bytes=result.bytes)
+            ARTICLE_IMAGES.observe(len(article['image_urls']))
+            ARTICLE_IMAGE_BYTES.observe(result.bytes)
+            if result.failures:
+                IMAGE_FAILURES.inc(len(result.failures))
+            timings['images'] = time.perf_counter() - stage_start
             
-            content_html = article['content_html']
-            soup = BeautifulSoup(content_html, 'html.parser')
+            # 在进程池中重新压缩图片、生成缩略图，Markdown 指向压缩后的文件
+            files = result.files
+            if optimize and files:
+                stage_start = time.perf_counter()
+                files, stats = ImagePool.optimize(store, files, images_dir)
+                timings['optimize'] = time.perf_counter() - stage_start
+                logger.debug(f"图片压缩完成: {stats}")
+                annotate(images_optimized=stats['optimized'], image_bytes_optimized=stats['bytes_after'],
+                         image_bytes_before_optimize=stats['bytes_before'])
             
-            for img in soup.find_all('img'):
-                src = img.get('data-src') or img.get('src')
-                if src in image_map:
-                    new_path = image_map[src]
-                    markdown_img = f'\n\n![image]({new_path})\n\n'
-                    img.replace_with(BeautifulSoup(markdown_img, 'html.parser'))
+            # 在 Markdown 中使用相对路径
+            image_map = {url: f"./images/{filename}" for url, filename in files.items()}
             
-            content_html = str(soup)
+            stage_start = time.perf_counter()
+            # 单次遍历完成图片路径替换和 Markdown 转换
+            markdown_content = ConversionPool.convert(article, image_map, self.config.get_markdown_converter())
+            timings['convert'] = time.perf_counter() - stage_start
             
-            h = html2text.HTML2Text()
-            h.ignore_links = False
-            h.ignore_images = False
-            h.ignore_emphasis = False
-            h.body_width = 0
-            h.unicode_snob = True
+            stage_start = time.perf_counter()
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(markdown_content)
             
-            content_markdown = h.handle(content_html)
+            # 保存抓取结果快照，之后修改转换方式时可用 rerender.py 离线重新生成
+            if self.config.get_snapshots_enabled():
+                write_snapshot(filepath, article, image_map)
             
-            markdown_content = f"""# {article['title']}
-
-> 原文链接：{article['url']}
-
-{content_markdown}"""
+            # 记录到文章索引，之后相同链接的请求直接返回
+            filepath = os.path.abspath(filepath)
+            self.get_article_index(base_dir).record(
+                article['url'], article['title'], article['author'],
+                article['publish_date'], filepath, content_hash(markdown_content)
+            )
+            timings['write'] = time.perf_counter() - stage_start
             
-            # 更新文件保存路径
-            filepath = os.path.join(article_dir, f"{article_title}.md")
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
+            # 更新全文索引，失败不影响保存结果
+            stage_start = time.perf_counter()
+            try:
+                self.get_search_index(base_dir).add_document(
+                    filepath, article['url'], article['title'], author_name,
+                    date_prefix, markdown_content
+                )
+            except Exception as e:
+                logger.warning(f"更新全文索引失败 {filepath}: {str(e)}")
+            timings['search_index'] = time.perf_counter() - stage_start
+            
+            # 记录正文指纹，之后内容相同的转载文章直接指向这篇
+            settings = self.config.get_dedup_settings()
+            if settings['enabled']:
+                fingerprint = article.get('simhash') or article_fingerprint(article, settings['min_chars'])
+                if fingerprint:
+                    try:
+                        self.get_simhash_index(base_dir, settings['similarity']).add(
+                            filepath, article['url'], *fingerprint
+                        )
+                    except Exception as e:
+                        logger.warning(f"更新指纹索引失败 {filepath}: {str(e)}")
                 
-            print(f"文章已保存为 Markdown 文件: {filepath}")
+            logger.debug(f"文章已保存为 Markdown 文件: {filepath}")
             return filepath
         except Exception as e:
-            print(f"保存文章失败: {str(e)}")
+            annotate(save_error=f"{type(e).__name__}: {str(e)}")
+            logger.exception(f"保存文章失败: {str(e)}")
             return None
 
+@app.before_request
+def track_request_start():
+    INFLIGHT_REQUESTS.inc()
+
+@app.teardown_request
+def track_request_end(error=None):
+    INFLIGHT_REQUESTS.dec()
+
 @app.after_request
 def set_response_headers(response):
-    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    # 只为 JSON 响应补充编码，/metrics 等其他类型保持原样
+    if response.mimetype == 'application/json':
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
     return response
 
+class ArticleError(Exception):
+    pass
+
+def saved_article_result(url, save_path=None):
+    # 查询文章索引，链接已保存过时返回与保存结果相同格式的响应，否则返回 None
+    saved = WechatArticleCrawler().find_saved_article(url, save_path)
+    if not saved:
+        return None
+    logger.info(f"文章已存在: {saved['filepath']}")
+    return {
+        'message': '文章已存在',
+        'filepath': saved['filepath'],
+        'title': saved['title'],
+        'tier': 'index',
+        'deduplicated': False
+    }
+
+def archive_article(url, save_path=None, force=False, timings=None):
+    # 完整的保存流程：查询索引、抓取文章、下载图片并写入 Markdown
+    timings = {} if timings is None else timings
+    crawler = WechatArticleCrawler()
+    
+    # 已保存过的链接直接返回，force 时强制重新抓取
+    if not force:
+        stage_start = time.perf_counter()
+        saved = saved_article_result(url, save_path)
+        timings['lookup'] = time.perf_counter() - stage_start
+        if saved:
+            return saved
+        
+    logger.info(f"开始抓取文章: {url}")
+    stage_start = time.perf_counter()
+    article = crawler.get_article_content(url, timings)
+    timings['fetch'] = time.perf_counter() - stage_start
+    
+    if not article:
+        raise ArticleError('文章抓取失败')
+        
+    logger.debug(f"文章抓取方式: {article['tier']}")
+    
+    # 正文与已保存的文章几乎相同（转载）时不再重复保存，把链接指向已有的文件；force 时总是保存
+    duplicate = None if force else crawler.find_duplicate(article, save_path, timings)
+    if duplicate:
+        logger.info(f"文章与已保存的文章重复（相似度 {duplicate['similarity']}）: {duplicate['filepath']}")
+        crawler.get_article_index(crawler.get_base_dir(save_path)).record(
+            article['url'], article['title'], article['author'],
+            article['publish_date'], duplicate['filepath'], None
+        )
+        annotate(duplicate_of=duplicate['filepath'], similarity=duplicate['similarity'])
+        return {
+            'message': '文章与已保存的文章重复',
+            'filepath': duplicate['filepath'],
+            'title': article['title'],
+            'tier': article['tier'],
+            'deduplicated': True,
+            'duplicate_of': duplicate['filepath'],
+            'duplicate_url': duplicate['url'],
+            'similarity': duplicate['similarity']
+        }
+    
+    logger.debug("开始保存文章")
+    filepath = crawler.save_article(article, save_path, timings)
+    
+    if not filepath:
+        raise ArticleError('文章保存失败')
+        
+    logger.info(f"文章保存成功: {filepath}")
+    return {
+        'message': '文章保存成功',
+        'filepath': filepath,
+        'title': article['title'],
+        'tier': article['tier'],
+        'deduplicated': False
+    }
+
+class JobService:
+    _manager = None
+    _lock = threading.Lock()
+    _profiler = None
+    _profile_jobs = set()
+    _profile_lock = threading.Lock()
+
+    @staticmethod
+    def job_key(url, save_path):
+        # 规范化后的链接和实际保存目录相同的请求视为同一个任务
+        base_dir = os.path.abspath(save_path or Config().get_save_path())
+        return normalize_url(url), base_dir
+
+    @classmethod
+    def get_profiler(cls):
+        with cls._profile_lock:
+            if cls._profiler is None:
+                settings = Config().get_profiling_settings()
+                cls._profiler = RequestProfiler(
+                    settings['profile_dir'],
+                    slow_threshold=settings['slow_threshold'],
+                    sample_interval=settings['sample_interval'],
+                    max_profiles=settings['max_profiles'],
+                    always=settings['always']
+                )
+            return cls._profiler
+
+    @classmethod
+    def request_profile(cls, job_id):
+        # 作为 submit 的 on_create 回调：只有新建的任务使用 cProfile 分析，合并到已有任务时不生效
+        with cls._profile_lock:
+            cls._profile_jobs.add(job_id)
+
+    @classmethod
+    def run_job(cls, job, timings):
+        # 按需分析性能：管理员请求或配置 always 时使用 cProfile，否则对超过 slow_threshold 的任务采样保存
+        with cls._profile_lock:
+            requested = job['id'] in cls._profile_jobs
+            cls._profile_jobs.discard(job['id'])
+        return cls.get_profiler().run(
+            job['id'], lambda: cls.archive_job(job, timings),
+            force=requested, url=job['url'], requested=requested, timings=timings
+        )
+
+    @staticmethod
+    def archive_job(job, timings):
+        # 每个任务输出一行 JSON 请求日志，请求 ID 即任务 ID
+        JOBS_RUNNING.inc()
+        start = time.perf_counter()
+        with request_log(job['id'], url=job['url'], force=job['force']) as entry:
+            try:
+                result = archive_article(job['url'], job['save_path'], job['force'], timings)
+            except Exception as e:
+                ARTICLES_TOTAL.labels(result='failed').inc()
+                ARTICLE_ERRORS.labels(error=type(e).__name__).inc()
+                raise
+            else:
+                if result['tier'] == 'index':
+                    outcome = 'existing'
+                elif result['deduplicated']:
+                    outcome = 'deduplicated'
+                else:
+                    outcome = 'saved'
+                ARTICLES_TOTAL.labels(result=outcome).inc()
+                entry.update(outcome=outcome, tier=result['tier'], filepath=result['filepath'])
+                return result
+            finally:
+                JOBS_RUNNING.dec()
+                for stage, seconds in timings.items():
+                    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+                STAGE_SECONDS.labels(stage='total').observe(time.perf_counter() - start)
+                entry['stages'] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+
+    @classmethod
+    def get_manager(cls):
+        # 首次使用时启动后台工作线程，并恢复上次未完成的任务
+        with cls._lock:
+            if cls._manager is None:
+                settings = Config().get_job_settings()
+                logger.info(f"启动任务队列: {settings}")
+                cls._manager = JobManager(
+                    JobStore(settings['db_path']), cls.run_job, settings['workers'],
+                    key_func=cls.job_key,
+                    result_ttl=settings['result_ttl'],
+                    on_coalesce=lambda kind: COALESCED_REQUESTS.labels(kind=kind).inc()
+                )
+                cls._manager.start()
+            return cls._manager
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            manager, cls._manager = cls._manager, None
+        if manager is not None:
+            manager.shutdown()
+
+def resolve_save_path(save_path):
+    # 返回 (规范化后的路径, 错误信息)
+    if not save_path:
+        return None, None
+    logger.info(f"使用自定义保存路径: {save_path}")
+    # 确保路径是绝对路径
+    save_path = os.path.abspath(save_path)
+    
+    # 检查路径是否合法
+    if not os.access(os.path.dirname(save_path), os.W_OK):
+        return None, '指定的保存路径无法访问或没有写入权限'
+    return save_path, None
+
+def job_response(job):
+    return {
+        'id': job['id'],
+        'url': job['url'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'timings': job['timings'],
+        'filepath': job['result']['filepath'] if job['result'] else None,
+        'result': job['result'],
+        'error': job['error']
+    }
+
 @app.route('/save', methods=['GET'])
 def save_article():
     try:
@@ -261,44 +1106,140 @@ def save_article():
             logger.warning("未提供文章URL")
             return jsonify({'error': '请提供文章URL'}), 400
             
-        save_path = request.args.get('path')
-        if save_path:
-            logger.info(f"使用自定义保存路径: {save_path}")
-            # 确保路径是绝对路径
-            save_path = os.path.abspath(save_path)
-            
-            # 检查路径是否合法
-            if not os.access(os.path.dirname(save_path), os.W_OK):
-                return jsonify({'error': '指定的保存路径无法访问或没有写入权限'}), 400
-            
-        logger.info(f"开始抓取文章: {url}")
-        crawler = WechatArticleCrawler()
-        article = crawler.get_article_content_selenium(url)
+        save_path, error = resolve_save_path(request.args.get('path'))
+        if error:
+            return jsonify({'error': error}), 400
         
-        if not article:
-            logger.error("文章抓取失败")
-            return jsonify({'error': '文章抓取失败'}), 500
-            
-        logger.info("开始保存文章")
-        filepath = crawler.save_article(article, save_path)
+        # 预热已开始时不做任何事
+        WebDriverPool.start_warmup()
         
-        if not filepath:
-            logger.error("文章保存失败")
-            return jsonify({'error': '文章保存失败'}), 500
-            
-        logger.info(f"文章保存成功: {filepath}")
-        return jsonify({
-            'message': '文章保存成功',
-            'filepath': filepath,
-            'title': article['title']
-        }), 200
+        # 管理员可通过 X-Profile: 1 请求头对本次保存进行 cProfile 分析（结果见 /profiles）
+        profile = request.headers.get('X-Profile') == '1'
+        if profile and not is_admin():
+            return jsonify({'error': '只有管理员可以开启性能分析'}), 403
+        
+        # 已保存过的链接直接返回，不排在正在抓取的任务后面
+        force = request.args.get('force') == '1'
+        if not force:
+            stage_start = time.perf_counter()
+            saved = saved_article_result(url, save_path)
+            lookup = time.perf_counter() - stage_start
+            if saved:
+                # 与任务一样输出一行请求日志
+                with request_log(uuid.uuid4().hex, url=url, force=force) as entry:
+                    ARTICLES_TOTAL.labels(result='existing').inc()
+                    STAGE_SECONDS.labels(stage='lookup').observe(lookup)
+                    entry.update(outcome='existing', tier=saved['tier'], filepath=saved['filepath'],
+                                 stages={'lookup': round(lookup, 4)})
+                return jsonify(saved), 200
+        
+        # 其余请求提交任务并等待其完成
+        manager = JobService.get_manager()
+        job_id = manager.submit(url, save_path, force,
+                                on_create=JobService.request_profile if profile else None)
+        job = manager.wait(job_id, Config().get_job_settings()['sync_timeout'])
+        
+        if job['status'] == DONE:
+            return jsonify(job['result']), 200
+        if job['status'] == FAILED:
+            logger.error(job['error'])
+            return jsonify({'error': job['error']}), 500
+        # 超时仍未完成时返回任务 ID，客户端可以继续查询
+        return jsonify({'message': '文章仍在处理中', 'job_id': job_id}), 202
         
     except Exception as e:
         logger.exception(f"处理请求时发生错误: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs', methods=['POST'])
+def create_jobs():
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+    if not urls or not all(isinstance(url, str) and url for url in urls):
+        return jsonify({'error': '请提供文章URL'}), 400
+        
+    save_path, error = resolve_save_path(data.get('path'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    manager = JobService.get_manager()
+    force = bool(data.get('force'))
+    jobs = [{'id': manager.submit(url, save_path, force), 'url': url} for url in urls]
+    logger.info(f"已提交 {len(jobs)} 个任务")
+    return jsonify({'jobs': jobs}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JobService.get_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job_response(job)), 200
+
+@app.route('/search', methods=['GET'])
+def search_articles():
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': '请提供检索词'}), 400
+        
+    save_path, error = resolve_save_path(request.args.get('path'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit 和 offset 必须是整数'}), 400
+    
+    crawler = WechatArticleCrawler()
+    index = crawler.get_search_index(crawler.get_base_dir(save_path))
+    hits = index.search(
+        query,
+        author=request.args.get('author'),
+        date_from=request.args.get('from'),
+        date_to=request.args.get('to'),
+        limit=limit,
+        offset=offset
+    )
+    return jsonify({'query': query, 'count': len(hits), 'hits': hits}), 200
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # 就绪检查：浏览器预热结束（或未开启预热）后返回 200。
+    # 未通过 app.py 启动时（其他 WSGI 服务器、测试客户端）在首次检查时开始预热
+    WebDriverPool.start_warmup()
+    status = WebDriverPool.warmup_status()
+    status['ready'] = status['state'] == 'ready'
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def is_admin():
+    # 管理员令牌在 config.ini 的 [Profiling] admin_token 中配置，未配置时没有管理员
+    token = Config().get_profiling_settings()['admin_token']
+    provided = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(provided.encode('utf-8'), token.encode('utf-8'))
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    # 最近的性能分析结果（慢请求自动采样和管理员请求的 cProfile），每份附带累计耗时最多的函数
+    if not is_admin():
+        return jsonify({'error': '需要管理员令牌'}), 403
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    top = min(max(request.args.get('top', 10, type=int), 1), 50)
+    profiles = JobService.get_profiler().recent(limit, top)
+    return jsonify({'count': len(profiles), 'profiles': profiles}), 200
+
 if __name__ == '__main__':
     try:
+        ConversionPool.get_pool()
+        ImagePool.get_pool()
+        WebDriverPool.start_warmup()
         app.run(host='0.0.0.0', port=5001)
     finally:
-        WebDriverSingleton.quit_driver()
+        JobService.shutdown()
+        ConversionPool.shutdown()
+        ImagePool.shutdown()
+        WebDriverPool.quit_driver()
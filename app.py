@@ -1,4 +1,4 @@
-from FavoriteArticlesWeb import app, WebDriverSingleton
+from FavoriteArticlesWeb import app, WebDriverPool, JobService, ConversionPool, ImagePool
 from waitress import serve
 import logging
 
@@ -6,9 +6,19 @@ logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
     try:
+        # 先启动转换进程池，再启动其他线程，子进程不会继承正在运行的线程状态
+        ConversionPool.get_pool()
+        ImagePool.get_pool()
+        # 启动后台任务线程，恢复上次未完成的任务
+        JobService.get_manager()
+        # 后台预热浏览器，/ready 在预热结束后返回 200
+        WebDriverPool.start_warmup()
         logger.info("正在启动应用服务器...")
         serve(app, host='0.0.0.0', port=5000)
     except Exception as e:
         logger.error(f"服务器启动失败: {str(e)}") 
     finally:
-        WebDriverSingleton.quit_driver()
\ No newline at end of file
+        JobService.shutdown()
+        ConversionPool.shutdown()
+        ImagePool.shutdown()
+        WebDriverPool.quit_driver()
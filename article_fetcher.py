@@ -0,0 +1,128 @@
+import logging
+import re
+import time
+from datetime import datetime, timezone, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import looks_blocked
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+logger = logging.getLogger(__name__)
+
+# 缺少任一字段时需要回退到浏览器渲染
+REQUIRED_FIELDS = ('title', 'author', 'publish_date', 'content_html')
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# 公众号文章时间统一按北京时间计算
+CHINA_TZ = timezone(timedelta(hours=8))
+
+
+def parse_publish_date(text):
+    # 支持 "2024年1月2日" 和 "2024-01-02" 两种格式，返回 YYYYMMDD
+    if not text:
+        return None
+    match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', text) or \
+        re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', text)
+    if not match:
+        return None
+    return f"{match.group(1)}{match.group(2).zfill(2)}{match.group(3).zfill(2)}"
+
+
+def _publish_date_from_script(html):
+    # 静态页面中 publish_time 由脚本填充，时间戳保存在 `var ct = "..."` 中
+    match = re.search(r'var\s+ct\s*=\s*"(\d{9,10})"', html) or \
+        re.search(r'create_time\s*[:=]\s*[\'"]?(\d{9,10})', html)
+    if not match:
+        return None
+    return datetime.fromtimestamp(int(match.group(1)), CHINA_TZ).strftime('%Y%m%d')
+
+
+def parse_article_html(html, url):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, PARSER)
+
+    title_element = soup.find(class_='rich_media_title')
+    title = title_element.get_text().strip() if title_element else None
+
+    author_element = soup.find(class_='rich_media_meta_nickname')
+    author = author_element.get_text().strip() if author_element else None
+
+    publish_time_element = soup.find(id='publish_time')
+    publish_date = parse_publish_date(publish_time_element.get_text()) if publish_time_element else None
+    if not publish_date:
+        publish_date = _publish_date_from_script(html)
+
+    content_element = soup.find(class_='rich_media_content')
+    content_html = None
+    image_urls = []
+    if content_element:
+        content_html = content_element.decode_contents().strip() or None
+        image_urls = [img['data-src'] for img in content_element.find_all('img') if img.get('data-src')]
+
+    return {
+        'title': title or None,
+        'author': author or None,
+        'publish_date': publish_date,
+        'content_html': content_html,
+        'image_urls': image_urls,
+        'url': url
+    }
+
+
+def missing_fields(article):
+    return [field for field in REQUIRED_FIELDS if not article.get(field)]
+
+
+class HttpArticleFetcher:
+    def __init__(self, timeout=10, pool_size=10, headers=None, rate_limiter=None):
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url, timings=None):
+        # 返回 (article, 缺失字段列表)；请求失败时 article 为 None
+        timings = {} if timings is None else timings
+        if self.rate_limiter:
+            # 等待令牌的时间单独记录，不计入页面获取耗时
+            timings['throttle'] = timings.get('throttle', 0) + self.rate_limiter.acquire(url)
+        stage_start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.info(f"HTTP 抓取失败 {url}: {str(e)}")
+            return None, list(REQUIRED_FIELDS)
+
+        # 未声明编码时 requests 会默认使用 ISO-8859-1，公众号页面实际为 UTF-8
+        if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = 'utf-8'
+        html = response.text
+        if self.rate_limiter:
+            self.rate_limiter.report(url, response.status_code, blocked=looks_blocked(html))
+
+        if response.status_code != 200:
+            logger.info(f"HTTP 抓取失败 {url}: 状态码 {response.status_code}")
+            return None, list(REQUIRED_FIELDS)
+        timings['render'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        article = parse_article_html(html, url)
+        timings['extract'] = time.perf_counter() - stage_start
+        return article, missing_fields(article)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,194 @@
+import argparse
+import configparser
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = '.article_index.db'
+
+# 公众号长链接中真正标识文章的参数，其余（scene、chksm 等）都是分享来源信息
+WECHAT_ARTICLE_PARAMS = ('__biz', 'mid', 'idx', 'sn')
+TRACKING_PARAMS = ('scene', 'chksm', 'srcid', 'sharer_sharetime', 'sharer_shareid',
+                   'from', 'isappinstalled', 'clicktime', 'enterid', 'ascene', 'devicetype',
+                   'version', 'nettype', 'lang', 'exportkey', 'pass_ticket', 'wx_header')
+
+
+def normalize_url(url):
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    path = parsed.path.rstrip('/') or '/'
+    params = parse_qsl(parsed.query, keep_blank_values=True)
+
+    if host == 'mp.weixin.qq.com' and path == '/s':
+        params = sorted((k, v) for k, v in params if k in WECHAT_ARTICLE_PARAMS)
+    elif host == 'mp.weixin.qq.com' and path.startswith('/s/'):
+        params = []
+    else:
+        params = sorted((k, v) for k, v in params
+                        if k not in TRACKING_PARAMS and not k.startswith('utm_'))
+
+    return urlunparse(('https', host, path, '', urlencode(params), ''))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def article_location(base_dir, article, fallback_date=None):
+    # 文章保存位置：作者/年/月/日/标题.md；没有发布日期时使用 fallback_date（默认当天）
+    # 返回 (文章目录, Markdown 文件路径, 作者目录名, YYYYMMDD)
+    author_name = re.sub(r'[\\/*?:"<>|]', "", article['author'])
+    article_title = re.sub(r'[\\/*?:"<>|]', "", article['title'])
+    date = article['publish_date'] or (fallback_date or datetime.now()).strftime('%Y%m%d')
+    article_dir = os.path.join(base_dir, author_name, date[:4], date[4:6], date[6:8])
+    return article_dir, os.path.join(article_dir, f"{article_title}.md"), author_name, date
+
+
+def read_saved_article(save_path, filepath):
+    # 从已保存的 Markdown 文件（作者/年/月/日/标题.md）读取标题、原文链接、作者和日期
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning(f"读取文章失败 {filepath}: {str(e)}")
+        return None
+
+    title = url = None
+    for line in text.splitlines()[:10]:
+        if line.startswith('# ') and title is None:
+            title = line[2:].strip()
+        elif line.startswith('> 原文链接：'):
+            url = line[len('> 原文链接：'):].strip()
+            break
+    if not url:
+        return None
+
+    parts = os.path.relpath(filepath, save_path).split(os.sep)
+    author = publish_date = None
+    if len(parts) == 5:
+        author = parts[0]
+        publish_date = ''.join(parts[1:4])
+    return {
+        'title': title,
+        'url': url,
+        'author': author,
+        'publish_date': publish_date,
+        'text': text,
+        'mtime': os.path.getmtime(filepath)
+    }
+
+
+def iter_saved_files(save_path):
+    # 遍历保存目录中的 Markdown 文件，跳过 images 和隐藏目录
+    for root, dirs, files in os.walk(save_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'images']
+        for name in files:
+            if name.endswith('.md'):
+                yield os.path.join(root, name)
+
+
+class ArticleIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS articles ('
+            'url TEXT PRIMARY KEY, title TEXT, author TEXT, publish_date TEXT, '
+            'filepath TEXT NOT NULL, content_hash TEXT, saved_at REAL)'
+        )
+        self._db.commit()
+
+    @classmethod
+    def for_save_path(cls, save_path):
+        return cls(os.path.join(save_path, INDEX_FILENAME))
+
+    def lookup(self, url):
+        # 命中且文件仍然存在时返回索引记录
+        with self._lock:
+            row = self._db.execute(
+                'SELECT * FROM articles WHERE url = ?', (normalize_url(url),)
+            ).fetchone()
+        if row is None or not os.path.exists(row['filepath']):
+            return None
+        return dict(row)
+
+    def record(self, url, title, author, publish_date, filepath, digest):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO articles '
+                '(url, title, author, publish_date, filepath, content_hash, saved_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (normalize_url(url), title, author, publish_date, filepath, digest, time.time())
+            )
+            self._db.commit()
+
+    def rebuild(self, save_path):
+        # 扫描保存目录（作者/年/月/日/标题.md），从文件头部读取标题和原文链接
+        records = []
+        for filepath in iter_saved_files(save_path):
+            record = self._read_article_file(save_path, filepath)
+            if record:
+                records.append(record)
+
+        with self._lock:
+            # 转载去重记录的链接指向其他文章的文件（content_hash 为空），无法从文件中扫描得到，
+            # 目标文件仍在时保留
+            urls = {record[0] for record in records}
+            filepaths = {record[4] for record in records}
+            aliases = self._db.execute(
+                'SELECT url, title, author, publish_date, filepath, content_hash, saved_at '
+                'FROM articles WHERE content_hash IS NULL'
+            ).fetchall()
+            records += [tuple(row) for row in aliases
+                        if row['url'] not in urls and row['filepath'] in filepaths]
+            self._db.execute('DELETE FROM articles')
+            self._db.executemany(
+                'INSERT OR REPLACE INTO articles '
+                '(url, title, author, publish_date, filepath, content_hash, saved_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                records
+            )
+            self._db.commit()
+        logger.info(f"文章索引重建完成，共 {len(records)} 篇")
+        return len(records)
+
+    @staticmethod
+    def _read_article_file(save_path, filepath):
+        saved = read_saved_article(save_path, filepath)
+        if not saved:
+            return None
+        return (normalize_url(saved['url']), saved['title'], saved['author'], saved['publish_date'],
+                os.path.abspath(filepath), content_hash(saved['text']), saved['mtime'])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == '__main__':
+    config = configparser.ConfigParser()
+    config.read('config.ini', encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description='重建已保存文章的索引')
+    parser.add_argument('save_path', nargs='?',
+                        default=config.get('Path', 'save_path', fallback='articles'),
+                        help='文章保存目录，默认读取 config.ini')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    save_path = os.path.normpath(args.save_path)
+    index = ArticleIndex.for_save_path(save_path)
+    count = index.rebuild(save_path)
+    index.close()
+    print(f"已索引 {count} 篇文章: {index.db_path}")
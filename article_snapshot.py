@@ -0,0 +1,45 @@
+import gzip
+import json
+import os
+import time
+import uuid
+
+# 快照与 Markdown 文件放在同一目录：标题.md -> 标题.snapshot.json.gz
+SNAPSHOT_SUFFIX = '.snapshot.json.gz'
+SNAPSHOT_FIELDS = ('title', 'author', 'publish_date', 'content_html', 'image_urls', 'url')
+
+
+def snapshot_path(markdown_path):
+    return os.path.splitext(markdown_path)[0] + SNAPSHOT_SUFFIX
+
+
+def markdown_path(path):
+    return path[:-len(SNAPSHOT_SUFFIX)] + '.md'
+
+
+def write_snapshot(markdown_file, article, image_map, saved_at=None):
+    # 保存抓取结果和图片映射（图片 URL -> ./images/文件名），先写临时文件再替换；
+    # 临时文件名唯一，同一篇文章被并发保存时不会互相覆盖
+    data = {field: article.get(field) for field in SNAPSHOT_FIELDS}
+    data['image_map'] = image_map
+    data['saved_at'] = saved_at or time.time()
+    path = snapshot_path(markdown_file)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_snapshots(save_path):
+    # 遍历保存目录中的快照，跳过 images 和隐藏目录
+    for root, dirs, files in os.walk(save_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'images']
+        for name in files:
+            if name.endswith(SNAPSHOT_SUFFIX):
+                yield os.path.join(root, name)
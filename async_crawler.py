@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import configparser
+import logging
+import os
+import time
+
+import aiohttp
+
+from article_fetcher import DEFAULT_HEADERS, parse_article_html, missing_fields
+from article_index import ArticleIndex, article_location, content_hash
+from article_snapshot import write_snapshot
+from image_store import ImageStore
+from markdown_converter import render_article
+from rate_limiter import HostRateLimiter, looks_blocked
+from search_index import SearchIndex
+from simhash_index import SimHashIndex, article_fingerprint, max_distance_for
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncArticleCrawler:
+    # 只走 HTTP 的异步抓取引擎：共享连接池抓取文章和图片，解析与写入放在线程池中执行，
+    # 保存结构与 FavoriteArticlesWeb 的 save_article 一致（作者/年/月/日/标题.md + images）
+    def __init__(self, save_path, concurrency=32, image_concurrency=64, timeout=15,
+                 max_image_bytes=20 * 1024 * 1024, converter='fast', snapshots=True,
+                 rate_limiter=None, dedup_similarity=0.95, dedup_min_chars=200):
+        self.save_path = os.path.normpath(save_path)
+        self.concurrency = max(1, concurrency)
+        self.image_concurrency = max(1, image_concurrency)
+        self.timeout = timeout
+        self.max_image_bytes = max_image_bytes
+        self.converter = converter
+        self.snapshots = snapshots
+        self.rate_limiter = rate_limiter
+        self.dedup_min_chars = dedup_min_chars
+        os.makedirs(self.save_path, exist_ok=True)
+        self.image_store = ImageStore(os.path.join(self.save_path, '.images'))
+        self.article_index = ArticleIndex.for_save_path(self.save_path)
+        self.search_index = SearchIndex.for_save_path(self.save_path)
+        # dedup_similarity 为 None 时不检查转载的重复文章
+        self.simhash_index = None
+        if dedup_similarity is not None:
+            self.simhash_index = SimHashIndex.for_save_path(self.save_path, max_distance_for(dedup_similarity))
+
+    async def _throttle(self, url):
+        if self.rate_limiter is None:
+            return
+        while True:
+            wait = self.rate_limiter.reserve(url)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def fetch_page(self, session, url):
+        await self._throttle(url)
+        async with session.get(url) as response:
+            html = await response.text(encoding=response.charset or 'utf-8', errors='replace')
+            if self.rate_limiter:
+                self.rate_limiter.report(url, response.status, blocked=looks_blocked(html))
+            if response.status != 200:
+                raise RuntimeError(f"状态码 {response.status}")
+            return html
+
+    async def fetch_image(self, session, semaphore, url):
+        # 流式写入图片库的临时文件，返回图片库中的路径；已下载过的图片直接复用。
+        # 查询图片库（SQLite）和写文件都在线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        path = await loop.run_in_executor(None, self.image_store.lookup, url)
+        if path is not None:
+            return path
+        async with semaphore:
+            await self._throttle(url)
+            tmp_path = self.image_store.new_temp_path()
+            try:
+                async with session.get(url) as response:
+                    if self.rate_limiter:
+                        self.rate_limiter.report(url, response.status)
+                    response.raise_for_status()
+                    written = 0
+                    f = await loop.run_in_executor(None, open, tmp_path, 'wb')
+                    try:
+                        async for chunk in response.content.iter_chunked(64 * 1024):
+                            written += len(chunk)
+                            if self.max_image_bytes and written > self.max_image_bytes:
+                                raise RuntimeError(f"图片大小超过上限 {self.max_image_bytes} 字节")
+                            await loop.run_in_executor(None, f.write, chunk)
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return await loop.run_in_executor(None, self.image_store.add_file, url, tmp_path)
+
+    async def download_images(self, session, semaphore, image_urls):
+        # 返回 {图片 URL: 图片库路径}，失败的图片不在结果中（Markdown 中保留原始链接）
+        urls = list(dict.fromkeys(image_urls))
+        results = await asyncio.gather(*(self.fetch_image(session, semaphore, url) for url in urls),
+                                       return_exceptions=True)
+        stored = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"下载图片失败 {url}: {type(result).__name__}: {str(result)}")
+                continue
+            stored[url] = result
+        return stored
+
+    def find_duplicate(self, article):
+        # 在线程池中执行：计算正文指纹并查找几乎相同的已保存文章，命中时把链接记录到该文件
+        if self.simhash_index is None:
+            return None
+        fingerprint = article_fingerprint(article, self.dedup_min_chars)
+        article['simhash'] = fingerprint
+        if not fingerprint:
+            return None
+        _, filepath, _, _ = article_location(self.save_path, article)
+        duplicate = self.simhash_index.find(fingerprint[0], exclude=os.path.abspath(filepath))
+        if duplicate:
+            self.article_index.record(
+                article['url'], article['title'], article['author'],
+                article['publish_date'], duplicate['filepath'], None
+            )
+        return duplicate
+
+    def write_article(self, article, stored_images):
+        # 在线程池中执行：链接图片、转换 Markdown、写入文件并更新索引
+        article_dir, filepath, author_name, date = article_location(self.save_path, article)
+        images_dir = os.path.join(article_dir, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+        image_map = {url: f"./images/{self.image_store.link_into(path, images_dir)}"
+                     for url, path in stored_images.items()}
+
+        markdown_content = render_article(article, image_map, self.converter)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(markdown_content)
+        if self.snapshots:
+            write_snapshot(filepath, article, image_map)
+
+        filepath = os.path.abspath(filepath)
+        self.article_index.record(
+            article['url'], article['title'], article['author'],
+            article['publish_date'], filepath, content_hash(markdown_content)
+        )
+        try:
+            self.search_index.add_document(
+                filepath, article['url'], article['title'], author_name, date, markdown_content
+            )
+        except Exception as e:
+            logger.warning(f"更新全文索引失败 {filepath}: {str(e)}")
+        if self.simhash_index is not None:
+            fingerprint = article.get('simhash') or article_fingerprint(article, self.dedup_min_chars)
+            if fingerprint:
+                self.simhash_index.add(filepath, article['url'], *fingerprint)
+        return filepath
+
+    async def crawl_one(self, session, semaphore, image_semaphore, url, force=False):
+        # 返回 (状态, 文件路径或错误信息)，状态为 saved、existing、duplicate 或 failed
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            try:
+                if not force:
+                    saved = await loop.run_in_executor(None, self.article_index.lookup, url)
+                    if saved:
+                        return 'existing', saved['filepath']
+                html = await self.fetch_page(session, url)
+                article = await loop.run_in_executor(None, parse_article_html, html, url)
+                missing = missing_fields(article)
+                if missing:
+                    # 需要浏览器渲染的文章交给 FavoriteArticlesWeb 处理
+                    return 'failed', f"页面缺少字段 {missing}，需要浏览器渲染"
+                # 转载的重复文章不下载图片，直接指向已保存的文件；force 时总是保存
+                if not force:
+                    duplicate = await loop.run_in_executor(None, self.find_duplicate, article)
+                    if duplicate:
+                        return 'duplicate', duplicate['filepath']
+                stored_images = await self.download_images(session, image_semaphore, article['image_urls'])
+                filepath = await loop.run_in_executor(None, self.write_article, article, stored_images)
+                return 'saved', filepath
+            except Exception as e:
+                return 'failed', f"{type(e).__name__}: {str(e)}"
+
+    async def crawl(self, urls, force=False):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        image_semaphore = asyncio.Semaphore(self.image_concurrency)
+        # 所有文章和图片共用一个保持连接的连接池
+        connector = aiohttp.TCPConnector(limit=self.concurrency + self.image_concurrency,
+                                         keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        counts = {'saved': 0, 'existing': 0, 'duplicate': 0, 'failed': 0}
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers=DEFAULT_HEADERS) as session:
+            tasks = [self.crawl_one(session, semaphore, image_semaphore, url, force) for url in urls]
+            for future in asyncio.as_completed(tasks):
+                status, detail = await future
+                counts[status] += 1
+                if status == 'failed':
+                    logger.warning(f"抓取失败: {detail}")
+        return counts
+
+    def close(self):
+        self.image_store.close()
+        self.article_index.close()
+        self.search_index.close()
+        if self.simhash_index is not None:
+            self.simhash_index.close()
+
+
+def read_urls(path):
+    # 每行一个链接，忽略空行、# 开头的注释和重复链接
+    with open(path, 'r', encoding='utf-8') as f:
+        urls = [line.strip() for line in f]
+    return list(dict.fromkeys(url for url in urls if url and not url.startswith('#')))
+
+
+if __name__ == '__main__':
+    config = configparser.ConfigParser()
+    config.read('config.ini', encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description='使用 asyncio 批量抓取只需 HTTP 即可解析的文章')
+    parser.add_argument('url_file', help='链接文件，每行一个链接')
+    parser.add_argument('--save-path', default=config.get('Path', 'save_path', fallback='articles'),
+                        help='文章保存目录，默认读取 config.ini')
+    parser.add_argument('--concurrency', type=int, default=32, help='同时抓取的文章数')
+    parser.add_argument('--image-concurrency', type=int, default=64, help='同时下载的图片数')
+    parser.add_argument('--force', action='store_true', help='重新抓取已保存的文章')
+    parser.add_argument('--no-rate-limit', action='store_true', help='不使用 config.ini 中的 [RateLimit] 限速')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    urls = read_urls(args.url_file)
+    crawler = AsyncArticleCrawler(
+        args.save_path,
+        concurrency=args.concurrency,
+        image_concurrency=args.image_concurrency,
+        timeout=config.getfloat('Images', 'download_timeout', fallback=15),
+        max_image_bytes=int(config.getfloat('Images', 'max_image_mb', fallback=20) * 1024 * 1024),
+        converter=config.get('Markdown', 'converter', fallback='fast'),
+        snapshots=config.getboolean('Markdown', 'snapshots', fallback=True),
+        rate_limiter=None if args.no_rate_limit else HostRateLimiter.from_config(config),
+        dedup_similarity=(config.getfloat('Dedup', 'similarity', fallback=0.95)
+                          if config.getboolean('Dedup', 'enabled', fallback=True) else None),
+        dedup_min_chars=config.getint('Dedup', 'min_chars', fallback=200)
+    )
+    start = time.perf_counter()
+    try:
+        counts = asyncio.run(crawler.crawl(urls, args.force))
+    finally:
+        crawler.close()
+    elapsed = time.perf_counter() - start
+    print(f"共 {len(urls)} 篇：保存 {counts['saved']}，已存在 {counts['existing']}，重复 {counts['duplicate']}，失败 {counts['failed']}，"
+          f"耗时 {elapsed:.1f} 秒（{counts['saved'] / elapsed * 60:.0f} 篇/分钟）")
@@ -0,0 +1,90 @@
+import argparse
+import difflib
+import glob
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article_fetcher import parse_article_html
+from markdown_converter import html_to_markdown, html2text_markdown, etree
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def normalize(markdown):
+    # 兼容性比较忽略空白排版差异，以及 html2text 为空的 <strong></strong> 输出的 "****"
+    markdown = re.sub(r'(?<![*\w])\*\*\*\*(?![*\w])|(?<![_\w])__(?![_\w])', ' ', markdown)
+    return ' '.join(markdown.split())
+
+
+def load_fixtures(repeat):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            article = parse_article_html(f.read(), path)
+        image_map = {url: f"./images/image_{i + 1}.jpg" for i, url in enumerate(article['image_urls'])}
+        fixtures.append((os.path.basename(path), article['content_html'] * repeat, image_map))
+    return fixtures
+
+
+def measure(func, html, image_map, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html, image_map)
+    elapsed = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    func(html, image_map)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比单次遍历转换器与 html2text 的输出和性能')
+    parser.add_argument('--iterations', type=int, default=20, help='每个测试文章的转换次数')
+    parser.add_argument('--repeat', type=int, default=1, help='将正文重复多次以模拟长文章')
+    parser.add_argument('--check-only', action='store_true', help='只检查输出兼容性')
+    args = parser.parse_args()
+
+    converters = [('html2text', html2text_markdown)]
+    backends = ['html.parser'] + (['lxml'] if etree is not None else [])
+    for backend in backends:
+        converters.append((backend, lambda html, image_map, b=backend: html_to_markdown(html, image_map, b)))
+
+    failures = 0
+    for name, html, image_map in load_fixtures(args.repeat):
+        expected = html2text_markdown(html, image_map)
+        for backend in backends:
+            actual = html_to_markdown(html, image_map, backend)
+            if normalize(actual) == normalize(expected):
+                continue
+            failures += 1
+            print(f"[不一致] {name} ({backend})")
+            diff = difflib.unified_diff(
+                normalize(expected).split(' '), normalize(actual).split(' '),
+                'html2text', backend, lineterm='', n=3
+            )
+            print('\n'.join(list(diff)[:40]))
+
+        if args.check_only:
+            continue
+        results = {label: measure(func, html, image_map, args.iterations) for label, func in converters}
+        baseline = results['html2text'][0]
+        print(f"{name}（{len(html) / 1024:.0f} KB，{len(image_map)} 张图片）")
+        for label, (elapsed, peak) in results.items():
+            print(f"  {label:<12} {elapsed * 1000:8.2f} ms  峰值内存 {peak / 1024:8.0f} KB  "
+                  f"加速 {baseline / elapsed:5.1f}x")
+
+    if failures:
+        print(f"共 {failures} 项输出与 html2text 不一致")
+        sys.exit(1)
+    print("输出与 html2text 一致")
+
+
+if __name__ == '__main__':
+    main()
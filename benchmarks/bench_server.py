@@ -0,0 +1,110 @@
+import argparse
+import glob
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+IMAGE_HOST = 'https://mmbiz.qpic.cn/'
+
+
+def make_png(seed, size_kb):
+    # 生成内容随机、近似指定大小的合法 PNG，不同路径的图片内容不同
+    rng = random.Random(seed)
+    side = max(8, int((size_kb * 1024 / 3) ** 0.5))
+    raw = b''.join(b'\x00' + rng.randbytes(side * 3) for _ in range(side))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', side, side, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b'')
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # 模拟公众号文章页面（/s/<名称>）和图片 CDN（/img/...）
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith('/s/') and path[3:] in self.server.fixtures:
+            body = self.server.fixtures[path[3:]]
+            content_type = 'text/html; charset=utf-8'
+        elif path.startswith('/img/'):
+            body = self.server.image(self.path)
+            content_type = 'image/png'
+        else:
+            self.send_error(404)
+            return
+
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self._write_throttled(body)
+
+    def _write_throttled(self, body):
+        # 按设定带宽分块发送
+        bandwidth = self.server.bandwidth
+        chunk_size = 16 * 1024
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            self.wfile.write(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, bandwidth_kbps=0, image_kb=40):
+        super().__init__((host, port), FixtureHandler)
+        self.latency = latency_ms / 1000
+        self.bandwidth = bandwidth_kbps * 1024
+        self.image_kb = image_kb
+        self.base_url = f"http://{host}:{self.server_address[1]}"
+        self.fixtures = {}
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                html = f.read().replace(IMAGE_HOST, f"{self.base_url}/img/")
+            self.fixtures[os.path.splitext(os.path.basename(path))[0]] = html.encode('utf-8')
+        self._images = {}
+        self._images_lock = threading.Lock()
+
+    def image(self, path):
+        with self._images_lock:
+            if path not in self._images:
+                self._images[path] = make_png(path, self.image_kb)
+            return self._images[path]
+
+    def article_urls(self):
+        return [f"{self.base_url}/s/{name}" for name in self.fixtures]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地模拟的公众号文章服务器')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求的额外延迟（毫秒）')
+    parser.add_argument('--bandwidth-kbps', type=float, default=0, help='单连接带宽（KB/s），0 为不限')
+    parser.add_argument('--image-kb', type=int, default=40, help='生成图片的大致大小（KB）')
+    args = parser.parse_args()
+
+    server = FixtureServer(port=args.port, latency_ms=args.latency_ms,
+                           bandwidth_kbps=args.bandwidth_kbps, image_kb=args.image_kb)
+    for url in server.article_urls():
+        print(url)
+    server.serve_forever()
@@ -0,0 +1,298 @@
+import argparse
+import configparser
+import contextlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_server import FixtureServer
+
+STAGES = ['fetch', 'render', 'extract', 'images', 'convert', 'write', 'total']
+MODES = ('web-http', 'web-selenium', 'web-tabs', 'tojson')
+# 需要启动浏览器的模式
+BROWSER_MODES = ('web-selenium', 'web-tabs')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+    }
+
+
+class RssSampler:
+    # 后台采样本进程及其子进程（Chrome）的常驻内存峰值
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        if psutil is None:
+            import resource
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + \
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            return usage * 1024
+        proc = psutil.Process()
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.sample())
+
+
+def write_config(workdir, mode, pool_size, tabs_per_browser=4):
+    # 每种模式使用独立的 config.ini，保存到临时目录
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO_DIR, 'config.ini'), encoding='utf-8')
+    for section in ('Path', 'Driver', 'Fetch', 'Jobs', 'RateLimit'):
+        if not config.has_section(section):
+            config.add_section(section)
+    config.set('Path', 'save_path', os.path.join(workdir, 'articles'))
+    if mode == 'web-tabs':
+        # 用尽量少的浏览器提供相同的并发，与每个请求一个浏览器的 web-selenium 对比内存
+        config.set('Driver', 'mode', 'tabs')
+        config.set('Driver', 'tabs_per_browser', str(tabs_per_browser))
+        config.set('Driver', 'pool_size', str(-(-pool_size // tabs_per_browser)))
+    else:
+        config.set('Driver', 'mode', 'browser')
+        config.set('Driver', 'pool_size', str(pool_size))
+    config.set('Driver', 'max_waiters', str(max(16, pool_size * 4)))
+    config.set('Fetch', 'http_first', 'false' if mode in BROWSER_MODES else 'true')
+    config.set('Jobs', 'db_path', os.path.join(workdir, 'jobs.db'))
+    # 本地服务器不需要限速，避免限速器掩盖被测代码本身的耗时
+    config.set('RateLimit', 'default', '10000/10000')
+    with open(os.path.join(workdir, 'config.ini'), 'w', encoding='utf-8') as f:
+        config.write(f)
+
+
+def run_web_article(url, save_dir):
+    from FavoriteArticlesWeb import WechatArticleCrawler
+
+    timings = {}
+    crawler = WechatArticleCrawler()
+    article = crawler.get_article_content(url, timings)
+    if not article:
+        raise RuntimeError('文章抓取失败')
+    if not crawler.save_article(article, save_dir, timings):
+        raise RuntimeError('文章保存失败')
+    return timings
+
+
+def make_tojson_runner(save_dir):
+    from FavoriteArticlesToJson import WechatArticleCrawler
+
+    crawler = WechatArticleCrawler()
+    filename = os.path.join(save_dir, 'favorite_articles.json')
+    crawler.get_store(filename)
+
+    def run(url, _save_dir):
+        # requests 版本只有抓取（包含解析）和写入两个阶段
+        timings = {}
+        stage_start = time.perf_counter()
+        article = crawler.get_article_content(url)
+        timings['fetch'] = time.perf_counter() - stage_start
+        if not article:
+            raise RuntimeError('文章抓取失败')
+        stage_start = time.perf_counter()
+        crawler.save_article(article, filename)
+        timings['write'] = time.perf_counter() - stage_start
+        return timings
+
+    return run, crawler.close
+
+
+def run_once(mode, urls, concurrency, workdir):
+    save_dir = tempfile.mkdtemp(prefix=f"{mode}-c{concurrency}-", dir=workdir)
+    close = None
+    if mode == 'tojson':
+        runner, close = make_tojson_runner(save_dir)
+    else:
+        runner = run_web_article
+
+    stages = {stage: [] for stage in STAGES}
+    failures = {}
+
+    def task(url):
+        start = time.perf_counter()
+        try:
+            timings = runner(url, save_dir)
+        except Exception as e:
+            reason = type(e).__name__ if not isinstance(e, RuntimeError) else str(e)
+            failures[reason] = failures.get(reason, 0) + 1
+            return
+        timings['total'] = time.perf_counter() - start
+        for stage in STAGES:
+            if stage in timings:
+                stages[stage].append(timings[stage])
+
+    with RssSampler() as sampler, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(task, urls))
+        elapsed = time.perf_counter() - start
+    if close:
+        close()
+
+    succeeded = len(stages['total'])
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'articles': len(urls),
+        'succeeded': succeeded,
+        'failures': failures,
+        'elapsed': elapsed,
+        'articles_per_sec': succeeded / elapsed if elapsed else None,
+        'stages': {stage: summarize(values) for stage, values in stages.items() if values},
+        'peak_rss_mb': sampler.peak / (1024 * 1024),
+        # 每篇同时处理的文章平均占用的内存（含浏览器进程）
+        'rss_per_inflight_mb': sampler.peak / (1024 * 1024) / concurrency,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(run):
+    print(f"{run['mode']:<13} 并发 {run['concurrency']:<3} {run['succeeded']}/{run['articles']} 篇  "
+          f"{run['articles_per_sec'] or 0:7.2f} 篇/秒  峰值内存 {run['peak_rss_mb']:7.1f} MB  "
+          f"每篇 {run['rss_per_inflight_mb']:6.1f} MB")
+    for stage, stats in run['stages'].items():
+        print(f"    {stage:<8} p50 {stats['p50'] * 1000:8.1f} ms  p95 {stats['p95'] * 1000:8.1f} ms  "
+              f"p99 {stats['p99'] * 1000:8.1f} ms")
+    if run['failures']:
+        print(f"    失败: {run['failures']}")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(run['mode'], run['concurrency']): run for run in baseline['runs']}
+    print(f"\n与 {baseline.get('commit') or baseline_path} 对比：")
+    for run in results['runs']:
+        old = previous.get((run['mode'], run['concurrency']))
+        if not old or not old['articles_per_sec'] or not run['articles_per_sec']:
+            continue
+        throughput = run['articles_per_sec'] / old['articles_per_sec'] - 1
+        old_p95 = old['stages'].get('total', {}).get('p95')
+        new_p95 = run['stages'].get('total', {}).get('p95')
+        latency = f"，p95 {(new_p95 / old_p95 - 1) * 100:+.1f}%" if old_p95 and new_p95 else ''
+        print(f"  {run['mode']:<13} 并发 {run['concurrency']:<3} 吞吐 {throughput * 100:+.1f}%{latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='使用本地模拟服务器进行离线性能测试')
+    parser.add_argument('--modes', default='web-http,tojson',
+                        help=f"逗号分隔，可选 {', '.join(MODES)}（web-selenium 和 web-tabs 需要本机安装 Chrome）")
+    parser.add_argument('--concurrency', default='1,4,8', help='逗号分隔的并发数')
+    parser.add_argument('--articles', type=int, default=30, help='每轮抓取的文章数')
+    parser.add_argument('--latency-ms', type=float, default=50, help='模拟服务器每个请求的延迟')
+    parser.add_argument('--bandwidth-kbps', type=float, default=0, help='模拟服务器单连接带宽，0 为不限')
+    parser.add_argument('--tabs-per-browser', type=int, default=4, help='web-tabs 模式下每个浏览器的标签页数')
+    parser.add_argument('--image-kb', type=int, default=40, help='模拟图片大小')
+    parser.add_argument('--output', default='benchmark_results.json', help='结果 JSON 文件')
+    parser.add_argument('--compare', help='与之前的结果 JSON 对比')
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"未知模式: {mode}")
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    server = FixtureServer(latency_ms=args.latency_ms, bandwidth_kbps=args.bandwidth_kbps,
+                           image_kb=args.image_kb).start()
+    fixture_urls = server.article_urls()
+    # 每篇文章的链接都不同，避免命中任何缓存
+    urls = [f"{fixture_urls[i % len(fixture_urls)]}?bench={i}" for i in range(args.articles)]
+
+    workdir = tempfile.mkdtemp(prefix='wechat-bench-')
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'articles': args.articles,
+            'latency_ms': args.latency_ms,
+            'bandwidth_kbps': args.bandwidth_kbps,
+            'image_kb': args.image_kb,
+            'tabs_per_browser': args.tabs_per_browser,
+            'fixtures': len(fixture_urls),
+        },
+        'runs': [],
+    }
+    for mode in modes:
+        write_config(workdir, mode, max(levels), args.tabs_per_browser)
+        for level in levels:
+            run = run_once(mode, urls, level, workdir)
+            print_run(run)
+            results['runs'].append(run)
+        if mode in BROWSER_MODES:
+            # 下一种模式使用新的配置重新创建浏览器池
+            from FavoriteArticlesWeb import WebDriverPool
+            WebDriverPool.quit_driver()
+    server.shutdown()
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == '__main__':
+    main()
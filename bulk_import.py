@@ -0,0 +1,315 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter as ReasonCounter
+from concurrent.futures import ThreadPoolExecutor
+
+from FavoriteArticlesWeb import (
+    Config, ConversionPool, ImagePool, WebDriverPool, ArticleError, archive_article, logger
+)
+from article_index import normalize_url
+from article_snapshot import read_snapshot, snapshot_path
+from logger_config import request_log
+
+PENDING = 'pending'
+RUNNING = 'running'
+SAVED = 'saved'
+EXISTING = 'existing'
+FAILED = 'failed'
+
+URL_COLUMNS = ('url', 'link', 'href', '链接', '网址')
+
+
+def read_url_file(path):
+    # 支持三种格式：文本（每行一个链接）、CSV（url/link 列或第一个以 http 开头的单元格）、
+    # JSONL（每行一个链接字符串或带 url/link 字段的对象）；按规范化后的链接去重，保持原有顺序
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if ext == '.csv':
+            urls = _read_csv(f)
+        elif ext in ('.jsonl', '.ndjson'):
+            urls = _read_jsonl(f)
+        else:
+            urls = [line.strip() for line in f if not line.lstrip().startswith('#')]
+    unique = {}
+    for url in urls:
+        url = (url or '').strip()
+        if url.startswith(('http://', 'https://')):
+            unique.setdefault(normalize_url(url), url)
+    return list(unique.values())
+
+
+def _read_csv(f):
+    rows = list(csv.reader(f))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    for name in URL_COLUMNS:
+        if name in header:
+            column = header.index(name)
+            return [row[column] for row in rows[1:] if len(row) > column]
+    return [next((cell for cell in row if cell.strip().startswith('http')), '') for row in rows]
+
+
+def _read_jsonl(f):
+    urls = []
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            logger.warning(f"第 {number} 行不是合法的 JSON，已跳过")
+            continue
+        if isinstance(item, dict):
+            item = next((item[name] for name in URL_COLUMNS if isinstance(item.get(name), str)), '')
+        urls.append(item if isinstance(item, str) else '')
+    return urls
+
+
+def written_bytes(filepath):
+    # 本次写入的文件大小：Markdown、快照和文章引用的图片
+    total = 0
+    for path in (filepath, snapshot_path(filepath)):
+        if os.path.exists(path):
+            total += os.path.getsize(path)
+    try:
+        image_map = read_snapshot(snapshot_path(filepath)).get('image_map') or {}
+    except (OSError, ValueError):
+        return total
+    images_dir = os.path.dirname(filepath)
+    for relpath in set(image_map.values()):
+        path = os.path.join(images_dir, relpath)
+        if os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+class ImportCheckpoint:
+    # 用 SQLite 记录每个链接的处理状态，中断后再次运行会从未完成的链接继续
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS urls ('
+            'key TEXT PRIMARY KEY, url TEXT NOT NULL, position INTEGER NOT NULL, '
+            'status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'reason TEXT, error TEXT, filepath TEXT, bytes INTEGER NOT NULL DEFAULT 0, '
+            'seconds REAL, updated_at REAL)'
+        )
+        self._db.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor
+
+    def add_urls(self, urls):
+        # 已记录过的链接保持原有状态；上次中断时正在处理的链接重新排队
+        with self._lock:
+            start = self._db.execute('SELECT COALESCE(MAX(position), -1) + 1 FROM urls').fetchone()[0]
+            self._db.executemany(
+                'INSERT OR IGNORE INTO urls (key, url, position, status, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(normalize_url(url), url, start + i, PENDING, time.time()) for i, url in enumerate(urls)]
+            )
+            self._db.execute('UPDATE urls SET status = ? WHERE status = ?', (PENDING, RUNNING))
+            self._db.commit()
+
+    def pending(self, retry_failed=False, force=False):
+        # force 时重新处理所有链接，retry_failed 时包括上次已用完重试次数的链接
+        if force:
+            statuses = (PENDING, FAILED, SAVED, EXISTING)
+        elif retry_failed:
+            statuses = (PENDING, FAILED)
+        else:
+            statuses = (PENDING,)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, url FROM urls WHERE status IN ({', '.join('?' * len(statuses))}) "
+                'ORDER BY position', statuses
+            ).fetchall()
+        return [(row['key'], row['url']) for row in rows]
+
+    def mark_running(self, key):
+        self._execute('UPDATE urls SET status = ?, attempts = attempts + 1, updated_at = ? WHERE key = ?',
+                      (RUNNING, time.time(), key))
+
+    def mark_finished(self, key, status, seconds, filepath=None, size=0, reason=None, error=None):
+        self._execute(
+            'UPDATE urls SET status = ?, seconds = ?, filepath = ?, bytes = ?, reason = ?, error = ?, '
+            'updated_at = ? WHERE key = ?',
+            (status, seconds, filepath, size, reason, error, time.time(), key)
+        )
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self._db.execute('SELECT status, COUNT(*) FROM urls GROUP BY status').fetchall())
+            reasons = dict(self._db.execute(
+                'SELECT reason, COUNT(*) FROM urls WHERE status = ? GROUP BY reason ORDER BY COUNT(*) DESC',
+                (FAILED,)
+            ).fetchall())
+            total_bytes = self._db.execute('SELECT COALESCE(SUM(bytes), 0) FROM urls').fetchone()[0]
+        return counts, reasons, total_bytes
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class BulkImporter:
+    def __init__(self, checkpoint, save_path=None, workers=4, retries=3, backoff=10.0,
+                 max_backoff=300.0, force=False):
+        self.checkpoint = checkpoint
+        self.save_path = save_path
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.force = force
+        self.stop_event = threading.Event()
+        self.counts = ReasonCounter()
+        self.reasons = ReasonCounter()
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def retry_delay(self, attempt):
+        # 指数退避并加入随机抖动，避免多个失败的链接同时重试
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def import_one(self, key, url):
+        start = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            if self.stop_event.is_set():
+                return
+            self.checkpoint.mark_running(key)
+            try:
+                # 每次尝试输出一行 JSON 请求日志
+                with request_log(uuid.uuid4().hex, url=url, source='bulk_import', attempt=attempt) as entry:
+                    timings = entry['stages'] = {}
+                    result = archive_article(url, self.save_path, self.force, timings)
+                    # 与已保存文章重复的链接只记录到索引，没有写入新文件，按已存在统计
+                    status = EXISTING if result['tier'] == 'index' or result['deduplicated'] else SAVED
+                    entry.update(outcome=status, tier=result['tier'], deduplicated=result['deduplicated'])
+            except Exception as e:
+                # ArticleError 的信息已经说明失败阶段，其他异常按类型归类
+                reason = str(e) if isinstance(e, ArticleError) else type(e).__name__
+                error = f"{type(e).__name__}: {str(e)}"
+                if attempt <= self.retries:
+                    delay = self.retry_delay(attempt)
+                    logger.warning(f"处理失败（第 {attempt} 次）{url}: {error}，{delay:.1f} 秒后重试")
+                    if self.stop_event.wait(delay):
+                        return
+                    continue
+                logger.error(f"处理失败，已放弃 {url}: {error}")
+                self.checkpoint.mark_finished(key, FAILED, time.perf_counter() - start,
+                                              reason=reason, error=error)
+                self._record(FAILED, reason=reason)
+                return
+            size = written_bytes(result['filepath']) if status == SAVED else 0
+            self.checkpoint.mark_finished(key, status, time.perf_counter() - start,
+                                          filepath=result['filepath'], size=size)
+            self._record(status, size=size)
+            return
+
+    def _record(self, status, reason=None, size=0):
+        with self._lock:
+            self.counts[status] += 1
+            if reason:
+                self.reasons[reason] += 1
+            self.bytes += size
+            done = sum(self.counts.values())
+        if done % 10 == 0:
+            logger.info(f"已处理 {done} 个链接: {dict(self.counts)}")
+
+    def run(self, items):
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [executor.submit(self.import_one, key, url) for key, url in items]
+            for future in futures:
+                future.result()
+        except KeyboardInterrupt:
+            # 中断时不再开始新的链接；正在处理的链接保持 running，下次运行时重新排队
+            logger.warning("收到中断信号，等待正在处理的链接结束后退出")
+            self.stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+def print_summary(importer, checkpoint, total, elapsed):
+    done = sum(importer.counts.values())
+    saved = importer.counts[SAVED]
+    print(f"本次处理 {done} 个链接，耗时 {elapsed:.1f} 秒："
+          f"保存 {saved}，已存在 {importer.counts[EXISTING]}，失败 {importer.counts[FAILED]}")
+    if elapsed > 0:
+        print(f"吞吐量: {done / elapsed * 60:.1f} 个链接/分钟，{saved / elapsed * 60:.1f} 篇新文章/分钟")
+    print(f"本次写入: {format_bytes(importer.bytes)}")
+    for reason, count in importer.reasons.most_common():
+        print(f"  失败原因 {reason}: {count}")
+
+    counts, reasons, total_bytes = checkpoint.summary()
+    print(f"累计（共 {total} 个链接）: " + '，'.join(f"{status} {count}" for status, count in sorted(counts.items()))
+          + f"，写入 {format_bytes(total_bytes)}")
+    if counts.get(FAILED):
+        print("使用 --retry-failed 重新处理失败的链接")
+
+
+if __name__ == '__main__':
+    settings = Config().get_import_settings()
+
+    parser = argparse.ArgumentParser(description='批量导入收藏的文章链接，中断后再次运行会从上次的位置继续')
+    parser.add_argument('url_file', help='链接文件：文本（每行一个）、CSV 或 JSONL')
+    parser.add_argument('--save-path', default=None, help='文章保存目录，默认读取 config.ini')
+    parser.add_argument('--checkpoint', default=None, help='进度文件，默认为 <链接文件>.checkpoint.db')
+    parser.add_argument('--workers', type=int, default=settings['workers'], help='同时处理的文章数')
+    parser.add_argument('--retries', type=int, default=settings['retries'], help='单篇文章失败后的重试次数')
+    parser.add_argument('--retry-failed', action='store_true', help='重新处理上次已放弃的链接')
+    parser.add_argument('--force', action='store_true', help='重新抓取所有链接，包括已保存的文章')
+    args = parser.parse_args()
+
+    urls = read_url_file(args.url_file)
+    checkpoint = ImportCheckpoint(args.checkpoint or f"{args.url_file}.checkpoint.db")
+    checkpoint.add_urls(urls)
+    items = checkpoint.pending(args.retry_failed, args.force)
+    logger.info(f"共 {len(urls)} 个链接，待处理 {len(items)} 个")
+
+    importer = BulkImporter(
+        checkpoint, args.save_path,
+        workers=args.workers,
+        retries=args.retries,
+        backoff=settings['backoff'],
+        max_backoff=settings['max_backoff'],
+        force=args.force
+    )
+    start = time.perf_counter()
+    try:
+        # 先启动转换进程池，再启动工作线程
+        ConversionPool.get_pool()
+        ImagePool.get_pool()
+        importer.run(items)
+    except KeyboardInterrupt:
+        print("已中断，再次运行相同命令即可继续")
+    finally:
+        ConversionPool.shutdown()
+        ImagePool.shutdown()
+        WebDriverPool.quit_driver()
+        print_summary(importer, checkpoint, len(urls), time.perf_counter() - start)
+        checkpoint.close()
@@ -0,0 +1,554 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，缺失时不做内存检查
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(RuntimeError):
+    pass
+
+
+class PoolExhausted(PoolError):
+    # 等待队列已满
+    pass
+
+
+class PoolTimeout(PoolError):
+    # 等待空闲浏览器超时
+    pass
+
+
+class PoolClosed(PoolError):
+    # 浏览器池已关闭
+    pass
+
+
+def chrome_rss_mb(driver):
+    # 统计 chromedriver 及其所有子进程（Chrome 各进程）的常驻内存，单位 MB
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+    except Exception:
+        return None
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+def count_round_trips(driver):
+    # 所有 WebDriver 命令（包括元素上的操作）都经过 driver.execute，在这里计数
+    execute = driver.execute
+    driver.round_trips = 0
+
+    def counting_execute(*args, **kwargs):
+        driver.round_trips += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return driver
+
+
+class PooledDriver:
+    def __init__(self, driver, driver_id):
+        self.driver = driver
+        self.id = driver_id
+        self.pages = 0
+        self.created_at = time.time()
+
+
+class DriverPool:
+    def __init__(self, factory, size=2, max_waiters=16, wait_timeout=60,
+                 max_pages=50, max_rss_mb=0, discard_on_error=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_waiters = max_waiters
+        self.wait_timeout = wait_timeout
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.discard_on_error = discard_on_error or (lambda e: True)
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._busy = set()
+        self._creating = 0
+        self._waiters = 0
+        self._next_id = 0
+        self._closed = False
+
+    def _total(self):
+        return len(self._idle) + len(self._busy) + self._creating
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'busy': len(self._busy),
+                'in_flight': len(self._busy),
+                'waiters': self._waiters,
+                'pages': {p.id: p.pages for p in self._idle + list(self._busy)},
+            }
+
+    def memory(self):
+        # 返回 (浏览器总内存 MB, 正在处理的页面数)；没有 psutil 时内存为 None
+        with self._cond:
+            drivers = self._idle + list(self._busy)
+            in_flight = len(self._busy)
+        sizes = [chrome_rss_mb(p.driver) for p in drivers]
+        if any(size is None for size in sizes):
+            return None, in_flight
+        return sum(sizes), in_flight
+
+    def checkout(self, timeout=None):
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._closed:
+                raise PoolClosed("浏览器池已关闭")
+            # 没有空闲浏览器且已达上限时进入有界等待队列
+            if not self._idle and self._total() >= self.size:
+                if self._waiters >= self.max_waiters:
+                    raise PoolExhausted(f"等待浏览器的请求过多（{self._waiters}）")
+                self._waiters += 1
+                try:
+                    while not self._idle and self._total() >= self.size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(f"等待空闲浏览器超过 {timeout} 秒")
+                        self._cond.wait(remaining)
+                        if self._closed:
+                            raise PoolClosed("浏览器池已关闭")
+                finally:
+                    self._waiters -= 1
+
+            if self._idle:
+                pooled = self._idle.pop()
+                self._busy.add(pooled)
+                return pooled
+
+            # 预留一个名额后在锁外启动浏览器，避免阻塞其他线程
+            self._creating += 1
+            self._next_id += 1
+            driver_id = self._next_id
+
+        try:
+            pooled = PooledDriver(self.factory(), driver_id)
+        except Exception:
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._creating -= 1
+            self._busy.add(pooled)
+        logger.info(f"已启动浏览器 #{driver_id}")
+        return pooled
+
+    def checkin(self, pooled, discard=False):
+        pooled.pages += 1
+        reason = None
+        if discard:
+            reason = "发生错误"
+        elif self.max_pages and pooled.pages >= self.max_pages:
+            reason = f"已处理 {pooled.pages} 个页面"
+        elif self.max_rss_mb:
+            rss = chrome_rss_mb(pooled.driver)
+            if rss is not None and rss > self.max_rss_mb:
+                reason = f"内存占用 {rss:.0f}MB 超过上限 {self.max_rss_mb}MB"
+
+        with self._cond:
+            self._busy.discard(pooled)
+            if self._closed and reason is None:
+                reason = "浏览器池已关闭"
+            if reason is None:
+                self._idle.append(pooled)
+            self._cond.notify()
+
+        if reason is not None:
+            logger.info(f"回收浏览器 #{pooled.id}: {reason}")
+            self._quit(pooled)
+
+    def prewarm(self, count=None):
+        # 预先启动浏览器放入空闲队列，返回本次启动的数量；启动失败时停止
+        count = self.size if count is None else min(count, self.size)
+        launched = 0
+        while True:
+            with self._cond:
+                if self._closed or self._total() >= count:
+                    break
+                self._creating += 1
+                self._next_id += 1
+                driver_id = self._next_id
+            try:
+                pooled = PooledDriver(self.factory(), driver_id)
+            except Exception as e:
+                with self._cond:
+                    self._creating -= 1
+                    self._cond.notify()
+                logger.warning(f"预启动浏览器 #{driver_id} 失败: {str(e)}")
+                break
+            with self._cond:
+                self._creating -= 1
+                closed = self._closed
+                if not closed:
+                    self._idle.append(pooled)
+                self._cond.notify()
+            if closed:
+                self._quit(pooled)
+                break
+            launched += 1
+            logger.info(f"已预启动浏览器 #{driver_id}")
+        return launched
+
+    @contextmanager
+    def lease(self, timeout=None):
+        pooled = self.checkout(timeout)
+        try:
+            yield pooled.driver
+        except Exception as e:
+            self.checkin(pooled, discard=self.discard_on_error(e))
+            raise
+        else:
+            self.checkin(pooled)
+
+    def drain(self, timeout=30):
+        # 关闭池：唤醒所有等待者，退出空闲浏览器，并等待使用中的浏览器归还
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._busy or self._creating:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            busy, self._busy = list(self._busy), set()
+        for pooled in busy:
+            logger.warning(f"浏览器 #{pooled.id} 未及时归还，强制退出")
+            self._quit(pooled)
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"退出浏览器 #{pooled.id} 失败: {str(e)}")
+
+
+class PooledBrowser:
+    def __init__(self, driver, browser_id):
+        self.driver = driver
+        self.id = browser_id
+        self.pages = 0
+        self.created_at = time.time()
+        # 同一个 WebDriver 会话一次只能执行一个命令，各标签页的命令在这里串行
+        self.lock = threading.Lock()
+        self.base_handle = driver.current_window_handle
+        self.active_handle = self.base_handle
+        self.tabs = set()
+        self.retiring = False
+
+    def switch_to(self, handle):
+        # 调用方需持有 lock；已在目标标签页时不发送命令
+        if self.active_handle != handle:
+            self.driver.switch_to.window(handle)
+            self.active_handle = handle
+
+
+class TabDriver:
+    # 把 WebDriver 调用转发到浏览器中的某个标签页，每个命令执行前切换到该标签页。
+    # 命令本身是串行的，但页面加载（page_load_strategy=none 时 get 立即返回）在各标签页中并行进行
+    def __init__(self, browser, handle):
+        self._browser = browser
+        self._handle = handle
+        # 本次租用中为该标签页发送的 WebDriver 命令数（含切换标签页），不包括其他标签页的命令
+        self.round_trips = 0
+
+    @property
+    def browser_id(self):
+        return self._browser.id
+
+    def _run(self, func):
+        # 持有浏览器锁期间只有当前标签页在发送命令，浏览器计数的增量即为本标签页的往返次数
+        browser = self._browser
+        with browser.lock:
+            start = getattr(browser.driver, 'round_trips', 0)
+            try:
+                browser.switch_to(self._handle)
+                return func()
+            finally:
+                self.round_trips += getattr(browser.driver, 'round_trips', 0) - start
+
+    def __getattr__(self, name):
+        driver = self._browser.driver
+        if isinstance(getattr(type(driver), name, None), property):
+            # page_source、title 等属性本身就会发送命令
+            return self._run(lambda: getattr(driver, name))
+        attr = getattr(driver, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._run(lambda: attr(*args, **kwargs))
+        return call
+
+
+class TabPool:
+    # 每个浏览器同时服务多个请求，每个请求租用一个独立的标签页，处理完后关闭标签页以释放渲染进程内存。
+    # 接口与 DriverPool 相同：size 为浏览器数量，总并发为 size * tabs_per_browser
+    def __init__(self, factory, size=1, tabs_per_browser=4, max_waiters=16, wait_timeout=60,
+                 max_pages=50, max_rss_mb=0, discard_on_error=None, on_new_tab=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        self.max_waiters = max_waiters
+        self.wait_timeout = wait_timeout
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.discard_on_error = discard_on_error or (lambda e: True)
+        # 新标签页打开后、加载页面前调用，例如为该标签页设置请求拦截
+        self.on_new_tab = on_new_tab
+
+        self._cond = threading.Condition()
+        self._browsers = []
+        self._reserved = {}
+        self._creating = 0
+        self._waiters = 0
+        self._next_id = 0
+        self._closed = False
+
+    def _open_slots(self, browser):
+        return self.tabs_per_browser - len(browser.tabs) - self._reserved.get(browser.id, 0)
+
+    def _pick(self):
+        # 选择打开标签页最少的浏览器，让负载分散到各个浏览器
+        candidates = [b for b in self._browsers if not b.retiring and self._open_slots(b) > 0]
+        if not candidates:
+            return None
+        return max(candidates, key=self._open_slots)
+
+    def _can_launch(self):
+        # 退役中的浏览器仍占用名额，直到最后一个标签页归还后退出，保证内存不超过上限
+        return len(self._browsers) + self._creating < self.size
+
+    def stats(self):
+        with self._cond:
+            tabs = sum(len(b.tabs) for b in self._browsers)
+            return {
+                'size': self.size,
+                'tabs_per_browser': self.tabs_per_browser,
+                'idle': sum(1 for b in self._browsers if not b.tabs),
+                'busy': sum(1 for b in self._browsers if b.tabs),
+                'tabs': tabs,
+                'in_flight': tabs,
+                'waiters': self._waiters,
+                'pages': {b.id: b.pages for b in self._browsers},
+            }
+
+    def memory(self):
+        # 返回 (浏览器总内存 MB, 正在处理的标签页数)；没有 psutil 时内存为 None
+        with self._cond:
+            browsers = list(self._browsers)
+        sizes = [chrome_rss_mb(b.driver) for b in browsers]
+        tabs = sum(len(b.tabs) for b in browsers)
+        if any(size is None for size in sizes):
+            return None, tabs
+        return sum(sizes), tabs
+
+    def checkout(self, timeout=None):
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._closed:
+                raise PoolClosed("浏览器池已关闭")
+            browser = self._pick()
+            if browser is None and not self._can_launch():
+                if self._waiters >= self.max_waiters:
+                    raise PoolExhausted(f"等待标签页的请求过多（{self._waiters}）")
+                self._waiters += 1
+                try:
+                    while browser is None and not self._can_launch():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(f"等待空闲标签页超过 {timeout} 秒")
+                        self._cond.wait(remaining)
+                        if self._closed:
+                            raise PoolClosed("浏览器池已关闭")
+                        browser = self._pick()
+                finally:
+                    self._waiters -= 1
+
+            if browser is None:
+                # 在锁外启动浏览器，避免阻塞其他线程
+                self._creating += 1
+                self._next_id += 1
+                browser_id = self._next_id
+            else:
+                self._reserved[browser.id] = self._reserved.get(browser.id, 0) + 1
+
+        if browser is None:
+            try:
+                browser = PooledBrowser(self.factory(), browser_id)
+            except Exception:
+                with self._cond:
+                    self._creating -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._creating -= 1
+                self._browsers.append(browser)
+                self._reserved[browser.id] = self._reserved.get(browser.id, 0) + 1
+            logger.info(f"已启动浏览器 #{browser_id}（最多 {self.tabs_per_browser} 个标签页）")
+
+        try:
+            with browser.lock:
+                browser.driver.switch_to.new_window('tab')
+                handle = browser.driver.current_window_handle
+                browser.active_handle = handle
+                if self.on_new_tab is not None:
+                    self.on_new_tab(browser.driver)
+        except Exception:
+            with self._cond:
+                self._reserved[browser.id] -= 1
+                browser.retiring = True
+            self._release(browser)
+            raise
+        with self._cond:
+            self._reserved[browser.id] -= 1
+            browser.tabs.add(handle)
+        return browser, handle
+
+    def checkin(self, lease, discard=False):
+        browser, handle = lease
+        closed = True
+        try:
+            with browser.lock:
+                browser.switch_to(handle)
+                browser.driver.close()
+                browser.driver.switch_to.window(browser.base_handle)
+                browser.active_handle = browser.base_handle
+        except Exception as e:
+            logger.warning(f"关闭浏览器 #{browser.id} 的标签页失败: {str(e)}")
+            closed = False
+
+        browser.pages += 1
+        reason = None
+        if discard:
+            reason = "发生错误"
+        elif not closed:
+            reason = "关闭标签页失败"
+        elif self.max_pages and browser.pages >= self.max_pages:
+            reason = f"已处理 {browser.pages} 个页面"
+        elif self.max_rss_mb:
+            rss = chrome_rss_mb(browser.driver)
+            if rss is not None and rss > self.max_rss_mb:
+                reason = f"内存占用 {rss:.0f}MB 超过上限 {self.max_rss_mb}MB"
+
+        with self._cond:
+            browser.tabs.discard(handle)
+            if reason is not None and not browser.retiring:
+                # 不再分配新标签页，其余标签页处理完后退出浏览器
+                browser.retiring = True
+                logger.info(f"回收浏览器 #{browser.id}: {reason}")
+        self._release(browser)
+
+    def _release(self, browser):
+        # 退役的浏览器在最后一个标签页归还后退出
+        with self._cond:
+            quit_now = (browser.retiring or self._closed) and not browser.tabs \
+                and not self._reserved.get(browser.id) and browser in self._browsers
+            if quit_now:
+                self._browsers.remove(browser)
+                self._reserved.pop(browser.id, None)
+            self._cond.notify_all()
+        if quit_now:
+            self._quit(browser)
+
+    def prewarm(self, count=None):
+        # 预先启动浏览器（不打开标签页），返回本次启动的数量；启动失败时停止
+        count = self.size if count is None else min(count, self.size)
+        launched = 0
+        while True:
+            with self._cond:
+                if self._closed or len(self._browsers) + self._creating >= count:
+                    break
+                self._creating += 1
+                self._next_id += 1
+                browser_id = self._next_id
+            try:
+                browser = PooledBrowser(self.factory(), browser_id)
+            except Exception as e:
+                with self._cond:
+                    self._creating -= 1
+                    self._cond.notify_all()
+                logger.warning(f"预启动浏览器 #{browser_id} 失败: {str(e)}")
+                break
+            with self._cond:
+                self._creating -= 1
+                closed = self._closed
+                if not closed:
+                    self._browsers.append(browser)
+                self._cond.notify_all()
+            if closed:
+                self._quit(browser)
+                break
+            launched += 1
+            logger.info(f"已预启动浏览器 #{browser_id}")
+        return launched
+
+    @contextmanager
+    def lease(self, timeout=None):
+        lease = self.checkout(timeout)
+        try:
+            yield TabDriver(*lease)
+        except Exception as e:
+            self.checkin(lease, discard=self.discard_on_error(e))
+            raise
+        else:
+            self.checkin(lease)
+
+    def drain(self, timeout=30):
+        # 关闭池：唤醒所有等待者，退出空闲浏览器，并等待使用中的标签页归还
+        with self._cond:
+            self._closed = True
+            idle = [b for b in self._browsers if not b.tabs and not self._reserved.get(b.id)]
+            for browser in idle:
+                self._browsers.remove(browser)
+            self._cond.notify_all()
+        for browser in idle:
+            self._quit(browser)
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._browsers or self._creating:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            busy, self._browsers = self._browsers, []
+        for browser in busy:
+            logger.warning(f"浏览器 #{browser.id} 仍有 {len(browser.tabs)} 个标签页未归还，强制退出")
+            self._quit(browser)
+
+    def _quit(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.warning(f"退出浏览器 #{browser.id} 失败: {str(e)}")
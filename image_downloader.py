@@ -0,0 +1,117 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class DownloadResult:
+    def __init__(self):
+        self.files = {}      # 图片 URL -> 保存的文件名（或图片库中的路径）
+        self.failures = {}   # 图片 URL -> 失败原因
+        self.cached = 0      # 命中图片库、无需下载的数量
+        self.bytes = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        total = len(self.files) + len(self.failures)
+        rate = self.bytes / 1024 / self.elapsed if self.elapsed else 0
+        return (f"成功 {len(self.files)}/{total}（复用 {self.cached}），失败 {len(self.failures)}，"
+                f"共 {self.bytes / 1024:.1f} KB，耗时 {self.elapsed:.2f} 秒，{rate:.1f} KB/s")
+
+
+class ImageDownloader:
+    def __init__(self, max_workers=8, timeout=15, max_bytes=20 * 1024 * 1024,
+                 chunk_size=64 * 1024, headers=None, rate_limiter=None):
+        self.max_workers = max(1, max_workers)
+        # 图片 CDN（mmbiz.qpic.cn）按域名限速，为 None 时不限速
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+
+        # 所有文章共享同一个保持连接的会话和同一个下载线程池：同时进行的下载数不超过 max_workers，
+        # 与连接池大小一致，多篇文章同时下载时连接也不会因连接池已满被丢弃
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-download')
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_to_file(self, url, path):
+        # 分块写入临时文件，超过大小上限时放弃；返回写入的字节数
+        tmp_path = f"{path}.part"
+        written = 0
+        if self.rate_limiter:
+            self.rate_limiter.acquire(url)
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                if self.rate_limiter:
+                    self.rate_limiter.report_response(url, response)
+                response.raise_for_status()
+                length = response.headers.get('Content-Length')
+                if self.max_bytes and length and length.isdigit() and int(length) > self.max_bytes:
+                    raise ImageTooLarge(f"图片大小 {length} 字节超过上限 {self.max_bytes}")
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        written += len(chunk)
+                        if self.max_bytes and written > self.max_bytes:
+                            raise ImageTooLarge(f"图片大小超过上限 {self.max_bytes} 字节")
+                        f.write(chunk)
+            os.replace(tmp_path, path)
+            return written
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def download_all(self, urls, images_dir, store):
+        # 已在图片库中的 URL 直接复用，其余下载后存入图片库，再链接到文章的 images 目录；
+        # images_dir 为 None 时不链接，result.files 中为图片库中的路径（由调用方处理后再链接）
+        result = DownloadResult()
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return result
+
+        def task(url):
+            path = store.lookup(url)
+            cached = path is not None
+            size = 0
+            if not cached:
+                tmp_path = store.new_temp_path()
+                size = self.fetch_to_file(url, tmp_path)
+                path = store.add_file(url, tmp_path)
+            if images_dir is not None:
+                path = store.link_into(path, images_dir)
+            return path, size, cached
+
+        start = time.perf_counter()
+        futures = {self.executor.submit(task, url): url for url in unique_urls}
+        for future, url in futures.items():
+            try:
+                filename, size, cached = future.result()
+                result.files[url] = filename
+                result.bytes += size
+                result.cached += cached
+            except Exception as e:
+                result.failures[url] = f"{type(e).__name__}: {str(e)}"
+                logger.warning(f"下载图片失败 {url}: {str(e)}")
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
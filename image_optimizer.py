@@ -0,0 +1,113 @@
+import hashlib
+import importlib.util
+import os
+import uuid
+
+# 目标格式 -> 扩展名
+OUTPUT_FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}
+# Pillow 无法解码的格式保持原样
+SKIP_EXTENSIONS = {'svg'}
+
+
+def pillow_available():
+    # Pillow 为可选依赖，只检查是否安装，真正压缩时才在工作进程中导入
+    return importlib.util.find_spec('PIL') is not None
+
+
+def settings_tag(fmt, quality, max_dimension, thumbnail_size):
+    # 压缩参数的短哈希，参数变化后生成新的文件，不会误用旧参数的结果
+    key = f"{fmt}:{quality}:{max_dimension}:{thumbnail_size}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+
+
+def variant_paths(source_path, fmt, quality, max_dimension, thumbnail_size):
+    # 压缩结果与原图放在图片库的同一目录：<内容哈希>.<参数>.<扩展名>，缩略图为 <内容哈希>.<参数>.thumb.<扩展名>
+    directory, filename = os.path.split(source_path)
+    digest = filename.split('.')[0]
+    tag = settings_tag(fmt, quality, max_dimension, thumbnail_size)
+    ext = OUTPUT_FORMATS[fmt]
+    image_path = os.path.join(directory, f"{digest}.{tag}.{ext}")
+    thumb_path = os.path.join(directory, f"{digest}.{tag}.thumb.{ext}") if thumbnail_size > 0 else None
+    return image_path, thumb_path
+
+
+def _prepare(image, fmt):
+    # JPEG 不支持透明通道，铺白色背景；WebP 只接受 RGB 和 RGBA
+    from PIL import Image
+
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if image.has_transparency_data else 'RGB')
+    return image
+
+
+def _save(image, path, fmt, quality, **options):
+    # 先写临时文件再改名，多个进程处理同一张图片时不会读到写了一半的文件
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        if fmt == 'jpeg':
+            image.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=True, **options)
+        else:
+            image.save(tmp_path, 'WEBP', quality=quality, **options)
+        size = os.path.getsize(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path, size
+
+
+def optimize_image(source_path, fmt='webp', quality=80, max_dimension=2048, thumbnail_size=320):
+    # 在工作进程中执行：识别真实格式后按需缩小并重新压缩，同时生成缩略图
+    # 返回 (状态, 压缩后路径, 缩略图路径, 原大小, 压缩后大小, 错误信息)，状态为：
+    # optimized（新生成）、cached（已有相同参数的结果）、skipped（压缩后没有变小或格式不支持，使用原图）、failed
+    from PIL import Image, ImageOps
+
+    before = 0
+    try:
+        image_path, thumb_path = variant_paths(source_path, fmt, quality, max_dimension, thumbnail_size)
+        if os.path.exists(image_path) and (thumb_path is None or os.path.exists(thumb_path)):
+            size = os.path.getsize(image_path)
+            return 'cached', image_path, thumb_path, size, size, None
+        before = os.path.getsize(source_path)
+        if os.path.splitext(source_path)[1].lstrip('.') in SKIP_EXTENSIONS:
+            return 'skipped', None, None, before, before, None
+
+        with Image.open(source_path) as image:
+            animated = getattr(image, 'n_frames', 1) > 1
+            if animated:
+                # 动图只能转为 WebP 动图，不缩小；目标为 JPEG 时保留原图
+                if fmt != 'webp':
+                    return 'skipped', None, None, before, before, None
+                thumb = _prepare(image.copy(), fmt) if thumb_path else None
+                tmp_path, after = _save(image, image_path, fmt, quality, save_all=True)
+                resized = False
+            else:
+                image = ImageOps.exif_transpose(image)
+                image.load()
+                resized = max_dimension > 0 and max(image.size) > max_dimension
+                if resized:
+                    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+                image = _prepare(image, fmt)
+                thumb = image.copy() if thumb_path else None
+                tmp_path, after = _save(image, image_path, fmt, quality)
+
+        # 没有缩小且压缩后反而更大时保留原图（例如已经高度压缩的 JPEG）
+        if after >= before and not resized:
+            os.remove(tmp_path)
+            status, image_path, after = 'skipped', None, before
+        else:
+            os.replace(tmp_path, image_path)
+            status = 'optimized'
+
+        if thumb is not None:
+            thumb.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+            thumb_tmp, _ = _save(thumb, thumb_path, fmt, quality)
+            os.replace(thumb_tmp, thumb_path)
+        return status, image_path, thumb_path, before, after, None
+    except Exception as e:
+        return 'failed', None, None, before, before, f"{type(e).__name__}: {str(e)}"
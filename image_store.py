@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# 常见图片格式的文件头
+MAGIC_NUMBERS = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+]
+
+
+def sniff_extension(head, url=None):
+    # 根据文件头判断真实格式，无法识别时参考 URL 中的 wx_fmt 参数
+    for magic, ext in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    stripped = head.lstrip()
+    if stripped.startswith(b'<svg') or (stripped.startswith(b'<?xml') and b'<svg' in head):
+        return 'svg'
+    if url:
+        fmt = parse_qs(urlparse(url).query).get('wx_fmt', [''])[0].lower()
+        if fmt in ('jpeg', 'jpg', 'png', 'gif', 'webp', 'bmp', 'svg'):
+            return 'jpg' if fmt == 'jpeg' else fmt
+    return 'jpg'
+
+
+class ImageStore:
+    # 按内容哈希保存图片，文章目录中只保留指向对象文件的链接
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, 'index.db'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS urls ('
+            'url TEXT PRIMARY KEY, hash TEXT NOT NULL, ext TEXT NOT NULL, size INTEGER NOT NULL)'
+        )
+        self._db.commit()
+
+    def object_path(self, digest, ext):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.{ext}")
+
+    def lookup(self, url):
+        # 返回已下载过的 URL 对应的对象文件路径
+        with self._lock:
+            row = self._db.execute('SELECT hash, ext FROM urls WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        path = self.object_path(*row)
+        return path if os.path.exists(path) else None
+
+    def new_temp_path(self):
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    def add_file(self, url, tmp_path):
+        # 将下载好的临时文件移入对象目录，内容相同的文件只保留一份
+        sha = hashlib.sha256()
+        size = 0
+        head = b''
+        with open(tmp_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                if not head:
+                    head = chunk[:64]
+                sha.update(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        ext = sniff_extension(head, url)
+        path = self.object_path(digest, ext)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO urls (url, hash, ext, size) VALUES (?, ?, ?, ?)',
+                (url, digest, ext, size)
+            )
+            self._db.commit()
+        return path
+
+    def use_variant(self, source_path, variant_path, keep_original=True):
+        # 将指向原图的所有 URL 改为指向压缩后的文件（同一内容哈希，扩展名带压缩参数）；
+        # 不保留原图时，只在没有文章硬链接到原图的情况下删除它
+        digest, source_ext = os.path.basename(source_path).split('.', 1)
+        variant_ext = os.path.basename(variant_path).split('.', 1)[1]
+        if source_ext == variant_ext:
+            return
+        with self._lock:
+            self._db.execute(
+                'UPDATE urls SET ext = ?, size = ? WHERE hash = ? AND ext = ?',
+                (variant_ext, os.path.getsize(variant_path), digest, source_ext)
+            )
+            self._db.commit()
+        if not keep_original:
+            try:
+                if os.stat(source_path).st_nlink == 1:
+                    os.remove(source_path)
+            except FileNotFoundError:
+                pass
+
+    def link_into(self, path, images_dir):
+        # 优先使用硬链接，其次相对路径的符号链接，都不支持时复制文件
+        filename = os.path.basename(path)
+        dest = os.path.join(images_dir, filename)
+        if os.path.lexists(dest):
+            return filename
+        try:
+            os.link(path, dest)
+        except FileExistsError:
+            pass
+        except OSError:
+            try:
+                os.symlink(os.path.relpath(path, images_dir), dest)
+            except FileExistsError:
+                pass
+            except OSError:
+                shutil.copy2(path, dest)
+        return filename
+
+    def close(self):
+        with self._lock:
+            self._db.close()
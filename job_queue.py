@@ -0,0 +1,234 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobStore:
+    # 用 SQLite 持久化任务，服务重启后未完成的任务会重新排队
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, url TEXT NOT NULL, save_path TEXT, force INTEGER NOT NULL DEFAULT 0, '
+            'status TEXT NOT NULL, created_at REAL, started_at REAL, finished_at REAL, '
+            'timings TEXT, result TEXT, error TEXT)'
+        )
+        self._db.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor
+
+    def create(self, url, save_path=None, force=False):
+        job_id = uuid.uuid4().hex
+        self._execute(
+            'INSERT INTO jobs (id, url, save_path, force, status, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, url, save_path, int(force), QUEUED, time.time())
+        )
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['force'] = bool(job['force'])
+        job['timings'] = json.loads(job['timings']) if job['timings'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def mark_running(self, job_id):
+        self._execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?',
+                      (RUNNING, time.time(), job_id))
+
+    def mark_finished(self, job_id, status, timings, result=None, error=None):
+        self._execute(
+            'UPDATE jobs SET status = ?, finished_at = ?, timings = ?, result = ?, error = ? WHERE id = ?',
+            (status, time.time(), json.dumps(timings, ensure_ascii=False),
+             json.dumps(result, ensure_ascii=False) if result is not None else None, error, job_id)
+        )
+
+    def requeue_unfinished(self):
+        # 上次退出时仍在运行的任务重新排队，按创建顺序返回所有待处理任务
+        self._execute('UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?', (QUEUED, RUNNING))
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id FROM jobs WHERE status = ? ORDER BY created_at', (QUEUED,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobManager:
+    def __init__(self, store, handler, workers=2, key_func=None, result_ttl=0, on_coalesce=None):
+        # handler(job, timings) 执行任务并返回结果字典，失败时抛出异常
+        # key_func(url, save_path) 不为 None 时，相同 key 的任务合并为一个（single-flight），force 请求不合并到普通任务；
+        # 成功结束后 result_ttl 秒内的相同请求直接复用该任务；on_coalesce(kind) 在合并时调用
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.key_func = key_func
+        self.result_ttl = result_ttl
+        self.on_coalesce = on_coalesce
+        self._queue = queue.Queue()
+        self._events = {}
+        self._events_lock = threading.Lock()
+        self._inflight = {}
+        self._recent = {}
+        self._job_keys = {}
+        self._flight_lock = threading.Lock()
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        pending = self.store.requeue_unfinished()
+        if pending:
+            logger.info(f"恢复 {len(pending)} 个未完成的任务")
+        for job_id in pending:
+            if self.key_func is not None:
+                job = self.store.get(job_id)
+                self._track(self.key_func(job['url'], job['save_path']), job_id, job['force'])
+            self._queue.put(job_id)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, url, save_path=None, force=False, on_create=None):
+        # on_create(job_id) 只在新建任务时调用（在任务开始执行之前），合并到已有任务时不调用
+        if self.key_func is None:
+            job_id = self.store.create(url, save_path, force)
+            if on_create is not None:
+                on_create(job_id)
+            self._event(job_id)
+            self._queue.put(job_id)
+            return job_id
+
+        key = self.key_func(url, save_path)
+        with self._flight_lock:
+            # 相同链接和保存路径的任务正在进行时直接返回该任务；
+            # force 请求只合并到同样是 force 的任务，否则排队一个新的强制任务
+            inflight = self._inflight.get(key, {})
+            job_id = inflight.get(True) if force else inflight.get(False) or inflight.get(True)
+            if job_id is not None:
+                self._coalesced('inflight')
+                return job_id
+            # 刚完成的结果短时间内复用，force 时跳过
+            recent = self._recent.get(key)
+            if recent is not None and not force and recent[1] > time.monotonic():
+                self._coalesced('recent')
+                return recent[0]
+            job_id = self.store.create(url, save_path, force)
+            self._track(key, job_id, force)
+        if on_create is not None:
+            on_create(job_id)
+        self._event(job_id)
+        self._queue.put(job_id)
+        return job_id
+
+    def _track(self, key, job_id, force=False):
+        # 同一个 key 最多同时有一个普通任务和一个强制任务
+        self._inflight.setdefault(key, {})[bool(force)] = job_id
+        self._job_keys[job_id] = key
+
+    def _coalesced(self, kind):
+        if self.on_coalesce is not None:
+            self.on_coalesce(kind)
+
+    def _release(self, job_id, status):
+        with self._flight_lock:
+            key = self._job_keys.pop(job_id, None)
+            if key is None:
+                return
+            inflight = self._inflight.get(key, {})
+            for force, inflight_id in list(inflight.items()):
+                if inflight_id == job_id:
+                    del inflight[force]
+            if not inflight:
+                self._inflight.pop(key, None)
+            now = time.monotonic()
+            self._recent = {k: v for k, v in self._recent.items() if v[1] > now}
+            if status == DONE and self.result_ttl:
+                self._recent[key] = (job_id, now + self.result_ttl)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        # 等待任务结束并返回任务信息；超时后返回当前状态
+        event = self._event(job_id)
+        job = self.store.get(job_id)
+        if job is None or job['status'] in (DONE, FAILED):
+            with self._events_lock:
+                self._events.pop(job_id, None)
+            return job
+        event.wait(timeout)
+        return self.store.get(job_id)
+
+    def _event(self, job_id):
+        with self._events_lock:
+            return self._events.setdefault(job_id, threading.Event())
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._stopping.is_set():
+                break
+            try:
+                self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job['status'] != QUEUED:
+            return
+        self.store.mark_running(job_id)
+        timings = {}
+        start = time.perf_counter()
+        status = FAILED
+        try:
+            result = self.handler(job, timings)
+            timings['total'] = time.perf_counter() - start
+            self.store.mark_finished(job_id, DONE, timings, result=result)
+            status = DONE
+        except Exception as e:
+            timings['total'] = time.perf_counter() - start
+            logger.exception(f"任务 {job_id} 失败: {str(e)}")
+            self.store.mark_finished(job_id, FAILED, timings, error=str(e))
+        finally:
+            # 先结束合并，再唤醒等待者；之后的相同请求会命中短期结果缓存或重新抓取
+            self._release(job_id, status)
+            with self._events_lock:
+                event = self._events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    def shutdown(self):
+        # 未开始的任务保留在数据库中，下次启动时继续处理
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._threads = []
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+
+class JsonlArticleStore:
+    # 追加写入的 JSON Lines 文章库，旁路索引文件记录每个 URL 最新一条记录的偏移量
+    def __init__(self, path='favorite_articles.jsonl', fsync_every=10, fsync_interval=1.0):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        # 迁移进行中的标记，迁移完成后删除
+        self.migration_path = f"{path}.migrating"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer = None
+        self._open()
+
+    def _open(self):
+        self._repair_tail()
+        indexed_end = self._load_index()
+        self._data = open(self.path, 'ab')
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+        # 索引落后于数据文件时（例如上次写入中途崩溃），补齐缺失的部分
+        if indexed_end < self._data.tell():
+            for offset, length, record in self._scan(indexed_end):
+                self._index_record(record.get('url'), offset, length)
+            self._sync()
+
+    def _repair_tail(self):
+        # 截掉最后一行不完整的记录
+        if not os.path.exists(self.path):
+            open(self.path, 'wb').close()
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            pos = size
+            while pos > 0:
+                step = min(64 * 1024, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    f.truncate(pos + newline + 1)
+                    return
+            f.truncate(0)
+
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        indexed_end = 0
+        if not os.path.exists(self.index_path):
+            return 0
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t', 2)
+                if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+                    continue
+                offset, length, url = int(parts[0]), int(parts[1]), parts[2]
+                if offset + length > size:
+                    continue
+                self._offsets[url] = offset
+                indexed_end = max(indexed_end, offset + length)
+        return indexed_end
+
+    def _scan(self, start=0):
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                length = len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    yield offset, length, record
+                offset += length
+
+    def _index_record(self, url, offset, length):
+        if not url:
+            return
+        self._offsets[url] = offset
+        self._index.write(f"{offset}\t{length}\t{url}\n")
+
+    def _sync(self):
+        for f in (self._data, self._index):
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _sync_later(self):
+        # 定时 fsync：空闲下来后最后几条记录也会在 fsync_interval 内落盘
+        with self._lock:
+            self._timer = None
+            if self._pending and not self._data.closed:
+                self._sync()
+
+    def append(self, article):
+        line = (json.dumps(article, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(line)
+            self._index_record(article.get('url'), offset, len(line))
+            # 每条记录都写入操作系统缓冲区，进程崩溃不会丢失；
+            # 只有 fsync 是批量的：累计一定条数或超过时间间隔后才落盘
+            self._data.flush()
+            self._index.flush()
+            self._pending += 1
+            if self._pending >= self.fsync_every or \
+                    time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self._sync_later)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def get(self, url):
+        with self._lock:
+            offset = self._offsets.get(url)
+            if offset is None:
+                return None
+            self._data.flush()
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def __contains__(self, url):
+        return url in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def iter_articles(self):
+        # 流式读取所有记录，不会一次性载入整个文件
+        with self._lock:
+            self._data.flush()
+        for _, _, record in self._scan():
+            yield record
+
+    def compact(self):
+        # 每个 URL 只保留最新的一条记录，重写数据文件和索引。
+        # 新数据和新索引都先写入临时文件；替换前先删除旧索引，任何一步崩溃后
+        # 要么索引与数据一致，要么没有索引（打开时扫描数据文件重建），不会用旧偏移量读取新数据
+        with self._lock:
+            self._sync()
+            tmp_path = f"{self.path}.compact"
+            tmp_index_path = f"{self.index_path}.compact"
+            offsets = set(self._offsets.values())
+            with open(tmp_path, 'wb') as out, open(tmp_index_path, 'w', encoding='utf-8') as index:
+                for offset, _, record in self._scan():
+                    url = record.get('url')
+                    if url and offset not in offsets:
+                        continue
+                    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+                    if url:
+                        index.write(f"{out.tell()}\t{len(line)}\t{url}\n")
+                    out.write(line)
+                for f in (out, index):
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._data.close()
+            self._index.close()
+            os.remove(self.index_path)
+            os.replace(tmp_path, self.path)
+            os.replace(tmp_index_path, self.index_path)
+            self._offsets = {}
+            self._open()
+
+    def migration_pending(self):
+        return os.path.exists(self.migration_path)
+
+    def migrate_from_json(self, json_path):
+        # 一次性导入旧的 JSON 数组文件，导入后将其重命名为 .migrated。
+        # 开始前写入标记文件，记录迁移开始时数据文件的位置；迁移中途崩溃后再次调用时，
+        # 跳过该位置之后已经写入的记录，从中断处继续
+        with open(json_path, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        if self.migration_pending():
+            with open(self.migration_path, 'r', encoding='utf-8') as f:
+                start = json.load(f)['start']
+            with self._lock:
+                self._data.flush()
+            done = sum(1 for _ in self._scan(start))
+        else:
+            with self._lock:
+                start = self._data.tell()
+            with open(self.migration_path, 'w', encoding='utf-8') as f:
+                json.dump({'source': json_path, 'start': start}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            done = 0
+        for article in articles[done:]:
+            self.append(article)
+        self.flush()
+        os.replace(json_path, f"{json_path}.migrated")
+        os.remove(self.migration_path)
+        return len(articles)
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._data.close()
+            self._index.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='JSON Lines 文章库维护工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='从旧的 JSON 数组文件迁移')
+    migrate.add_argument('json_path', nargs='?', default='favorite_articles.json')
+    compact = subparsers.add_parser('compact', help='去除重复保存的 URL')
+    compact.add_argument('path', nargs='?', default='favorite_articles.jsonl')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        store = JsonlArticleStore(os.path.splitext(args.json_path)[0] + '.jsonl')
+        count = store.migrate_from_json(args.json_path)
+        print(f"已迁移 {count} 篇文章到 {store.path}")
+    else:
+        store = JsonlArticleStore(args.path)
+        store.compact()
+        print(f"压缩完成，共 {len(store)} 篇文章")
+    store.close()
@@ -1,38 +1,155 @@
+import atexit
+import configparser
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
 
-def setup_logger():
-    # 创建日志目录
-    log_dir = 'logs'
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-
-    # 配置日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-
-    # 创建两个处理器：一个用于控制台输出，一个用于文件输出
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-
-    # 使用 RotatingFileHandler 进行日志轮转
-    file_handler = RotatingFileHandler(
-        filename=os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d")}.log'),
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-
-    # 获取根日志记录器
+# 每个请求一行 JSON 的日志记录器，写入单独的 requests_日期.jsonl
+REQUEST_LOGGER = 'wechat.requests'
+
+_setup_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_debug_sample_rate = 0.0
+_context = threading.local()
+
+
+def get_logging_settings(config_file='config.ini'):
+    config = configparser.ConfigParser()
+    if os.path.exists(config_file):
+        config.read(config_file, encoding='utf-8')
+    return {
+        'level': config.get('Logging', 'level', fallback='INFO').upper(),
+        'debug_sample_rate': config.getfloat('Logging', 'debug_sample_rate', fallback=0.0),
+        'request_log': config.getboolean('Logging', 'request_log', fallback=True),
+    }
+
+
+class ContextFilter(logging.Filter):
+    # 为每条日志补充当前请求 ID；DEBUG 日志只保留被抽样的请求
+    def filter(self, record):
+        entry = getattr(_context, 'entry', None)
+        record.request_id = entry['request_id'] if entry is not None else '-'
+        if record.levelno < logging.INFO and not getattr(_context, 'sampled', False):
+            return False
+        return True
+
+
+def _is_request_record(record):
+    return record.name == REQUEST_LOGGER
+
+
+def setup_logger(config_file='config.ini'):
+    # 根日志记录器只挂一个 QueueHandler，控制台和文件写入在后台线程中进行；重复调用直接返回
+    global _listener, _queue_handler, _debug_sample_rate
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+    with _setup_lock:
+        if _listener is not None:
+            return logger
+
+        settings = get_logging_settings(config_file)
+        _debug_sample_rate = max(0.0, min(1.0, settings['debug_sample_rate']))
+
+        # 创建日志目录
+        log_dir = 'logs'
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        # 配置日志格式
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+        )
+        date = datetime.now().strftime("%Y%m%d")
+
+        # 创建两个处理器：一个用于控制台输出，一个用于文件输出
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        # 使用 RotatingFileHandler 进行日志轮转
+        file_handler = RotatingFileHandler(
+            filename=os.path.join(log_dir, f'app_{date}.log'),
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers = [console_handler, file_handler]
+        for handler in handlers:
+            handler.addFilter(lambda record: not _is_request_record(record))
+
+        # 请求日志只写入 JSONL 文件，每行就是一个 JSON 对象
+        if settings['request_log']:
+            request_handler = RotatingFileHandler(
+                filename=os.path.join(log_dir, f'requests_{date}.jsonl'),
+                maxBytes=10*1024*1024,
+                backupCount=5,
+                encoding='utf-8'
+            )
+            request_handler.setFormatter(logging.Formatter('%(message)s'))
+            request_handler.addFilter(_is_request_record)
+            handlers.append(request_handler)
+
+        _queue_handler = QueueHandler(queue.SimpleQueue())
+        _queue_handler.addFilter(ContextFilter())
+        _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logger)
+
+        # 抽样 DEBUG 时根记录器需要放行 DEBUG，由 ContextFilter 丢弃未被抽样的请求
+        level = getattr(logging, settings['level'], logging.INFO)
+        if _debug_sample_rate > 0:
+            level = min(level, logging.DEBUG)
+        logger.setLevel(level)
+        logger.addHandler(_queue_handler)
+        return logger
+
+
+def stop_logger():
+    # 停止后台线程前写完队列中剩余的日志
+    global _listener, _queue_handler
+    with _setup_lock:
+        listener, _listener = _listener, None
+        handler, _queue_handler = _queue_handler, None
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+
+
+@contextmanager
+def request_log(request_id, **fields):
+    # 在当前线程中记录一个请求：期间的日志带上请求 ID，按 debug_sample_rate 抽样输出 DEBUG 日志，
+    # 结束时输出一行 JSON（字段可在处理过程中通过 annotate 补充）
+    entry = {'request_id': request_id, **fields}
+    previous = getattr(_context, 'entry', None), getattr(_context, 'sampled', False)
+    _context.entry = entry
+    _context.sampled = _debug_sample_rate > 0 and random.random() < _debug_sample_rate
+    start = time.perf_counter()
+    try:
+        yield entry
+    except Exception as e:
+        entry.setdefault('outcome', 'failed')
+        entry.setdefault('error', f"{type(e).__name__}: {str(e)}")
+        raise
+    finally:
+        entry.setdefault('outcome', 'ok')
+        entry['duration'] = round(time.perf_counter() - start, 4)
+        entry['debug_sampled'] = _context.sampled
+        _context.entry, _context.sampled = previous
+        logging.getLogger(REQUEST_LOGGER).info(json.dumps(entry, ensure_ascii=False, default=str))
 
-    # 添加处理器
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
 
-    return logger 
\ No newline at end of file
+def annotate(**fields):
+    # 为当前请求的 JSON 日志补充字段，不在请求中时忽略
+    entry = getattr(_context, 'entry', None)
+    if entry is not None:
+        entry.update(fields)
@@ -0,0 +1,344 @@
+import re
+import string
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:  # lxml 为可选依赖，缺失时使用标准库解析器
+    etree = None
+
+BLOCK_TAGS = {'p', 'div', 'blockquote', 'pre', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+EMPHASIS_TAGS = {'strong': '**', 'b': '**', 'em': '_', 'i': '_', 's': '~~', 'del': '~~', 'strike': '~~'}
+SKIP_TAGS = {'script', 'style', 'head', 'title', 'noscript'}
+VOID_TAGS = {'img', 'br', 'hr', 'meta', 'link', 'input', 'source', 'wbr'}
+
+# 与原有 html2text 流程一致，不换行空格也按普通空白处理
+WHITESPACE_RE = re.compile(r'[ \t\r\n\f\xa0]+')
+# 行首的有序/无序列表标记需要转义，避免被当作列表
+ORDERED_LIST_RE = re.compile(r'^(\d+)\.(?=\s)')
+UNORDERED_LIST_RE = re.compile(r'^([-+])(?=\s)')
+# html2text 在强调结束后、紧跟文字时补一个空格
+AFTER_EMPHASIS_RE = re.compile(r'[^][(){}\s.!?]')
+
+
+class MarkdownWriter:
+    # 接收解析事件（start/end/data），一次遍历直接生成 Markdown
+    def __init__(self, image_map=None):
+        self.image_map = image_map or {}
+        self.out = []
+        self.line_start = True
+        self.pending_space = False
+        self.pending_newlines = 0
+        self.pending_opens = []
+        self.inline_stack = []
+        self.quote_depth = 0
+        self.lists = []
+        self.pre_depth = 0
+        self.skip_depth = 0
+        self.table_row = None
+        self.table_first_row = False
+        self.block_start = False
+        self.current_tag = None
+        self.stressed = False
+        self.preceding_stressed = False
+
+    # 输出辅助方法
+    def _prefix(self):
+        return '> ' * self.quote_depth
+
+    def _block(self, newlines=2):
+        # 引用和列表项内的第一个段落不再额外空行
+        if self.out and not self.block_start:
+            self.pending_newlines = max(self.pending_newlines, newlines)
+        self.pending_space = False
+
+    def _flush_newlines(self):
+        if self.pending_newlines:
+            self.out.append('\n')
+            for _ in range(self.pending_newlines - 1):
+                self.out.append(self._prefix() + '\n')
+            self.pending_newlines = 0
+            self.line_start = True
+            self.pending_space = False
+
+    def _emit(self, text, escape=True):
+        self._flush_newlines()
+        if self.line_start:
+            self.out.append(self._prefix())
+            if escape and not self.pending_opens:
+                text = ORDERED_LIST_RE.sub(r'\1\\.', text)
+                text = UNORDERED_LIST_RE.sub(r'\\\1', text)
+        elif self.pending_space:
+            self.out.append(' ')
+        if self.pending_opens:
+            for marker in self.pending_opens:
+                self.out.append(self._separate(marker) + marker)
+            for item in self.inline_stack:
+                item['opened'] = True
+            self.pending_opens = []
+        self.out.append(text)
+        self.line_start = False
+        self.pending_space = False
+        self.block_start = False
+
+    def _separate(self, marker):
+        # 与 html2text 一致：斜体紧跟文字、粗体/删除线紧跟同样符号时在前面补空格
+        last = self.out[-1][-1:] if self.out else ''
+        if not last or last in string.whitespace:
+            return ''
+        if marker == '_' and last not in string.punctuation:
+            return ' '
+        if marker in ('**', '~~') and last == marker[0]:
+            return ' '
+        return ''
+
+    def _open_inline(self, tag, marker, close):
+        self.inline_stack.append({'tag': tag, 'marker': marker, 'close': close, 'opened': False})
+        self.pending_opens.append(marker)
+
+    def _close_inline(self, tag):
+        # 关闭到对应的开始标签为止，兼容未闭合的内联标签
+        if not any(item['tag'] == tag for item in self.inline_stack):
+            return
+        while True:
+            item = self.inline_stack.pop()
+            if item['opened']:
+                self.out.append(item['close'])
+                self.line_start = False
+            elif item['marker'] in self.pending_opens:
+                # 没有任何内容的强调/链接直接丢弃
+                self.pending_opens.remove(item['marker'])
+            if item['tag'] == tag:
+                break
+
+    # 解析事件
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if self.skip_depth or tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self.skip_depth += 1
+            return
+        self.current_tag = tag
+
+        if tag in BLOCK_TAGS:
+            self._block(2)
+        if tag in HEADING_TAGS:
+            self._open_inline(tag, '#' * HEADING_TAGS[tag] + ' ', '')
+        elif tag in EMPHASIS_TAGS:
+            self._open_inline(tag, EMPHASIS_TAGS[tag], EMPHASIS_TAGS[tag])
+            self.stressed = True
+        elif tag == 'code' and not self.pre_depth:
+            self._open_inline(tag, '`', '`')
+        elif tag == 'a':
+            href = attrs.get('href') or ''
+            if href and not href.startswith('javascript:'):
+                self._open_inline(tag, '[', f'](<{href}>)' if ' ' in href else f']({href})')
+            else:
+                self.inline_stack.append({'tag': tag, 'marker': None, 'close': '', 'opened': True})
+        elif tag == 'img':
+            self._image(attrs)
+        elif tag == 'br':
+            if self.pre_depth:
+                self.out.append('\n')
+            else:
+                self._flush_newlines()
+                self.out.append('  \n')
+            self.line_start = True
+            self.pending_space = False
+        elif tag == 'hr':
+            self._block(2)
+            self._emit('* * *', escape=False)
+            self._block(2)
+        elif tag == 'blockquote':
+            self._flush_newlines()
+            self.quote_depth += 1
+            self.block_start = True
+        elif tag in ('ul', 'ol'):
+            # 嵌套列表紧跟在上一级列表项之后，不空行
+            self._block(1 if self.lists else 2)
+            # 有序列表从 start 属性开始编号（计数在每个 li 开始时加一）
+            start = attrs.get('start') or ''
+            start = int(start) if re.fullmatch(r'-?\d+', start.strip()) else 1
+            self.lists.append([tag, start - 1])
+        elif tag == 'li':
+            self._block(1)
+            if self.lists:
+                self.lists[-1][1] += 1
+                kind, count = self.lists[-1]
+                bullet = f"{count}. " if kind == 'ol' else '* '
+            else:
+                bullet = '* '
+            self._open_inline(tag, '  ' * max(1, len(self.lists)) + bullet, '')
+            self.block_start = True
+        elif tag == 'pre':
+            self.pre_depth += 1
+        elif tag == 'table':
+            # 与 html2text 一致，每个表格的第一行之后都输出分隔行，不论是否使用 <th>
+            self.table_first_row = True
+        elif tag == 'tr':
+            self._block(1)
+            self.table_row = {'cells': 0}
+        elif tag in ('td', 'th'):
+            if self.table_row is not None:
+                if self.table_row['cells']:
+                    self._emit('| ', escape=False)
+                self.table_row['cells'] += 1
+
+    def end(self, tag):
+        tag = tag.lower()
+        if self.skip_depth:
+            if tag not in VOID_TAGS:
+                self.skip_depth -= 1
+            return
+        if tag in VOID_TAGS:
+            return
+
+        if tag in HEADING_TAGS or tag in EMPHASIS_TAGS or tag in ('a', 'code', 'li'):
+            self._close_inline(tag)
+        if tag == 'blockquote':
+            self.quote_depth = max(0, self.quote_depth - 1)
+        elif tag in ('ul', 'ol'):
+            if self.lists:
+                self.lists.pop()
+            self._block(1 if self.lists else 2)
+        elif tag == 'pre':
+            self.pre_depth = max(0, self.pre_depth - 1)
+        elif tag == 'tr' and self.table_row is not None:
+            if self.table_first_row and self.table_row['cells']:
+                self.out.append('\n' + '|'.join(['---'] * self.table_row['cells']))
+                self.table_first_row = False
+            self.table_row = None
+
+        if tag in BLOCK_TAGS:
+            self._block(2)
+
+    def data(self, text):
+        if self.skip_depth or not text:
+            return
+        if self.pre_depth:
+            self._pre_text(text)
+            return
+
+        text = WHITESPACE_RE.sub(' ', text)
+        if self.stressed:
+            # 强调内容首尾的空白直接去掉
+            text = text.strip(' ')
+            self.stressed = False
+            self.preceding_stressed = True
+        elif self.preceding_stressed:
+            if AFTER_EMPHASIS_RE.match(text) and self.current_tag not in HEADING_TAGS \
+                    and self.current_tag not in ('a', 'code', 'pre'):
+                self.pending_space = True
+            self.preceding_stressed = False
+        core = text.strip(' ')
+        if not core:
+            if not self.line_start and not self.pending_newlines:
+                self.pending_space = True
+            return
+        if text[0] == ' ':
+            self.pending_space = True
+        self._emit(core)
+        if text[-1] == ' ':
+            self.pending_space = True
+
+    def _pre_text(self, text):
+        # 代码块保留原始换行，每行缩进 4 个空格
+        if self.pending_newlines:
+            self._flush_newlines()
+        for i, line in enumerate(text.split('\n')):
+            if i:
+                self.out.append('\n')
+                self.line_start = True
+            if line or i:
+                if self.line_start:
+                    self.out.append(self._prefix() + '    ')
+                    self.line_start = False
+                self.out.append(line)
+
+    def _image(self, attrs):
+        src = attrs.get('data-src') or attrs.get('src')
+        if src in self.image_map:
+            # 已下载的图片使用本地相对路径，前后与文字之间留一个空格
+            self.pending_space = True
+            self._emit(f"![image]({self.image_map[src]})", escape=False)
+            self.pending_space = True
+        elif attrs.get('src'):
+            self._emit(f"![{attrs.get('alt') or ''}]({attrs['src']})", escape=False)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        markdown = ''.join(self.out)
+        markdown = re.sub(r'[ \t]+\n(?=\n)', '\n', markdown)
+        markdown = re.sub(r'\n{3,}', '\n\n', markdown)
+        return markdown.strip('\n') + '\n'
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, writer):
+        super().__init__(convert_charrefs=True)
+        self.writer = writer
+
+    def handle_starttag(self, tag, attrs):
+        self.writer.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.writer.end(tag)
+
+    def handle_data(self, data):
+        self.writer.data(data)
+
+
+def html_to_markdown(html, image_map=None, backend=None):
+    # backend 为 'lxml' 或 'html.parser'，默认有 lxml 时使用 lxml。
+    # 输出与 html2text 只有空白排版不同（见 tests/test_markdown_converter.py），已知差异：
+    # - 地址中含空格的链接写作 [文字](<地址>)，html2text 原样输出空格，链接会断开
+    # - html2text 为空的 <strong></strong> 输出 "****"，这里不输出
+    writer = MarkdownWriter(image_map)
+    backend = backend or ('lxml' if etree is not None else 'html.parser')
+    if backend == 'lxml':
+        if not html.strip():
+            return writer.close()
+        parser = etree.HTMLParser(target=writer, encoding='utf-8')
+        return etree.fromstring(html.encode('utf-8'), parser)
+    parser = _StdlibParser(writer)
+    parser.feed(html)
+    parser.close()
+    return writer.close()
+
+
+def render_article(article, image_map=None, converter='fast'):
+    # 生成完整的 Markdown 文件内容（标题、原文链接和正文），保存文章和离线重新生成共用
+    if converter == 'html2text':
+        content_markdown = html2text_markdown(article['content_html'], image_map)
+    else:
+        content_markdown = html_to_markdown(article['content_html'], image_map)
+    return f"""# {article['title']}
+
+> 原文链接：{article['url']}
+
+{content_markdown}"""
+
+
+def html2text_markdown(html, image_map=None):
+    # 原有的转换方式：BeautifulSoup 替换图片后再交给 html2text，保留用于兼容和对比
+    import html2text
+    from bs4 import BeautifulSoup
+
+    image_map = image_map or {}
+    soup = BeautifulSoup(html, 'html.parser')
+    for img in soup.find_all('img'):
+        src = img.get('data-src') or img.get('src')
+        if src in image_map:
+            markdown_img = f'\n\n![image]({image_map[src]})\n\n'
+            img.replace_with(BeautifulSoup(markdown_img, 'html.parser'))
+
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = False
+    h.ignore_emphasis = False
+    h.body_width = 0
+    h.unicode_snob = True
+    return h.handle(str(soup))
@@ -0,0 +1,225 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# 每份性能分析结果保存为 <请求 ID>.json（摘要），以及 <请求 ID>.prof（cProfile，可用 snakeviz 等查看）
+# 或 <请求 ID>.folded（采样得到的折叠调用栈，可直接生成火焰图）
+SUMMARY_SUFFIX = '.json'
+
+# 同一进程中同时只能运行一个 cProfile（Python 3.12 起第二个会抛出 ValueError），
+# 已被占用时改为采样调用栈
+_cprofile_lock = threading.Lock()
+
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class StackSampler:
+    # 在后台线程中定时采样目标线程的 Python 调用栈，开销很小，可以对每个请求常开，
+    # 请求结束后只保留耗时超过阈值的结果；skip 为调用栈最外层要忽略的帧数（线程入口、任务队列等）
+    def __init__(self, thread_id, interval=0.01, skip=0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.skip = skip
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = tuple(reversed(stack))[self.skip:]
+            if not stack:
+                continue
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top_functions(self, limit=20):
+        # 某函数出现在调用栈中的采样数即其累计耗时的估计
+        cumulative = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack):
+                cumulative[label] += count
+            own[stack[-1]] += count
+        return [
+            {
+                'function': label,
+                'cumulative': round(count * self.interval, 4),
+                'own': round(own[label] * self.interval, 4),
+                'percent': round(count * 100 / (self.samples or 1), 1),
+            }
+            for label, count in cumulative.most_common(limit)
+        ]
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+
+def cprofile_top_functions(profile, limit=20):
+    stats = pstats.Stats(profile)
+    total = stats.total_tt or 1
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'cumulative': round(cumtime, 4),
+            'own': round(tottime, 4),
+            'percent': round(cumtime * 100 / total, 1),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class RequestProfiler:
+    # 在当前线程中运行 func 并按需进行性能分析：
+    # - force 为 True（管理员请求）或 always 时使用 cProfile 完整记录当前线程的调用；
+    #   其他线程正在使用 cProfile 或无法开启时改为采样，结果同样保存
+    # - 否则在 slow_threshold > 0 时采样调用栈，耗时超过阈值才保存
+    # 性能分析本身出错时只记录警告，不影响 func 的执行
+    def __init__(self, profile_dir, slow_threshold=0, sample_interval=0.01, max_profiles=100, top=20,
+                 always=False):
+        self.profile_dir = profile_dir
+        self.always = always
+        self.slow_threshold = slow_threshold
+        self.sample_interval = sample_interval
+        self.max_profiles = max_profiles
+        self.top = top
+        self._lock = threading.Lock()
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def _start_cprofile(self, request_id):
+        if not _cprofile_lock.acquire(blocking=False):
+            logger.info(f"cProfile 正在被其他请求使用，改为采样: {request_id}")
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            _cprofile_lock.release()
+            logger.warning(f"无法开启 cProfile，改为采样 {request_id}: {str(e)}")
+            return None
+        return profile
+
+    def run(self, request_id, func, force=False, **info):
+        force = force or self.always
+        profile = self._start_cprofile(request_id) if force else None
+        if profile is not None:
+            mode = 'cprofile'
+        elif force or self.slow_threshold > 0:
+            mode = 'sampling'
+            # 忽略 run 及其外层的帧，只统计 func 内部的调用
+            depth = 0
+            frame = sys._getframe()
+            while frame is not None:
+                depth += 1
+                frame = frame.f_back
+            profile = StackSampler(threading.get_ident(), self.sample_interval, skip=depth)
+            try:
+                profile.start()
+            except Exception as e:
+                logger.warning(f"无法开启调用栈采样 {request_id}: {str(e)}")
+                return func()
+        else:
+            return func()
+
+        start = time.perf_counter()
+        error = None
+        try:
+            return func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if mode == 'cprofile':
+                profile.disable()
+                _cprofile_lock.release()
+            else:
+                profile.stop()
+            if force or duration >= self.slow_threshold:
+                try:
+                    self.save(request_id, mode, profile, duration, error, info)
+                except Exception as e:
+                    logger.warning(f"保存性能分析结果失败 {request_id}: {str(e)}")
+
+    def save(self, request_id, mode, profile, duration, error, info):
+        base = os.path.join(self.profile_dir, request_id)
+        if mode == 'cprofile':
+            profile.dump_stats(f"{base}.prof")
+            top = cprofile_top_functions(profile, self.top)
+            data_file = f"{request_id}.prof"
+        else:
+            profile.write(f"{base}.folded")
+            top = profile.top_functions(self.top)
+            data_file = f"{request_id}.folded"
+        summary = {
+            'request_id': request_id,
+            'mode': mode,
+            'duration': round(duration, 4),
+            'created_at': time.time(),
+            'error': error,
+            'data_file': data_file,
+            'top': top,
+            **info,
+        }
+        tmp_path = f"{base}{SUMMARY_SUFFIX}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, f"{base}{SUMMARY_SUFFIX}")
+        logger.info(f"已保存性能分析结果（{mode}，{duration:.2f} 秒）: {base}{SUMMARY_SUFFIX}")
+        self.prune()
+
+    def _summary_files(self):
+        names = [name for name in os.listdir(self.profile_dir) if name.endswith(SUMMARY_SUFFIX)]
+        paths = [os.path.join(self.profile_dir, name) for name in names]
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    def prune(self):
+        # 只保留最近的 max_profiles 份结果
+        with self._lock:
+            for path in self._summary_files()[self.max_profiles:]:
+                base = path[:-len(SUMMARY_SUFFIX)]
+                for suffix in (SUMMARY_SUFFIX, '.prof', '.folded'):
+                    if os.path.exists(base + suffix):
+                        os.remove(base + suffix)
+
+    def recent(self, limit=20, top=10):
+        # 按时间倒序返回最近的分析结果摘要，每份只保留前 top 个函数
+        results = []
+        for path in self._summary_files()[:limit]:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary['top'] = summary['top'][:top]
+            results.append(summary)
+        return results
@@ -0,0 +1,166 @@
+import configparser
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 公众号的验证页面 / 频率限制页面中出现的文字
+BLOCKED_MARKERS = ('环境异常', '完成验证后即可继续访问', '访问过于频繁', '操作频繁',
+                   'wappoc_appmsgcaptcha', 'secitptpage/verify')
+
+# 配置中的保留键，其余带点号的键都视为域名
+RESERVED_KEYS = ('default', 'backoff', 'max_backoff', 'workers')
+
+
+def looks_blocked(text):
+    return bool(text) and any(marker in text for marker in BLOCKED_MARKERS)
+
+
+def parse_rate(value):
+    # "2/4" 表示每秒 2 个请求、最多连续 4 个；只写 "2" 时突发数等于速率。
+    # 速率必须大于 0，配置错误在加载时报出，而不是在第一次请求时除零
+    rate, _, burst = value.partition('/')
+    try:
+        rate = float(rate)
+        burst = float(burst) if burst else max(1.0, rate)
+    except ValueError:
+        raise ValueError(f"无效的限流速率 {value!r}，格式为 每秒请求数/最多连续请求数") from None
+    if not rate > 0 or not burst > 0:
+        raise ValueError(f"无效的限流速率 {value!r}，请求数必须大于 0")
+    return rate, max(1.0, burst)
+
+
+class HostBucket:
+    def __init__(self, host, rate, burst):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # 被限流时速率倍数减半，之后每次成功逐步恢复
+        self.factor = 1.0
+        self.blocked_until = 0.0
+        self.failures = 0
+
+    def current_rate(self):
+        return self.rate * self.factor
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.current_rate())
+        self.updated = now
+
+
+class HostRateLimiter:
+    # 每个域名一个令牌桶；遇到 429、5xx 或验证页面时暂停该域名并降低速率
+    def __init__(self, rates=None, default=(2.0, 4.0), backoff=5.0, max_backoff=300.0,
+                 min_factor=0.05, recovery=0.1, workers=4):
+        self.rates = dict(rates or {})
+        self.default = default
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.min_factor = min_factor
+        self.recovery = recovery
+        self.workers = max(1, workers)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config=None, path='config.ini'):
+        if config is None:
+            config = configparser.ConfigParser()
+            config.read(path, encoding='utf-8')
+        if not config.has_section('RateLimit'):
+            return cls()
+        section = config['RateLimit']
+        rates = {key: parse_rate(value) for key, value in section.items()
+                 if key not in RESERVED_KEYS and '.' in key}
+        return cls(
+            rates,
+            default=parse_rate(section.get('default', '2/4')),
+            backoff=section.getfloat('backoff', 5.0),
+            max_backoff=section.getfloat('max_backoff', 300.0),
+            workers=section.getint('workers', 4)
+        )
+
+    def _rate_for(self, host):
+        # 按域名后缀匹配，最长的匹配优先（qpic.cn 匹配 mmbiz.qpic.cn）
+        matches = [key for key in self.rates if host == key or host.endswith('.' + key)]
+        if not matches:
+            return self.default
+        return self.rates[max(matches, key=len)]
+
+    def _bucket(self, url):
+        host = (urlparse(url).hostname or '').lower()
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = HostBucket(host, *self._rate_for(host))
+            return self._buckets[host]
+
+    def reserve(self, url):
+        # 不阻塞：取到令牌时返回 0，否则返回还需等待的秒数（asyncio 中配合 asyncio.sleep 使用）
+        bucket = self._bucket(url)
+        with self._lock:
+            now = time.monotonic()
+            bucket.refill(now)
+            if now < bucket.blocked_until:
+                return bucket.blocked_until - now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / bucket.current_rate()
+
+    def acquire(self, url):
+        # 阻塞直到该域名有可用令牌，返回等待的秒数
+        waited = 0.0
+        while True:
+            wait = self.reserve(url)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def report(self, url, status=None, blocked=False, retry_after=None):
+        # 请求结束后反馈结果：限流时指数退避，成功时逐步恢复速率
+        bucket = self._bucket(url)
+        throttled = blocked or status == 429 or (status is not None and status >= 500)
+        with self._lock:
+            now = time.monotonic()
+            bucket.refill(now)
+            if not throttled:
+                bucket.failures = 0
+                bucket.factor = min(1.0, round(bucket.factor + self.recovery, 6))
+                return
+            bucket.failures += 1
+            bucket.factor = max(self.min_factor, bucket.factor / 2)
+            delay = min(self.max_backoff, self.backoff * 2 ** (bucket.failures - 1))
+            if retry_after:
+                delay = max(delay, min(self.max_backoff, retry_after))
+            bucket.blocked_until = max(bucket.blocked_until, now + delay)
+            bucket.tokens = 0
+        reason = '验证页面' if blocked else f"状态码 {status}"
+        logger.warning(f"{bucket.host} 被限流（{reason}），暂停 {delay:.1f} 秒，"
+                       f"速率降至 {bucket.current_rate():.2f}/秒")
+
+    def report_response(self, url, response):
+        # requests 响应的便捷写法，Retry-After 只支持秒数；
+        # url 为请求的地址而不是 response.url，重定向到其他域名时仍然限制原来的域名
+        retry_after = response.headers.get('Retry-After', '')
+        self.report(
+            url,
+            status=response.status_code,
+            retry_after=float(retry_after) if retry_after.isdigit() else None
+        )
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                host: {
+                    'rate': bucket.current_rate(),
+                    'paused': max(0.0, bucket.blocked_until - now),
+                    'failures': bucket.failures,
+                }
+                for host, bucket in self._buckets.items()
+            }
@@ -0,0 +1,113 @@
+import argparse
+import configparser
+import logging
+import os
+import time
+from datetime import datetime
+from functools import partial
+from multiprocessing import Pool
+
+from article_index import ArticleIndex, article_location
+from article_snapshot import iter_snapshots, markdown_path, read_snapshot, write_snapshot
+from image_store import ImageStore
+from markdown_converter import render_article
+from search_index import SearchIndex
+from simhash_index import SimHashIndex
+
+logger = logging.getLogger(__name__)
+
+# 每个工作进程各自打开图片库
+_image_stores = {}
+
+
+def _image_store(base_dir):
+    if base_dir not in _image_stores:
+        _image_stores[base_dir] = ImageStore(os.path.join(base_dir, '.images'))
+    return _image_stores[base_dir]
+
+
+def rerender_snapshot(path, base_dir, converter='fast'):
+    # 在工作进程中执行：根据快照和已下载的图片重新生成 Markdown，不访问网络
+    # 返回 (状态, 文件路径, 错误信息)，状态为 rendered、moved 或 failed
+    try:
+        snapshot = read_snapshot(path)
+        saved_at = snapshot.get('saved_at')
+        article_dir, filepath, _, _ = article_location(
+            base_dir, snapshot, datetime.fromtimestamp(saved_at) if saved_at else None
+        )
+        images_dir = os.path.join(article_dir, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+
+        # 图片不在 images 目录时（例如目录结构变化），从图片库重新链接；都找不到则保留原始链接
+        image_map = {}
+        for url, relpath in (snapshot.get('image_map') or {}).items():
+            filename = os.path.basename(relpath)
+            if not os.path.exists(os.path.join(images_dir, filename)):
+                stored = _image_store(base_dir).lookup(url)
+                if stored is None:
+                    continue
+                filename = _image_store(base_dir).link_into(stored, images_dir)
+            image_map[url] = f"./images/{filename}"
+
+        markdown_content = render_article(snapshot, image_map, converter)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(markdown_content)
+
+        old_filepath = markdown_path(path)
+        if os.path.abspath(old_filepath) == os.path.abspath(filepath):
+            return 'rendered', filepath, None
+        # 保存位置发生变化：在新位置写入快照，删除旧文件
+        write_snapshot(filepath, snapshot, image_map, saved_at)
+        for old in (old_filepath, path):
+            if os.path.exists(old):
+                os.remove(old)
+        return 'moved', filepath, None
+    except Exception as e:
+        return 'failed', path, f"{type(e).__name__}: {str(e)}"
+
+
+def rerender_all(save_path, converter='fast', workers=None, maxtasksperchild=200, min_chars=200):
+    paths = list(iter_snapshots(save_path))
+    counts = {'rendered': 0, 'moved': 0, 'failed': 0}
+    start = time.perf_counter()
+    task = partial(rerender_snapshot, base_dir=save_path, converter=converter)
+    with Pool(processes=workers, maxtasksperchild=maxtasksperchild) as pool:
+        for status, filepath, error in pool.imap_unordered(task, paths, chunksize=8):
+            counts[status] += 1
+            if error:
+                logger.warning(f"重新生成失败 {filepath}: {error}")
+    logger.info(f"重新生成 {len(paths)} 篇文章，耗时 {time.perf_counter() - start:.2f} 秒")
+
+    # 文件内容（和可能的位置）已变化，重建文章索引、全文索引和指纹索引；
+    # min_chars 与保存时的 [Dedup] min_chars 一致，否则重建后的指纹与新保存的文章不一致
+    index = ArticleIndex.for_save_path(save_path)
+    index.rebuild(save_path)
+    index.close()
+    search = SearchIndex.for_save_path(save_path)
+    search.reindex(save_path, workers)
+    search.close()
+    fingerprints = SimHashIndex.for_save_path(save_path)
+    fingerprints.rebuild(save_path, min_chars)
+    fingerprints.close()
+    return counts
+
+
+if __name__ == '__main__':
+    config = configparser.ConfigParser()
+    config.read('config.ini', encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description='根据快照离线重新生成所有文章的 Markdown')
+    parser.add_argument('save_path', nargs='?',
+                        default=config.get('Path', 'save_path', fallback='articles'),
+                        help='文章保存目录，默认读取 config.ini')
+    parser.add_argument('--converter', choices=('fast', 'html2text'),
+                        default=config.get('Markdown', 'converter', fallback='fast'),
+                        help='HTML 转 Markdown 的方式，默认读取 config.ini')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    save_path = os.path.normpath(args.save_path)
+    counts = rerender_all(save_path, args.converter, args.workers,
+                          min_chars=config.getint('Dedup', 'min_chars', fallback=200))
+    print(f"已重新生成 {counts['rendered']} 篇，移动 {counts['moved']} 篇，失败 {counts['failed']} 篇")
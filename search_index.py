@@ -0,0 +1,256 @@
+import argparse
+import configparser
+import logging
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from article_index import read_saved_article, iter_saved_files
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = '.search_index.db'
+
+# 中文没有空格分词，连续的汉字切成相邻的二元组（"城市更新" -> "城市 市更 更新"）
+CJK_CHARS = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+CJK_RUN_RE = re.compile(f'[{CJK_CHARS}]+')
+WORD_RE = re.compile(f'[{CJK_CHARS}]+|[^\\W{CJK_CHARS}]+')
+
+
+def tokenize(text):
+    tokens = []
+    for match in WORD_RE.finditer(text.lower()):
+        word = match.group(0)
+        if CJK_RUN_RE.fullmatch(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def build_match_query(query):
+    # 每个检索词转换为一个短语，多个检索词之间为 AND 关系；单个汉字按前缀匹配
+    phrases = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and CJK_RUN_RE.fullmatch(tokens[0]) and len(tokens[0]) == 1:
+            phrases.append(f'"{tokens[0]}"*')
+        else:
+            phrases.append('"' + ' '.join(tokens) + '"')
+    return ' AND '.join(phrases)
+
+
+def normalize_date(value):
+    # 支持 20240102 和 2024-01-02 两种写法
+    if not value:
+        return None
+    digits = re.sub(r'\D', '', value)
+    return digits if len(digits) == 8 else None
+
+
+def make_snippet(text, query, width=60):
+    # 在正文中找到第一个命中的检索词，截取前后文字
+    body = re.sub(r'\s+', ' ', text)
+    terms = [term for term in query.split() if term]
+    positions = [(body.lower().find(term.lower()), term) for term in terms]
+    positions = [(pos, term) for pos, term in positions if pos >= 0]
+    if not positions:
+        return body[:width * 2] + ('…' if len(body) > width * 2 else '')
+    pos, term = min(positions)
+    start = max(0, pos - width)
+    end = min(len(body), pos + len(term) + width)
+    snippet = body[start:end]
+    for term in terms:
+        snippet = re.sub(re.escape(term), lambda m: f"**{m.group(0)}**", snippet, flags=re.IGNORECASE)
+    return ('…' if start else '') + snippet + ('…' if end < len(body) else '')
+
+
+def _prepare_document(args):
+    # 在子进程中读取并分词，返回写入索引所需的字段
+    save_path, filepath = args
+    saved = read_saved_article(save_path, filepath)
+    if not saved:
+        return None
+    return {
+        'path': os.path.abspath(filepath),
+        'url': saved['url'],
+        'title': saved['title'] or '',
+        'author': saved['author'],
+        'publish_date': saved['publish_date'],
+        'mtime': saved['mtime'],
+        'title_tokens': ' '.join(tokenize(saved['title'] or '')),
+        'body_tokens': ' '.join(tokenize(saved['text'])),
+    }
+
+
+class SearchIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS docs ('
+            'id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, url TEXT, title TEXT, '
+            'author TEXT, publish_date TEXT, mtime REAL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS docs_author ON docs (author)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS docs_publish_date ON docs (publish_date)')
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+            "title, body, tokenize='unicode61 remove_diacritics 0')"
+        )
+        self._db.commit()
+
+    @classmethod
+    def for_save_path(cls, save_path):
+        return cls(os.path.join(save_path, INDEX_FILENAME))
+
+    def _upsert(self, doc):
+        row = self._db.execute('SELECT id FROM docs WHERE path = ?', (doc['path'],)).fetchone()
+        if row is not None:
+            self._db.execute('DELETE FROM docs_fts WHERE rowid = ?', (row['id'],))
+            self._db.execute(
+                'UPDATE docs SET url = ?, title = ?, author = ?, publish_date = ?, mtime = ? WHERE id = ?',
+                (doc['url'], doc['title'], doc['author'], doc['publish_date'], doc['mtime'], row['id'])
+            )
+            doc_id = row['id']
+        else:
+            doc_id = self._db.execute(
+                'INSERT INTO docs (path, url, title, author, publish_date, mtime) VALUES (?, ?, ?, ?, ?, ?)',
+                (doc['path'], doc['url'], doc['title'], doc['author'], doc['publish_date'], doc['mtime'])
+            ).lastrowid
+        self._db.execute(
+            'INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)',
+            (doc_id, doc['title_tokens'], doc['body_tokens'])
+        )
+
+    def add_document(self, path, url, title, author, publish_date, text):
+        # save_article 每次写入文件后调用，增量更新索引
+        path = os.path.abspath(path)
+        doc = {
+            'path': path,
+            'url': url,
+            'title': title,
+            'author': author,
+            'publish_date': publish_date,
+            'mtime': os.path.getmtime(path),
+            'title_tokens': ' '.join(tokenize(title)),
+            'body_tokens': ' '.join(tokenize(text)),
+        }
+        with self._lock:
+            self._upsert(doc)
+            self._db.commit()
+
+    def search(self, query, author=None, date_from=None, date_to=None, limit=20, offset=0):
+        match = build_match_query(query)
+        if not match:
+            return []
+        sql = ('SELECT docs.*, bm25(docs_fts, 5.0, 1.0) AS score FROM docs_fts '
+               'JOIN docs ON docs.id = docs_fts.rowid WHERE docs_fts MATCH ?')
+        params = [match]
+        if author:
+            sql += ' AND docs.author = ?'
+            params.append(author)
+        if normalize_date(date_from):
+            sql += ' AND docs.publish_date >= ?'
+            params.append(normalize_date(date_from))
+        if normalize_date(date_to):
+            sql += ' AND docs.publish_date <= ?'
+            params.append(normalize_date(date_to))
+        sql += ' ORDER BY score LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        hits = []
+        for row in rows:
+            try:
+                with open(row['path'], 'r', encoding='utf-8') as f:
+                    snippet = make_snippet(f.read(), query)
+            except OSError:
+                continue
+            hits.append({
+                'filepath': row['path'],
+                'url': row['url'],
+                'title': row['title'],
+                'author': row['author'],
+                'publish_date': row['publish_date'],
+                'score': -row['score'],
+                'snippet': snippet
+            })
+        return hits
+
+    def reindex(self, save_path, workers=None, full=False, batch_size=100):
+        # 并行读取和分词，只重新索引新增或修改过的文件；full 为 True 时全部重新索引。
+        # 每批写入时才持有锁，重建期间检索和保存文章时的增量更新不会被长时间阻塞
+        with self._lock:
+            known = {row['path']: row['mtime'] for row in self._db.execute('SELECT path, mtime FROM docs')}
+
+        paths = [os.path.abspath(p) for p in iter_saved_files(save_path)]
+        changed = paths if full else [p for p in paths if known.get(p) != os.path.getmtime(p)]
+        removed = set(known) - set(paths)
+
+        indexed = 0
+        batch = []
+
+        def write_batch():
+            with self._lock:
+                for doc in batch:
+                    self._upsert(doc)
+                self._db.commit()
+            batch.clear()
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            docs = executor.map(_prepare_document, [(save_path, p) for p in changed], chunksize=16)
+            for doc in docs:
+                if doc:
+                    batch.append(doc)
+                    indexed += 1
+                    if len(batch) >= batch_size:
+                        write_batch()
+        write_batch()
+
+        with self._lock:
+            for path in removed:
+                row = self._db.execute('SELECT id FROM docs WHERE path = ?', (path,)).fetchone()
+                if row is None:
+                    continue
+                self._db.execute('DELETE FROM docs_fts WHERE rowid = ?', (row['id'],))
+                self._db.execute('DELETE FROM docs WHERE id = ?', (row['id'],))
+            self._db.commit()
+        logger.info(f"全文索引更新完成：新增或更新 {indexed} 篇，删除 {len(removed)} 篇")
+        return indexed, len(removed)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == '__main__':
+    config = configparser.ConfigParser()
+    config.read('config.ini', encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description='重建已保存文章的全文索引')
+    parser.add_argument('save_path', nargs='?',
+                        default=config.get('Path', 'save_path', fallback='articles'),
+                        help='文章保存目录，默认读取 config.ini')
+    parser.add_argument('--workers', type=int, default=None, help='并行分词的进程数')
+    parser.add_argument('--full', action='store_true', help='重新索引所有文件（默认只索引新增或修改过的文件）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    save_path = os.path.normpath(args.save_path)
+    index = SearchIndex.for_save_path(save_path)
+    indexed, removed = index.reindex(save_path, args.workers, args.full)
+    index.close()
+    print(f"已索引 {indexed} 篇文章，删除 {removed} 篇: {index.db_path}")
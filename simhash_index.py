@@ -0,0 +1,269 @@
+import argparse
+import configparser
+import hashlib
+import html
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from article_index import iter_saved_files
+from article_snapshot import iter_snapshots, markdown_path, read_snapshot, snapshot_path
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = '.simhash_index.db'
+BITS = 64
+# 中文没有分词，按连续 3 个字符取特征
+SHINGLE_SIZE = 3
+
+SKIP_BLOCK_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.S | re.I)
+TAG_RE = re.compile(r'<[^>]+>')
+# 去掉 Markdown 中的图片、链接地址和标记符号，只保留文字
+MD_IMAGE_RE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+MD_LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+MD_MARK_RE = re.compile(r'[#>*_`~|-]+')
+
+
+def html_text(content_html):
+    text = SKIP_BLOCK_RE.sub(' ', content_html or '')
+    return html.unescape(TAG_RE.sub(' ', text))
+
+
+def markdown_text(markdown):
+    # 跳过文件头（标题和原文链接）后的正文文字
+    lines = markdown.splitlines()
+    header = [i for i, line in enumerate(lines[:10]) if line.startswith('> 原文链接：')]
+    body = '\n'.join(lines[header[0] + 1:] if header else lines)
+    body = MD_IMAGE_RE.sub(' ', body)
+    body = MD_LINK_RE.sub(r'\1', body)
+    return MD_MARK_RE.sub(' ', body)
+
+
+def normalize_text(text):
+    # 去掉所有空白，排版差异不影响指纹
+    return ''.join(text.split())
+
+
+def simhash(text):
+    # 64 位 SimHash：每个特征取 8 字节哈希，按字节位置统计每一位为 1 的次数，超过半数则该位为 1。
+    # 重复出现的特征按出现次数加权
+    count = len(text) - SHINGLE_SIZE + 1
+    if count <= 0:
+        return 0
+    digests = b''.join(
+        hashlib.blake2b(text[i:i + SHINGLE_SIZE].encode('utf-8'), digest_size=8).digest()
+        for i in range(count)
+    )
+    value = 0
+    for position in range(8):
+        byte_counts = Counter(digests[position::8])
+        for bit in range(8):
+            mask = 1 << bit
+            ones = sum(n for byte, n in byte_counts.items() if byte & mask)
+            if ones * 2 > count:
+                value |= 1 << (8 * (7 - position) + bit)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def similarity(a, b):
+    return 1 - hamming(a, b) / BITS
+
+
+def max_distance_for(min_similarity):
+    # 相似度阈值换算为允许的最大汉明距离，例如 0.95 -> 3 位
+    return max(0, int((1 - min_similarity) * BITS + 1e-9))
+
+
+def _to_signed(value):
+    # SQLite 的 INTEGER 为有符号 64 位
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class SimHashIndex:
+    # 全部文章的 SimHash 指纹。数据库只保存指纹，内存中按分段建立桶：
+    # 汉明距离不超过 max_distance 的两个指纹，分成 max_distance + 1 段后至少有一段完全相同，
+    # 因此查询只需比较同桶的少量候选
+    def __init__(self, db_path, max_distance=3):
+        self.db_path = db_path
+        self.max_distance = max(0, min(max_distance, BITS // 4))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            'filepath TEXT PRIMARY KEY, url TEXT, simhash INTEGER NOT NULL, length INTEGER, added_at REAL)'
+        )
+        self._db.commit()
+
+        bands = self.max_distance + 1
+        widths = [BITS // bands + (1 if i < BITS % bands else 0) for i in range(bands)]
+        self._bands = []
+        shift = BITS
+        for width in widths:
+            shift -= width
+            self._bands.append((shift, (1 << width) - 1))
+        self._buckets = [{} for _ in self._bands]
+        self._fingerprints = {}
+        self._load()
+
+    @classmethod
+    def for_save_path(cls, save_path, max_distance=3):
+        return cls(os.path.join(save_path, INDEX_FILENAME), max_distance)
+
+    def _load(self):
+        with self._lock:
+            rows = self._db.execute('SELECT filepath, url, simhash FROM fingerprints').fetchall()
+            for filepath, url, value in rows:
+                self._insert(filepath, url, _to_unsigned(value))
+
+    def _insert(self, filepath, url, value):
+        # 调用方需持有 _lock
+        self._discard(filepath)
+        self._fingerprints[filepath] = (value, url)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((value >> shift) & mask, set()).add(filepath)
+
+    def _discard(self, filepath):
+        old = self._fingerprints.pop(filepath, None)
+        if old is None:
+            return
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            key = (old[0] >> shift) & mask
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(filepath)
+                if not bucket:
+                    del buckets[key]
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def find(self, value, exclude=None):
+        # 返回最相近且文件仍然存在的文章 {'filepath', 'url', 'distance', 'similarity'}，没有时返回 None
+        with self._lock:
+            candidates = set()
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                candidates.update(buckets.get((value >> shift) & mask, ()))
+            candidates.discard(exclude)
+            matches = []
+            for filepath in candidates:
+                other, url = self._fingerprints[filepath]
+                distance = hamming(value, other)
+                if distance <= self.max_distance:
+                    matches.append((distance, filepath, url))
+        for distance, filepath, url in sorted(matches):
+            if os.path.exists(filepath):
+                return {
+                    'filepath': filepath,
+                    'url': url,
+                    'distance': distance,
+                    'similarity': round(1 - distance / BITS, 4),
+                }
+        return None
+
+    def add(self, filepath, url, value, length=None):
+        with self._lock:
+            self._insert(filepath, url, value)
+            self._db.execute(
+                'INSERT OR REPLACE INTO fingerprints (filepath, url, simhash, length, added_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (filepath, url, _to_signed(value), length, time.time())
+            )
+            self._db.commit()
+
+    def remove(self, filepath):
+        with self._lock:
+            self._discard(filepath)
+            self._db.execute('DELETE FROM fingerprints WHERE filepath = ?', (filepath,))
+            self._db.commit()
+
+    def rebuild(self, save_path, min_chars=200):
+        # 扫描保存目录：有快照时使用快照中的正文 HTML，否则使用 Markdown 正文
+        records = []
+        with_snapshot = set()
+        for path in iter_snapshots(save_path):
+            filepath = os.path.abspath(markdown_path(path))
+            try:
+                snapshot = read_snapshot(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取快照失败 {path}: {str(e)}")
+                continue
+            with_snapshot.add(filepath)
+            text = normalize_text(html_text(snapshot.get('content_html')))
+            if len(text) >= min_chars and os.path.exists(filepath):
+                records.append((filepath, snapshot.get('url'), simhash(text), len(text)))
+        for filepath in iter_saved_files(save_path):
+            filepath = os.path.abspath(filepath)
+            if filepath in with_snapshot or os.path.exists(snapshot_path(filepath)):
+                continue
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    markdown = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"读取文章失败 {filepath}: {str(e)}")
+                continue
+            text = normalize_text(markdown_text(markdown))
+            url = next((line[len('> 原文链接：'):].strip() for line in markdown.splitlines()[:10]
+                        if line.startswith('> 原文链接：')), None)
+            if len(text) >= min_chars:
+                records.append((filepath, url, simhash(text), len(text)))
+
+        now = time.time()
+        with self._lock:
+            self._fingerprints = {}
+            self._buckets = [{} for _ in self._bands]
+            for filepath, url, value, _ in records:
+                self._insert(filepath, url, value)
+            self._db.execute('DELETE FROM fingerprints')
+            self._db.executemany(
+                'INSERT OR REPLACE INTO fingerprints (filepath, url, simhash, length, added_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(filepath, url, _to_signed(value), length, now) for filepath, url, value, length in records]
+            )
+            self._db.commit()
+        logger.info(f"指纹索引重建完成，共 {len(records)} 篇")
+        return len(records)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def article_fingerprint(article, min_chars=200):
+    # 根据正文 HTML 计算指纹，返回 (指纹, 文字长度)；正文过短时指纹不可靠，返回 None
+    text = normalize_text(html_text(article.get('content_html')))
+    if len(text) < min_chars:
+        return None
+    return simhash(text), len(text)
+
+
+if __name__ == '__main__':
+    config = configparser.ConfigParser()
+    config.read('config.ini', encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description='重建已保存文章的 SimHash 指纹索引（用于识别转载的重复文章）')
+    parser.add_argument('save_path', nargs='?',
+                        default=config.get('Path', 'save_path', fallback='articles'),
+                        help='文章保存目录，默认读取 config.ini')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    save_path = os.path.normpath(args.save_path)
+    index = SimHashIndex.for_save_path(
+        save_path, max_distance_for(config.getfloat('Dedup', 'similarity', fallback=0.95))
+    )
+    count = index.rebuild(save_path, config.getint('Dedup', 'min_chars', fallback=200))
+    index.close()
+    print(f"已索引 {count} 篇文章: {index.db_path}")
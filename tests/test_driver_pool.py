@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from driver_pool import DriverPool, PoolClosed, PoolExhausted, PoolTimeout
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Factory:
+    def __init__(self):
+        self.drivers = []
+
+    def __call__(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+
+@pytest.fixture
+def factory():
+    return Factory()
+
+
+def test_lease_reuses_idle_driver(factory):
+    pool = DriverPool(factory, size=2)
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        assert second is first
+    assert len(factory.drivers) == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_checkout_times_out_when_pool_is_busy(factory):
+    pool = DriverPool(factory, size=1)
+    pooled = pool.checkout()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.checkout(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+    assert pool.stats()['waiters'] == 0
+    pool.checkin(pooled)
+
+
+def test_waiter_gets_returned_driver(factory):
+    pool = DriverPool(factory, size=1)
+    pooled = pool.checkout()
+    got = []
+    thread = threading.Thread(target=lambda: got.append(pool.checkout(timeout=5)))
+    thread.start()
+    while pool.stats()['waiters'] == 0:
+        time.sleep(0.001)
+    pool.checkin(pooled)
+    thread.join()
+    assert got == [pooled]
+    assert len(factory.drivers) == 1
+
+
+def test_bounded_wait_queue(factory):
+    pool = DriverPool(factory, size=1, max_waiters=1)
+    pooled = pool.checkout()
+    thread = threading.Thread(target=lambda: pool.checkout(timeout=0.5), daemon=True)
+    thread.start()
+    while pool.stats()['waiters'] == 0:
+        time.sleep(0.001)
+    with pytest.raises(PoolExhausted):
+        pool.checkout(timeout=0.5)
+    pool.checkin(pooled)
+    thread.join()
+
+
+def test_error_discards_driver(factory):
+    pool = DriverPool(factory, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.lease() as driver:
+            raise RuntimeError('boom')
+    assert driver.quit_called
+    with pool.lease() as replacement:
+        assert replacement is not driver
+
+
+def test_recycles_after_max_pages(factory):
+    pool = DriverPool(factory, size=1, max_pages=2)
+    for _ in range(3):
+        with pool.lease():
+            pass
+    assert len(factory.drivers) == 2
+    assert factory.drivers[0].quit_called
+
+
+def test_failed_launch_releases_slot(factory):
+    def broken():
+        raise RuntimeError('no chrome')
+
+    pool = DriverPool(broken, size=1)
+    with pytest.raises(RuntimeError):
+        pool.checkout(timeout=0.05)
+    pool.factory = factory
+    with pool.lease(timeout=0.05):
+        pass
+
+
+def test_drain_wakes_waiters_and_quits_drivers(factory):
+    pool = DriverPool(factory, size=1)
+    pooled = pool.checkout()
+    errors = []
+
+    def wait():
+        try:
+            pool.checkout(timeout=5)
+        except PoolClosed as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    while pool.stats()['waiters'] == 0:
+        time.sleep(0.001)
+    # 关闭后归还的浏览器在 checkin 中退出
+    checkin = threading.Timer(0.05, pool.checkin, (pooled,))
+    checkin.start()
+    pool.drain(timeout=5)
+    checkin.join()
+    thread.join()
+    assert len(errors) == 1
+    assert pooled.driver.quit_called
+    with pytest.raises(PoolClosed):
+        pool.checkout()
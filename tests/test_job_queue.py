@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import DONE, FAILED, JobManager, JobStore
+
+
+def key_func(url, save_path):
+    return url, save_path
+
+
+class BlockingHandler:
+    # 任务在 release 被设置之前一直阻塞，记录每次执行的任务
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, job, timings):
+        self.calls.append(job)
+        self.started.set()
+        self.release.wait(5)
+        if job['url'].endswith('/fail'):
+            raise RuntimeError('boom')
+        return {'url': job['url'], 'force': job['force']}
+
+
+@pytest.fixture
+def handler():
+    return BlockingHandler()
+
+
+@pytest.fixture
+def manager(tmp_path, handler):
+    coalesced = []
+    manager = JobManager(JobStore(str(tmp_path / 'jobs.db')), handler, workers=2,
+                         key_func=key_func, result_ttl=60, on_coalesce=coalesced.append)
+    manager.coalesced = coalesced
+    manager.start()
+    yield manager
+    handler.release.set()
+    manager.shutdown()
+
+
+def test_on_create_only_for_new_jobs(manager, handler):
+    created = []
+    first = manager.submit('https://a', on_create=created.append)
+    assert handler.started.wait(5)
+    assert manager.submit('https://a', on_create=created.append) == first
+    assert created == [first]
+    assert manager.coalesced == ['inflight']
+    handler.release.set()
+    assert manager.wait(first, 5)['status'] == DONE
+
+
+def test_identical_requests_share_one_job(manager, handler):
+    first = manager.submit('https://a')
+    assert handler.started.wait(5)
+    assert manager.submit('https://a') == first
+    other = manager.submit('https://b')
+    assert other != first
+    handler.release.set()
+    assert manager.wait(first, 5)['status'] == DONE
+    assert manager.wait(other, 5)['status'] == DONE
+    assert sorted(job['url'] for job in handler.calls) == ['https://a', 'https://b']
+
+
+def test_force_does_not_join_normal_job(manager, handler):
+    normal = manager.submit('https://a')
+    assert handler.started.wait(5)
+    forced = manager.submit('https://a', force=True)
+    assert forced != normal
+    # 之后的请求合并到对应的任务
+    assert manager.submit('https://a', force=True) == forced
+    assert manager.submit('https://a') == normal
+    handler.release.set()
+    assert manager.wait(forced, 5)['result'] == {'url': 'https://a', 'force': True}
+    assert manager.wait(normal, 5)['result'] == {'url': 'https://a', 'force': False}
+    assert manager.coalesced == ['inflight', 'inflight']
+
+
+def test_normal_request_joins_forced_job(manager, handler):
+    forced = manager.submit('https://a', force=True)
+    assert handler.started.wait(5)
+    assert manager.submit('https://a') == forced
+    handler.release.set()
+    assert manager.wait(forced, 5)['status'] == DONE
+    assert len(handler.calls) == 1
+
+
+def test_recent_result_reused_within_ttl(manager, handler):
+    handler.release.set()
+    first = manager.submit('https://a')
+    assert manager.wait(first, 5)['status'] == DONE
+    assert manager.submit('https://a') == first
+    assert manager.coalesced == ['recent']
+    # force 跳过短期结果缓存
+    forced = manager.submit('https://a', force=True)
+    assert forced != first
+    assert manager.wait(forced, 5)['status'] == DONE
+
+
+def test_failed_result_not_reused(manager, handler):
+    handler.release.set()
+    first = manager.submit('https://a/fail')
+    job = manager.wait(first, 5)
+    assert job['status'] == FAILED
+    assert job['error'] == 'boom'
+    assert manager.submit('https://a/fail') != first
+
+
+def test_recent_result_expires(tmp_path, handler):
+    handler.release.set()
+    manager = JobManager(JobStore(str(tmp_path / 'jobs.db')), handler, key_func=key_func, result_ttl=0.05)
+    manager.start()
+    first = manager.submit('https://a')
+    assert manager.wait(first, 5)['status'] == DONE
+    time.sleep(0.1)
+    assert manager.submit('https://a') != first
+    manager.shutdown()
+
+
+def test_unfinished_jobs_recovered_after_restart(tmp_path, handler):
+    # 模拟上次退出时一个任务正在运行、一个仍在排队
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    running = store.create('https://a', force=True)
+    store.mark_running(running)
+    queued = store.create('https://b')
+    done = store.create('https://c')
+    store.mark_finished(done, DONE, {}, result={})
+
+    manager = JobManager(store, handler, workers=1, key_func=key_func)
+    manager.start()
+    assert handler.started.wait(5)
+    # 恢复的任务参与合并
+    assert manager.submit('https://a', force=True) == running
+    handler.release.set()
+    assert manager.wait(running, 5)['status'] == DONE
+    assert manager.wait(queued, 5)['status'] == DONE
+    assert [job['url'] for job in handler.calls] == ['https://a', 'https://b']
+    assert handler.calls[0]['force'] is True
+    manager.shutdown()
@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from conftest import ROOT
+from jsonl_store import JsonlArticleStore
+
+
+def article(i):
+    return {'url': f'https://mp.weixin.qq.com/s/{i}', 'title': f'文章 {i}'}
+
+
+def test_append_survives_process_crash(tmp_path):
+    # 不足 fsync_every 条时进程直接退出，记录也不能丢失
+    path = tmp_path / 'articles.jsonl'
+    script = (
+        'import os, sys\n'
+        f'sys.path.insert(0, {ROOT!r})\n'
+        'from jsonl_store import JsonlArticleStore\n'
+        f'store = JsonlArticleStore({str(path)!r}, fsync_every=10, fsync_interval=60)\n'
+        'for i in range(5):\n'
+        '    store.append({"url": f"https://mp.weixin.qq.com/s/{i}", "title": str(i)})\n'
+        'os._exit(0)\n'
+    )
+    subprocess.run([sys.executable, '-c', script], check=True)
+
+    assert os.path.getsize(path) > 0
+    assert os.path.getsize(f'{path}.idx') > 0
+    store = JsonlArticleStore(str(path))
+    assert len(store) == 5
+    assert store.get('https://mp.weixin.qq.com/s/4')['title'] == '4'
+    store.close()
+
+
+def test_idle_appends_are_synced_by_timer(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(fd))
+    store = JsonlArticleStore(str(tmp_path / 'articles.jsonl'), fsync_every=10, fsync_interval=0.05)
+    synced.clear()
+    store.append(article(1))
+    deadline = time.monotonic() + 2
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert synced
+    assert store._pending == 0
+    store.close()
+
+
+def test_reopen_keeps_latest_record_and_repairs_tail(tmp_path):
+    path = str(tmp_path / 'articles.jsonl')
+    store = JsonlArticleStore(path)
+    store.append(article(1))
+    store.append(dict(article(1), title='新标题'))
+    store.append(article(2))
+    store.close()
+    # 模拟写入中途崩溃留下的半行记录
+    with open(path, 'ab') as f:
+        f.write(b'{"url": "https://mp.weixin.qq.com/s/3", "ti')
+
+    store = JsonlArticleStore(path)
+    assert len(store) == 2
+    assert store.get(article(1)['url'])['title'] == '新标题'
+    assert 'https://mp.weixin.qq.com/s/3' not in store
+    store.append(article(3))
+    assert store.get(article(3)['url']) == article(3)
+    store.close()
+
+
+def test_reopen_rebuilds_lost_index(tmp_path):
+    path = str(tmp_path / 'articles.jsonl')
+    store = JsonlArticleStore(path)
+    for i in range(3):
+        store.append(article(i))
+    store.close()
+    os.remove(f'{path}.idx')
+
+    store = JsonlArticleStore(path)
+    assert len(store) == 3
+    assert store.get(article(2)['url']) == article(2)
+    store.close()
+
+
+def test_compact_keeps_latest_records(tmp_path):
+    path = str(tmp_path / 'articles.jsonl')
+    store = JsonlArticleStore(path)
+    for title in ('a', 'b', 'c'):
+        store.append(dict(article(1), title=title))
+    store.append(article(2))
+    store.compact()
+    assert [a['title'] for a in store.iter_articles()] == ['c', '文章 2']
+    store.close()
+
+    store = JsonlArticleStore(path)
+    assert store.get(article(1)['url'])['title'] == 'c'
+    store.close()
+
+
+def test_migration_resumes_after_crash(tmp_path):
+    json_path = tmp_path / 'articles.json'
+    articles = [article(i) for i in range(5)]
+    json_path.write_text(json.dumps(articles, ensure_ascii=False), encoding='utf-8')
+    path = str(tmp_path / 'articles.jsonl')
+
+    # 模拟迁移到第 3 篇时崩溃：标记文件已写入，部分记录已追加
+    store = JsonlArticleStore(path)
+    with open(store.migration_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': str(json_path), 'start': 0}, f)
+    for a in articles[:3]:
+        store.append(a)
+    store.close()
+
+    store = JsonlArticleStore(path)
+    assert store.migration_pending()
+    assert store.migrate_from_json(str(json_path)) == 5
+    assert [a['url'] for a in store.iter_articles()] == [a['url'] for a in articles]
+    assert not store.migration_pending()
+    assert not json_path.exists()
+    assert (tmp_path / 'articles.json.migrated').exists()
+    store.close()
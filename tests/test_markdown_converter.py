@@ -0,0 +1,58 @@
+import pytest
+
+from bench_markdown import load_fixtures, normalize
+from markdown_converter import etree, html2text_markdown, html_to_markdown
+
+pytest.importorskip('html2text')
+
+BACKENDS = ['html.parser'] + (['lxml'] if etree is not None else [])
+FIXTURES = load_fixtures(1)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name, html, image_map', FIXTURES, ids=[f[0] for f in FIXTURES])
+def test_fixture_matches_html2text(name, html, image_map, backend):
+    # 与 html2text 的输出只允许空白排版不同
+    expected = html2text_markdown(html, image_map)
+    assert normalize(html_to_markdown(html, image_map, backend)) == normalize(expected)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('html', [
+    '<ol start="3"><li>three</li><li>four</li></ol>',
+    '<ol start="0"><li>zero</li></ol>',
+    '<ol start="x"><li>one</li></ol>',
+    '<table><tr><td>a</td><td>b</td></tr><tr><td>c</td><td>d</td></tr></table>',
+    '<table><tr><th>h1</th><th>h2</th></tr><tr><td>c</td><td>d</td></tr></table>',
+    '<table><tr><td>a</td></tr><tr><th>b</th></tr></table><table><tr><td>x</td></tr></table>',
+], ids=['ol-start', 'ol-start-zero', 'ol-start-invalid', 'table-no-th', 'table-th', 'table-multiple'])
+def test_matches_html2text(html, backend):
+    assert normalize(html_to_markdown(html, None, backend)) == normalize(html2text_markdown(html))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_ordered_list_start(backend):
+    assert html_to_markdown('<ol start="3"><li>three</li><li>four</li></ol>', None, backend) == \
+        '  3. three\n  4. four\n'
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_table_without_th_has_separator(backend):
+    html = '<table><tr><td>a</td><td>b</td></tr><tr><td>c</td><td>d</td></tr></table>'
+    assert html_to_markdown(html, None, backend) == 'a| b\n---|---\nc| d\n'
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_href_with_spaces_is_wrapped(backend):
+    # 已知差异：html2text 原样输出带空格的链接地址，Markdown 中链接会断开；这里用 <...> 包裹
+    html = '<p><a href="http://example.com/a b">link</a></p>'
+    assert html_to_markdown(html, None, backend) == '[link](<http://example.com/a b>)\n'
+    assert html2text_markdown(html).strip() == '[link](http://example.com/a b)'
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_images_use_local_paths(backend):
+    html = '<p><img data-src="http://img/1.png"><img src="http://img/2.png"></p>'
+    markdown = html_to_markdown(html, {'http://img/1.png': './images/1.png'}, backend)
+    assert '![image](./images/1.png)' in markdown
+    assert normalize(markdown) == normalize(html2text_markdown(html, {'http://img/1.png': './images/1.png'}))
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_render_text_format(registry):
+    requests = Counter('requests_total', '请求数', ['result'], registry=registry)
+    running = Gauge('running', '进行中', registry=registry)
+    requests.labels(result='saved').inc()
+    requests.labels(result='failed').inc(2)
+    running.set(3)
+    assert registry.render() == (
+        '# HELP requests_total 请求数\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{result="failed"} 2\n'
+        'requests_total{result="saved"} 1\n'
+        '# HELP running 进行中\n'
+        '# TYPE running gauge\n'
+        'running 3\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    seconds = Histogram('seconds', '耗时', ['stage'], buckets=(0.1, 1), registry=registry)
+    for value in (0.05, 0.5, 0.5, 5):
+        seconds.labels(stage='fetch').observe(value)
+    assert seconds.samples() == [
+        'seconds_bucket{stage="fetch",le="0.1"} 1',
+        'seconds_bucket{stage="fetch",le="1"} 3',
+        'seconds_bucket{stage="fetch",le="+Inf"} 4',
+        'seconds_sum{stage="fetch"} 6.05',
+        'seconds_count{stage="fetch"} 4',
+    ]
+
+
+def test_label_validation(registry):
+    requests = Counter('requests_total', '请求数', ['result'], registry=registry)
+    with pytest.raises(ValueError):
+        requests.inc()
+    with pytest.raises(ValueError):
+        requests.labels(other='x')
+    with pytest.raises(ValueError):
+        Counter('count', '计数', registry=registry).inc(-1)
+    with pytest.raises(ValueError):
+        Counter('requests_total', '重复', registry=registry)
+
+
+def test_label_values_are_escaped(registry):
+    errors = Counter('errors', '错误', ['error'], registry=registry)
+    errors.labels(error='a"b\\c\nd').inc()
+    assert errors.samples() == ['errors{error="a\\"b\\\\c\\nd"} 1']
+
+
+def test_gauge_function_errors_are_skipped(registry):
+    ok = Gauge('ok', 'ok', registry=registry)
+    ok.set_function(lambda: 2)
+    broken = Gauge('broken', 'broken', registry=registry)
+    broken.set_function(lambda: 1 / 0)
+    assert ok.samples() == ['ok 2']
+    assert broken.samples() == []
+
+
+def test_concurrent_increments(registry):
+    requests = Counter('requests_total', '请求数', ['result'], registry=registry)
+    seconds = Histogram('seconds', '耗时', registry=registry)
+
+    def work():
+        for _ in range(1000):
+            requests.labels(result='saved').inc()
+            seconds.observe(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert requests.samples() == ['requests_total{result="saved"} 8000']
+    assert seconds.samples()[-1] == 'seconds_count 8000'
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+import pytest
+
+import profiler
+from profiler import RequestProfiler
+
+
+def modes(profile_dir):
+    return {s['request_id']: s['mode'] for s in RequestProfiler(str(profile_dir)).recent()}
+
+
+def test_overlapping_cprofile_falls_back_to_sampling(tmp_path):
+    # 两个强制分析的请求同时执行时，后一个改为采样，两个请求都正常返回
+    p = RequestProfiler(str(tmp_path), sample_interval=0.001)
+    started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'first'
+
+    thread = threading.Thread(target=lambda: results.update(first=p.run('first', slow, force=True)))
+    thread.start()
+    assert started.wait(5)
+    results['second'] = p.run('second', lambda: time.sleep(0.02) or 'second', force=True)
+    release.set()
+    thread.join()
+
+    assert results == {'first': 'first', 'second': 'second'}
+    assert modes(tmp_path) == {'first': 'cprofile', 'second': 'sampling'}
+    assert not profiler._cprofile_lock.locked()
+
+
+def test_cprofile_error_does_not_fail_request(tmp_path, monkeypatch):
+    # Python 3.12 起其他性能分析工具已开启时 enable 会抛出 ValueError
+    class BusyProfile:
+        def enable(self):
+            raise ValueError('Another profiling tool is already active')
+
+    monkeypatch.setattr(profiler.cProfile, 'Profile', BusyProfile)
+    p = RequestProfiler(str(tmp_path), sample_interval=0.001)
+    assert p.run('job', lambda: 42, force=True) == 42
+    assert modes(tmp_path) == {'job': 'sampling'}
+    assert not profiler._cprofile_lock.locked()
+
+
+def test_always_profiles_concurrent_jobs(tmp_path):
+    p = RequestProfiler(str(tmp_path), sample_interval=0.001, always=True)
+    results = []
+
+    def job(i):
+        time.sleep(0.02)
+        return i
+
+    threads = [threading.Thread(target=lambda i=i: results.append(p.run(f'job{i}', lambda: job(i))))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0, 1, 2, 3]
+    assert len(modes(tmp_path)) == 4
+
+
+def test_failed_job_is_saved_with_error(tmp_path):
+    p = RequestProfiler(str(tmp_path))
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        p.run('job', fail, force=True)
+    with open(tmp_path / 'job.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['mode'] == 'cprofile'
+    assert summary['error'] == 'RuntimeError: boom'
+    assert (tmp_path / 'job.prof').exists()
@@ -0,0 +1,91 @@
+import configparser
+import time
+
+import pytest
+
+from rate_limiter import HostRateLimiter, parse_rate
+
+
+class FakeResponse:
+    def __init__(self, url, status_code, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2/4', (2.0, 4.0)),
+    ('2', (2.0, 2.0)),
+    ('0.5', (0.5, 1.0)),
+    ('10/0.5', (10.0, 1.0)),
+])
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+
+@pytest.mark.parametrize('value', ['0', '0/4', '-1/4', '2/0', '0/min', 'abc', 'nan'])
+def test_parse_rate_rejects_invalid(value):
+    with pytest.raises(ValueError, match='无效的限流速率'):
+        parse_rate(value)
+
+
+def test_zero_rate_rejected_at_config_load():
+    config = configparser.ConfigParser()
+    config.read_string('[RateLimit]\ndefault=2/4\nmp.weixin.qq.com=0\n')
+    with pytest.raises(ValueError):
+        HostRateLimiter.from_config(config)
+
+
+def test_suffix_match_prefers_longest():
+    limiter = HostRateLimiter({'qpic.cn': (10.0, 20.0), 'mmbiz.qpic.cn': (5.0, 5.0)})
+    assert limiter._bucket('https://mmbiz.qpic.cn/a.jpg').rate == 5.0
+    assert limiter._bucket('https://x.qpic.cn/a.jpg').rate == 10.0
+    assert limiter._bucket('https://example.com/').rate == limiter.default[0]
+
+
+def test_burst_then_wait():
+    limiter = HostRateLimiter(default=(10.0, 2.0))
+    assert limiter.reserve('https://a.com/1') == 0
+    assert limiter.reserve('https://a.com/2') == 0
+    assert 0 < limiter.reserve('https://a.com/3') <= 0.1
+    # 其他域名不受影响
+    assert limiter.reserve('https://b.com/1') == 0
+
+
+def test_backoff_doubles_caps_and_recovers():
+    limiter = HostRateLimiter(default=(10.0, 10.0), backoff=1.0, max_backoff=3.0)
+    url = 'https://a.com/'
+    for expected in (1.0, 2.0, 3.0, 3.0):
+        limiter.report(url, status=429)
+        assert limiter.stats()['a.com']['paused'] == pytest.approx(expected, abs=0.05)
+        limiter._buckets['a.com'].blocked_until = 0
+    assert limiter.stats()['a.com']['rate'] == pytest.approx(10.0 / 16)
+    limiter.report(url, status=200)
+    assert limiter.stats()['a.com']['failures'] == 0
+    assert limiter.stats()['a.com']['rate'] == pytest.approx(10.0 * (1 / 16 + 0.1))
+
+
+def test_reserve_waits_for_backoff():
+    limiter = HostRateLimiter(default=(10.0, 10.0), backoff=5.0)
+    limiter.report('https://a.com/', blocked=True)
+    assert limiter.reserve('https://a.com/x') == pytest.approx(5.0, abs=0.05)
+    assert limiter.reserve('https://b.com/x') == 0
+
+
+def test_acquire_sleeps_through_backoff():
+    limiter = HostRateLimiter(default=(10.0, 10.0), backoff=0.1)
+    limiter.report('https://a.com/', status=503)
+    start = time.monotonic()
+    waited = limiter.acquire('https://a.com/')
+    assert waited >= 0.09
+    assert time.monotonic() - start >= 0.09
+
+
+def test_report_response_backs_off_requested_host():
+    # 重定向到其他域名时，限流的是请求的域名而不是最终地址的域名
+    limiter = HostRateLimiter(default=(10.0, 10.0), backoff=5.0)
+    response = FakeResponse('https://cdn.example.com/a.jpg', 429, {'Retry-After': '10'})
+    limiter.report_response('https://mmbiz.qpic.cn/a.jpg', response)
+    stats = limiter.stats()
+    assert stats['mmbiz.qpic.cn']['paused'] == pytest.approx(10.0, abs=0.05)
+    assert 'cdn.example.com' not in stats
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from article_index import article_location
+from article_snapshot import write_snapshot
+from rerender import rerender_all
+from simhash_index import SimHashIndex, article_fingerprint
+
+
+@pytest.fixture
+def save_path(tmp_path):
+    # 一篇正文 120 字的文章：低于默认的 200 字，高于配置的 50 字
+    article = {
+        'title': '标题', 'author': '作者', 'publish_date': '20260101',
+        'content_html': '<p>' + '正文内容' * 30 + '</p>', 'image_urls': [],
+        'url': 'https://mp.weixin.qq.com/s/abc',
+    }
+    article_dir, filepath, _, _ = article_location(str(tmp_path), article)
+    os.makedirs(article_dir)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('# 标题\n')
+    write_snapshot(filepath, article, {})
+    return str(tmp_path), article
+
+
+def test_rerender_uses_configured_min_chars(save_path):
+    path, article = save_path
+    counts = rerender_all(path, workers=1, min_chars=50)
+    assert counts['rendered'] == 1
+
+    index = SimHashIndex.for_save_path(path)
+    fingerprint = article_fingerprint(article, 50)
+    assert fingerprint is not None
+    # 重建后的指纹与保存时计算的一致
+    assert index.find(fingerprint[0]) is not None
+    index.close()
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from simhash_index import (BITS, SimHashIndex, article_fingerprint, hamming, max_distance_for,
+                           normalize_text, simhash)
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.fixture
+def files(tmp_path):
+    # find 只返回文件仍然存在的文章
+    def make(count):
+        paths = []
+        for i in range(count):
+            path = tmp_path / f'{i}.md'
+            path.write_text('', encoding='utf-8')
+            paths.append(str(path))
+        return paths
+    return make
+
+
+@pytest.mark.parametrize('max_distance', [0, 1, 3, 6])
+def test_banding_finds_every_match_within_distance(tmp_path, files, max_distance):
+    # 与逐个比较的结果一致：距离不超过 max_distance 的一定能找到
+    rng = random.Random(max_distance)
+    index = SimHashIndex(str(tmp_path / 'index.db'), max_distance)
+    paths = files(50)
+    values = [rng.getrandbits(BITS) for _ in paths]
+    for path, value in zip(paths, values):
+        index.add(path, None, value)
+
+    for path, value in zip(paths, values):
+        for distance in range(max_distance + 2):
+            query = flip(value, rng.sample(range(BITS), distance))
+            expected = min(((hamming(query, v), p) for p, v in zip(paths, values)))
+            found = index.find(query)
+            if expected[0] <= max_distance:
+                assert found is not None
+                assert found['distance'] == expected[0]
+            else:
+                assert found is None
+    index.close()
+
+
+def test_fingerprints_persist_with_high_bit(tmp_path, files):
+    path, = files(1)
+    value = (1 << 63) | 12345
+    index = SimHashIndex(str(tmp_path / 'index.db'))
+    index.add(path, 'https://a', value)
+    index.close()
+
+    index = SimHashIndex(str(tmp_path / 'index.db'))
+    assert len(index) == 1
+    assert index.find(value) == {'filepath': path, 'url': 'https://a', 'distance': 0, 'similarity': 1.0}
+    index.close()
+
+
+def test_exclude_remove_and_missing_files(tmp_path, files):
+    first, second = files(2)
+    index = SimHashIndex(str(tmp_path / 'index.db'))
+    index.add(first, None, 0)
+    index.add(second, None, 1)
+    assert index.find(0)['filepath'] == first
+    assert index.find(0, exclude=first)['filepath'] == second
+    index.remove(second)
+    assert index.find(0, exclude=first) is None
+    # 文件已删除时跳过
+    index.add(second, None, 1)
+    (tmp_path / '0.md').unlink()
+    assert index.find(0)['filepath'] == second
+    index.close()
+
+
+def test_max_distance_for():
+    assert max_distance_for(0.95) == 3
+    assert max_distance_for(1.0) == 0
+    assert max_distance_for(0.9) == 6
+
+
+def test_simhash_of_repost_is_close():
+    text = normalize_text(''.join(f'第{i}段正文讲述了一些内容。' for i in range(60)))
+    repost = text.replace('第3段', '第三段') + '转载自某公众号'
+    assert hamming(simhash(text), simhash(repost)) <= 3
+    assert hamming(simhash(text), simhash(normalize_text('完全不同的另一篇文章' * 30))) > 3
+
+
+def test_article_fingerprint_respects_min_chars():
+    article = {'content_html': '<p>' + '正文' * 60 + '</p><script>ignored()</script>'}
+    assert article_fingerprint(article, 200) is None
+    value, length = article_fingerprint(article, 100)
+    assert length == 120
+    assert value == simhash('正文' * 60)
@@ -0,0 +1,142 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('selenium')
+
+import FavoriteArticlesWeb as web
+from job_queue import JobManager, JobStore
+from logger_config import REQUEST_LOGGER
+
+URL = 'https://mp.weixin.qq.com/s/abc'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # 不启动浏览器
+    monkeypatch.setattr(web.WebDriverPool, 'start_warmup', classmethod(lambda cls: None))
+    return web.app.test_client()
+
+
+def request_lines(caplog):
+    return [json.loads(r.getMessage()) for r in caplog.records if r.name == REQUEST_LOGGER]
+
+
+def test_repeated_save_logs_index_hit(client, monkeypatch, caplog):
+    saved = {'message': '文章已存在', 'filepath': '/tmp/a.md', 'title': 'a', 'tier': 'index', 'deduplicated': False}
+    monkeypatch.setattr(web, 'saved_article_result', lambda url, save_path=None: dict(saved))
+    monkeypatch.setattr(web.JobService, 'get_manager', classmethod(lambda cls: pytest.fail('不应提交任务')))
+    caplog.set_level(logging.INFO, logger=REQUEST_LOGGER)
+
+    for _ in range(2):
+        response = client.get('/save', query_string={'url': URL})
+        assert response.status_code == 200
+        assert response.get_json() == saved
+
+    lines = request_lines(caplog)
+    assert len(lines) == 2
+    assert lines[0]['request_id'] != lines[1]['request_id']
+    for line in lines:
+        assert line['url'] == URL
+        assert line['outcome'] == 'existing'
+        assert line['tier'] == 'index'
+        assert line['filepath'] == '/tmp/a.md'
+        assert 'lookup' in line['stages']
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    # 使用临时数据库的任务队列；archive_article 阻塞到 release 被设置
+    started = threading.Event()
+    release = threading.Event()
+    profiled = []
+    coalesced = []
+
+    def archive(url, save_path=None, force=False, timings=None):
+        started.set()
+        release.wait(5)
+        return {'message': '文章保存成功', 'filepath': '/tmp/a.md', 'title': 'a', 'tier': 'http',
+                'deduplicated': False}
+
+    class FakeProfiler:
+        def run(self, request_id, func, force=False, **info):
+            profiled.append(force)
+            return func()
+
+    monkeypatch.setattr(web, 'archive_article', archive)
+    monkeypatch.setattr(web, 'saved_article_result', lambda url, save_path=None: None)
+    monkeypatch.setattr(web, 'is_admin', lambda: True)
+    monkeypatch.setattr(web.JobService, 'get_profiler', classmethod(lambda cls: FakeProfiler()))
+    manager = JobManager(JobStore(str(tmp_path / 'jobs.db')), web.JobService.run_job, 2,
+                         key_func=web.JobService.job_key, on_coalesce=coalesced.append)
+    manager.start()
+    monkeypatch.setattr(web.JobService, '_manager', manager)
+    monkeypatch.setattr(web.JobService, '_profile_jobs', set())
+    yield started, release, profiled, coalesced
+    release.set()
+    manager.shutdown()
+
+
+def test_profile_request_joining_running_job_does_not_leak(client, jobs):
+    started, release, profiled, coalesced = jobs
+    responses = []
+
+    def save(headers=None):
+        responses.append(client.get('/save', query_string={'url': URL}, headers=headers or {}))
+
+    first = threading.Thread(target=save)
+    first.start()
+    assert started.wait(5)
+    # 合并到正在执行的任务，不应为之后的任务留下性能分析请求
+    second = threading.Thread(target=save, kwargs={'headers': {'X-Profile': '1'}})
+    second.start()
+    deadline = time.monotonic() + 5
+    while not coalesced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert coalesced == ['inflight']
+    release.set()
+    first.join()
+    second.join()
+    assert web.JobService._profile_jobs == set()
+
+    save()
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert profiled == [False, False]
+
+
+def test_profile_request_profiles_new_job(client, jobs):
+    _, release, profiled, _ = jobs
+    release.set()
+    response = client.get('/save', query_string={'url': URL}, headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert profiled == [True]
+    assert web.JobService._profile_jobs == set()
+
+
+def test_process_url_throttles_before_leasing_browser(monkeypatch):
+    # 域名暂停期间不占用浏览器
+    events = []
+
+    class Limiter:
+        def acquire(self, url):
+            events.append('acquire')
+            return 0.5
+
+    @contextlib.contextmanager
+    def lease():
+        events.append('lease')
+        raise RuntimeError('stop')
+        yield
+
+    monkeypatch.setattr(web.WechatArticleCrawler, 'get_rate_limiter', classmethod(lambda cls: Limiter()))
+    monkeypatch.setattr(web.WebDriverPool, 'lease', staticmethod(lease))
+    timings = {}
+    with pytest.raises(RuntimeError):
+        web.WechatArticleCrawler().process_url(URL, timings)
+    assert events == ['acquire', 'lease']
+    assert timings['throttle'] == 0.5